@@ -0,0 +1,249 @@
+# Summaries of the coded annotations for the meta-analysis: answer counts for
+# every choice code, tick counts for every checkall (multi) code, and the
+# distribution of every numeric code, over all experiments or split by
+# journal or year. Values are read in their stored form (choice index,
+# bitmask, number; see db.py) and decoded with vectorized Polars expressions,
+# so nothing is re-parsed from "; "-joined strings.
+import threading
+
+import polars as pl
+
+import db
+from db import KEY_COLUMNS, ChoiceCode, CodedFloat, CodedInteger, MultiChoiceCode
+
+# Label -> columns the summaries are split by
+GROUPINGS = {
+    "All experiments": [],
+    "Journal": ["journal"],
+    "Year": ["year"],
+}
+
+
+def summary_columns(table=None):
+    # (choice columns, multi columns, numeric columns) of the table; every
+    # function here defaults to the annotations table (see db.init_db)
+    table = db.Annotation.__table__ if table is None else table
+    choice, multi, numeric = [], [], []
+    for column in table.columns:
+        if column.name in KEY_COLUMNS:
+            continue
+        if isinstance(column.type, ChoiceCode):
+            choice.append(column)
+        elif isinstance(column.type, MultiChoiceCode):
+            multi.append(column)
+        elif isinstance(column.type, (CodedInteger, CodedFloat)):
+            numeric.append(column)
+    return choice, multi, numeric
+
+
+def stored_schema(table=None):
+    # Polars schema of the frame read_stored returns
+    choice, multi, numeric = summary_columns(table)
+    schema = {
+        "article_index": pl.String, "experiment_number": pl.String, "coder": pl.String,
+        "journal": pl.String, "year": pl.String,
+    }
+    schema.update({c.name: pl.Int64 for c in choice + multi})
+    schema.update({c.name: pl.Float64 for c in numeric})
+    return schema
+
+
+def stored_frame(rows, table=None):
+    df = pl.DataFrame(rows, schema=stored_schema(table), orient="row")
+    # Years are free text in the form; anything that isn't a number is unknown
+    return df.with_columns(pl.col("year").str.strip_chars().cast(pl.Int32, strict=False))
+
+
+def select_stored_sql(table=None):
+    # Raw SQL skips the columns' decoding back to strings
+    table = db.Annotation.__table__ if table is None else table
+    columns = ", ".join(f'"{name}"' for name in stored_schema(table))
+    return f"SELECT {columns} FROM {table.name}"
+
+
+def read_stored(engine, table=None):
+    # One row per experiment with its key, journal, year and every
+    # summarized code, as stored
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(select_stored_sql(table)).fetchall()
+    return stored_frame(rows, table)
+
+
+# === Keeping the stored frame current ===
+# Reading the whole table takes a second or two at 100k experiments, so the
+# frame is read once per process and then patched from the change log (see
+# db.py): rows whose key changed since the last seq seen are dropped and
+# re-read. Like db.CodedIndex, it starts over if the database file was
+# replaced or the log was pruned past that seq.
+class StoredAnnotations:
+    def __init__(self, engine, data_version, table=None):
+        self.engine = engine
+        self.data_version = data_version
+        self.table = table
+        self._lock = threading.Lock()
+        self._version = None
+        self._seq = 0
+        self._frame = None
+
+    def _reload(self):
+        with self.engine.connect() as conn:
+            # Read the rows and the log position from one snapshot
+            conn.exec_driver_sql("BEGIN")
+            rows = conn.exec_driver_sql(select_stored_sql(self.table)).fetchall()
+            self._seq = conn.exec_driver_sql("SELECT COALESCE(MAX(seq), 0) FROM annotation_changes").scalar()
+            conn.exec_driver_sql("COMMIT")
+        self._frame = stored_frame(rows, self.table)
+
+    def _apply_changes(self):
+        # Returns False if changes after our seq were pruned from the log
+        # (Logs created before experiment numbers were text store them as
+        # integers where they can)
+        changed_keys = (
+            "SELECT DISTINCT article_index, CAST(experiment_number AS TEXT), coder FROM annotation_changes "
+            "WHERE seq > ? AND seq <= ?"
+        )
+        with self.engine.connect() as conn:
+            conn.exec_driver_sql("BEGIN")
+            first, last = conn.exec_driver_sql(
+                "SELECT MIN(seq), MAX(seq) FROM annotation_changes WHERE seq > ?", (self._seq,)
+            ).fetchone()
+            if first is None or first != self._seq + 1:
+                conn.exec_driver_sql("COMMIT")
+                return first is None
+            keys = conn.exec_driver_sql(changed_keys, (self._seq, last)).fetchall()
+            rows = conn.exec_driver_sql(
+                f"{select_stored_sql(self.table)} WHERE (article_index, experiment_number, coder) IN ({changed_keys})",
+                (self._seq, last),
+            ).fetchall()
+            conn.exec_driver_sql("COMMIT")
+        keys = pl.DataFrame(
+            keys, schema={"article_index": pl.String, "experiment_number": pl.String, "coder": pl.String}, orient="row"
+        )
+        self._frame = pl.concat([
+            self._frame.join(keys, on=KEY_COLUMNS, how="anti"),
+            stored_frame(rows, self.table),
+        ])
+        self._seq = last
+        return True
+
+    def frame(self):
+        with self._lock:
+            version = self.data_version.current()
+            if version != self._version:
+                # A different file (inode) means the log can't be trusted
+                replaced = self._version is None or version is None or version[0] != self._version[0]
+                if replaced or not self._apply_changes():
+                    self._reload()
+                self._version = version
+            return self._frame
+
+
+def code_sections(schema):
+    return pl.DataFrame(
+        {"code": list(schema.fields), "section": [spec.section for spec in schema]},
+        schema={"code": pl.String, "section": pl.String},
+    )
+
+
+def choice_frequencies(df, by, table=None):
+    # Long frame: by..., code, value, n, share (of the experiments in the
+    # group that answered the code)
+    choice, _, _ = summary_columns(table)
+    labels = pl.DataFrame(
+        [(c.name, i, value) for c in choice for i, value in enumerate(c.type.values)],
+        schema={"code": pl.String, "index": pl.Int64, "value": pl.String},
+        orient="row",
+    )
+    counts = (
+        df.lazy()
+        .select(*by, *[c.name for c in choice])
+        .unpivot(index=by, variable_name="code", value_name="index")
+        .drop_nulls("index")
+        .group_by(*by, "code", "index")
+        .len("n")
+    )
+    return (
+        counts.join(labels.lazy(), on=["code", "index"], how="left")
+        .with_columns(
+            pl.col("value").fill_null(pl.format("(unknown answer {})", pl.col("index"))),
+            (pl.col("n") / pl.col("n").sum().over(*by, "code")).alias("share"),
+        )
+        .select(*by, "code", "value", "n", "share")
+        .sort(*by, "code", "n", descending=[False] * len(by) + [False, True])
+        .collect()
+    )
+
+
+def multi_counts(df, by, table=None):
+    # Long frame: by..., code, value, n (experiments ticking value), share
+    # (of the experiments in the group that answered the code)
+    _, multi, _ = summary_columns(table)
+    if not multi:
+        return pl.DataFrame()
+    ticks = [
+        ((pl.col(c.name) & (1 << i)) != 0).sum().alias(f"{c.name}\x1f{value}")
+        for c in multi for i, value in enumerate(c.type.values)
+    ]
+    answered = [pl.col(c.name).is_not_null().sum().alias(f"{c.name}\x1f") for c in multi]
+    wide = df.lazy().group_by(*by).agg(*ticks, *answered) if by else df.lazy().select(*ticks, *answered)
+    long = (
+        wide.unpivot(index=by, variable_name="key", value_name="n")
+        .with_columns(pl.col("key").str.split_exact("\x1f", 1).struct.rename_fields(["code", "value"]))
+        .unnest("key")
+    )
+    totals = long.filter(pl.col("value") == "").select(*by, "code", pl.col("n").alias("answered"))
+    return (
+        long.filter(pl.col("value") != "")
+        .join(totals, on=[*by, "code"], how="left", nulls_equal=True)
+        .with_columns((pl.col("n") / pl.col("answered")).alias("share"))
+        .select(*by, "code", "value", "n", "share")
+        .sort(*by, "code", "n", descending=[False] * len(by) + [False, True])
+        .collect()
+    )
+
+
+def numeric_distributions(df, by, table=None):
+    # Long frame: by..., code, n, mean, sd, min, q25, median, q75, max
+    _, _, numeric = summary_columns(table)
+    value = pl.col("value")
+    return (
+        df.lazy()
+        .select(*by, *[c.name for c in numeric])
+        .unpivot(index=by, variable_name="code", value_name="value")
+        .drop_nulls("value")
+        .group_by(*by, "code")
+        .agg(
+            value.len().alias("n"),
+            value.mean().alias("mean"),
+            value.std().alias("sd"),
+            value.min().alias("min"),
+            value.quantile(0.25).alias("q25"),
+            value.median().alias("median"),
+            value.quantile(0.75).alias("q75"),
+            value.max().alias("max"),
+        )
+        .sort(*by, "code")
+        .collect()
+    )
+
+
+def one_row_per_experiment(df):
+    # Double-coded experiments count once, with the answers of the coder
+    # whose ID sorts first
+    return df.sort("coder").unique(["article_index", "experiment_number"], keep="first")
+
+
+def summarize(df, schema, by, table=None):
+    # {"choice": ..., "multi": ..., "numeric": ...}, each with the code's
+    # codebook section added
+    df = one_row_per_experiment(df)
+    sections = code_sections(schema)
+    summaries = {
+        "choice": choice_frequencies(df, by, table),
+        "multi": multi_counts(df, by, table),
+        "numeric": numeric_distributions(df, by, table),
+    }
+    return {
+        kind: frame.join(sections, on="code", how="left") if not frame.is_empty() else frame
+        for kind, frame in summaries.items()
+    }
@@ -1,84 +1,115 @@
-import string
 import streamlit as st
-import pandas as pd
 import polars as pl
+import html
 import os
-from io import StringIO
-from db import Annotation, SessionLocal
+from io import BytesIO, StringIO
+import db
+from codebook import CodebookSchema
+from export import EXPORT_FORMATS, available_formats, write_export
+from loaders import abbreviate_authors, build_catalog, journal_ranges, load_workbook, shared_catalog, workbook_key
+from shared_cache import open_store
+from aggregate import GROUPINGS, StoredAnnotations, summarize
+from drafts import WHOLE_ARTICLE, DraftStore, drafts_path
 from datetime import datetime
-import threading
+import perf
 
-# Lock to serialize DB access
-db_lock = threading.Lock()
+# Page sizes offered for the article table
+PAGE_SIZE_OPTIONS = [25, 50, 100, 200]
+DEFAULT_PAGE_SIZE = 50
 
-# === Define decorators for caching the data files ===
-@st.cache_data(show_spinner=False)
-def load_coded_df(db_path, last_modified):
-    import pandas as pd
-    import polars as pl
-
-    # Load DB
-    session = SessionLocal()
-    df = pd.read_sql("SELECT * FROM annotations", session.bind)
-    session.close()
-    df = pl.from_pandas(df)
-
-    # Ensure num_experiments column exists
-    if "N_experiments" not in df.columns:
-        df = df.with_columns(pl.lit(1).alias("N_experiments"))
-    else:
-        df = df.with_columns([
-            pl.col("N_experiments").cast(pl.Int64, strict=False).fill_null(1)
-        ])
-
-    # Manually repeat each row
-    repeated_rows = []
-    for row in df.iter_rows(named=True):
-        num_reps = row.get("N_experiments", 1)
-        for exp_num in range(1, num_reps + 1):
-            new_row = row.copy()
-            new_row["experiment_number"] = exp_num
-            repeated_rows.append(new_row)
-
-    # Convert back to Polars
-    expanded_df = pl.DataFrame(repeated_rows)
-
-    return expanded_df
-
-@st.cache_data(show_spinner=False)
-def load_journal_articles(excel_path):
-    if os.path.exists(excel_path):
-        # Read all sheets with pandas
-        sheets_dict = pd.read_excel(excel_path, sheet_name=None)
-        # Convert each sheet to polars
-        return {sheet_name: pl.from_pandas(df) for sheet_name, df in sheets_dict.items()}
-    else:
-        return {}
+# Most experiments the Add Entry form codes at once
+MAX_EXPERIMENTS = 20
 
-@st.cache_data(show_spinner=False)
-def load_codebook(codebook_path, last_modified):
-    if os.path.exists(codebook_path):
-        return pl.read_csv(codebook_path)
-    else:
-        return pl.DataFrame()
+# How often the sidebar's progress count picks up other coders' saves
+LIVE_PROGRESS_SECONDS = 10
 
-# === Define functions ===
-def abbreviate_title(title):
-    if pd.isna(title):
-        return "no_title"
-    words = [w.translate(str.maketrans('', '', string.punctuation)) for w in str(title).split()]
-    return "_".join(words[:3]).lower()
-
-def abbreviate_authors(authors):
-    if pd.isna(authors):
-        return "no_authors"
-    surnames = [n.split(" ")[-1] for n in str(authors).split("; ")]
-    surnames = [n.title() for n in surnames]
-    if len(surnames) <= 3:
-        return ", ".join(surnames)
+# Catalog columns the article table shows or hands on to the Add Entry form;
+# the dashboard query projects only these
+TABLE_COLUMNS = ["catalog_row", "article_index", "author", "date", "title", "url", "searchterm", "experiment_number"]
+
+# === Define decorators for caching the data files ===
+# Each cache is wrapped by perf.cached, which counts its hits and misses for
+# the performance panel
+
+# With ANNOTATION_APP_SHARED_CACHE set, the catalog and search index come from
+# an on-disk store shared by every app process (see shared_cache.py)
+shared_store = open_store()
+
+# Keyed on the DB's data version, so an unchanged database is never re-exported
+@perf.cached(st.cache_data(show_spinner="Preparing export...", max_entries=3))
+def build_annotation_export(db_path, export_format, data_version):
+    buffer = BytesIO()
+    write_export(db.engine, export_format, buffer)
+    return buffer.getvalue()
+
+@perf.cached(st.cache_data(show_spinner=False))
+def load_journal_articles(excel_path, last_modified):
+    # Parses the workbook once into an Arrow sidecar, which later starts
+    # memory-map instead (see loaders.load_workbook)
+    return load_workbook(excel_path)
+
+# Built once per workbook version and persisted, so restarts skip it too
+@perf.cached(st.cache_data(show_spinner=False, persist="disk"))
+def load_article_catalog(excel_path, last_modified):
+    sheets, load_report = load_journal_articles(excel_path, last_modified)
+    return build_catalog(sheets) + (load_report,)
+
+# One copy of the catalog per process, shared read-only by every session and
+# rerun (st.cache_data hands each call its own unpickled copy). Polars frames
+# are never modified in place, so sharing is safe.
+@perf.cached(st.cache_resource(show_spinner=False))
+def load_shared_catalog(excel_path, last_modified):
+    if shared_store is not None and os.path.exists(excel_path):
+        catalog, journal_names, sheets_without_index, load_report = shared_catalog(shared_store, excel_path)
     else:
-        return ", ".join(surnames[:3]) + " et al."
+        catalog, journal_names, sheets_without_index, load_report = load_article_catalog(excel_path, last_modified)
+    return catalog, journal_ranges(catalog), journal_names, sheets_without_index, load_report
+
+# Held as a shared object rather than copied out of the cache on every search
+@perf.cached(st.cache_resource(show_spinner=False))
+def load_search_index(excel_path, last_modified):
+    # Imported on first search: rapidfuzz and NumPy aren't needed before
+    from search import INDEX_VERSION, SearchIndex
+
+    catalog = load_shared_catalog(excel_path, last_modified)[0]
+    if shared_store is not None and os.path.exists(excel_path):
+        frames, meta, _ = shared_store.get_or_build(
+            f"search_index-v{INDEX_VERSION}", workbook_key(excel_path), lambda: SearchIndex(catalog).to_frames()
+        )
+        return SearchIndex.from_frames(frames, meta)
+    return SearchIndex(catalog)
+
+# Built once per codebook version and shared by every session and rerun
+@perf.cached(st.cache_resource(show_spinner=False))
+def load_codebook_schema(codebook_path, last_modified):
+    return CodebookSchema.from_csv(codebook_path)
+
+# Read once per process, then patched from the change log after each save
+@st.cache_resource(show_spinner=False)
+def load_stored_annotations(db_path):
+    return StoredAnnotations(db.engine, db.db_version)
+
+# Keyed on the DB's data version, so summaries are recomputed only after a save
+@perf.cached(st.cache_data(show_spinner="Summarizing annotations...", max_entries=12))
+def load_summaries(db_path, grouping, data_version, codebook_path, codebook_modified):
+    stored = load_stored_annotations(db_path).frame()
+    schema = load_codebook_schema(codebook_path, codebook_modified)
+    return summarize(stored, schema, GROUPINGS[grouping])
+
+@perf.cached(st.cache_data(show_spinner="Scoring inter-coder agreement...", max_entries=3))
+def load_reliability(db_path, data_version, codebook_path, codebook_modified):
+    from reliability import reliability
+
+    stored = load_stored_annotations(db_path).frame()
+    schema = load_codebook_schema(codebook_path, codebook_modified)
+    return reliability(stored, schema)
+
+# One per process; its thread writes the forms' drafts in the background
+@st.cache_resource(show_spinner=False)
+def load_draft_store(db_path):
+    return DraftStore(drafts_path(db_path))
 
+# === Define functions ===
 def change_label_style(label, font_size='16px', font_color='white', font_family='sans-serif'):
     html = f"""
     <script>
@@ -92,7 +123,174 @@ def change_label_style(label, font_size='16px', font_color='white', font_family=
     st.components.v1.html(html)
 
 
-def render_article_table(filtered_df, journal_name):
+def step_page(page_key, step, num_pages):
+    current = st.session_state.get(page_key, 1)
+    st.session_state[page_key] = min(max(current + step, 1), num_pages)
+
+
+def sync_page(page_key, input_key):
+    st.session_state[page_key] = st.session_state[input_key]
+
+
+def render_pagination(num_rows, journal_name, page_size):
+    # Page state is kept per journal, outside the widget's own key, because
+    # Streamlit drops widget state for journals that aren't being rendered
+    page_key = f"page_{journal_name}"
+    input_key = f"page_input_{journal_name}"
+    num_pages = max(1, -(-num_rows // page_size))
+
+    # Clamp (e.g. after a filter shrinks the list) before the widgets are created
+    page = min(max(st.session_state.get(page_key, 1), 1), num_pages)
+    st.session_state[page_key] = page
+    st.session_state[input_key] = page
+
+    cols = st.columns([1, 2, 1, 6])
+    cols[0].button("◀ Prev", key=f"prev_{journal_name}", on_click=step_page, args=(page_key, -1, num_pages), disabled=page <= 1)
+    cols[1].number_input("Page", min_value=1, max_value=num_pages, step=1, key=input_key, on_change=sync_page, args=(page_key, input_key), label_visibility="collapsed")
+    cols[2].button("Next ▶", key=f"next_{journal_name}", on_click=step_page, args=(page_key, 1, num_pages), disabled=page >= num_pages)
+
+    offset = (page - 1) * page_size
+    if num_rows:
+        cols[3].markdown(f"Showing {offset + 1}–{min(offset + page_size, num_rows)} of {num_rows} (page {page} of {num_pages})")
+    return offset
+
+
+def field_key(spec, suffix=""):
+    # Widget key of a code; per-experiment codes get the experiment's suffix
+    return spec.code if spec.scope == "article" else spec.code + suffix
+
+
+def conditional_fields(form_key, stored, suffix=""):
+    # Conditional codes to leave out of the form, decided from the parents'
+    # current answers (widget state, else the stored value, else the default).
+    # Inside st.form a changed answer only arrives on submit, so also return
+    # the codes that became visible since the last run: the coder hasn't seen
+    # those yet and the submit is held back until they have.
+    answers = {
+        code: st.session_state.get(field_key(codebook[code], suffix), stored.get(code) or codebook[code].default)
+        for code in codebook.parents
+    }
+    inactive = codebook.inactive_fields(answers)
+    state_key = f"inactive_fields_{form_key}"
+    newly_shown = st.session_state.get(state_key, inactive) - inactive
+    st.session_state[state_key] = inactive
+    return inactive, newly_shown
+
+
+def form_widget_keys(suffixes):
+    # Widget keys of every code (and its comment box) for the given suffixes
+    keys = []
+    for spec in codebook:
+        for suffix in suffixes:
+            key = field_key(spec, suffix)
+            keys += [key, f"{key}_comment"]
+    return list(dict.fromkeys(keys))
+
+
+def draft_default(key, default):
+    # A restored draft's value for a form widget, else its usual default
+    return (st.session_state.get("draft_fields") or {}).get(key, default)
+
+
+def stored_default(spec, stored):
+    # An annotation's stored answer as the form's widgets take it (numbers as
+    # text), else the codebook default when it has none
+    value = stored.get(spec.code)
+    if value is None:
+        return spec.default
+    return value if isinstance(value, str) else str(value)
+
+
+def restore_draft(article_index, experiment_number):
+    # Called when an article is opened from the dashboard: the coder's draft
+    # of that form, if any, becomes its widgets' defaults
+    draft = load_draft_store(db.DATABASE_PATH).load(coder_id, article_index, experiment_number)
+    fields, saved_at = draft or ({}, None)
+    st.session_state["draft_fields"] = fields
+    st.session_state["draft_saved_at"] = saved_at
+    if "add_num_experiments" in fields:
+        st.session_state["add_num_experiments"] = fields["add_num_experiments"]
+
+
+def autosave_draft(article_index, experiment_number, keys):
+    # Hands the form's current answers to the draft store, which writes them
+    # from its own thread once they stop changing, so this never waits on the
+    # disk. Inside st.form the answers only reach the server when one of the
+    # form's buttons is pressed.
+    fields = {key: st.session_state[key] for key in keys if key in st.session_state}
+    if article_index and fields:
+        load_draft_store(db.DATABASE_PATH).update(coder_id, article_index, experiment_number, fields)
+
+
+def discard_draft(article_index, experiment_number):
+    load_draft_store(db.DATABASE_PATH).discard(coder_id, article_index, experiment_number)
+    st.session_state["draft_fields"] = {}
+    st.session_state["draft_saved_at"] = None
+
+
+def select_review_experiment():
+    # Called when the coder picks another experiment in the Review form: its
+    # annotation replaces the form's answers, or its draft if it has one
+    experiment_number = st.session_state["review_experiment"]
+    selected = st.session_state["review_experiments"][experiment_number]
+    st.session_state["selected_article"] = selected
+    for key in form_widget_keys([""]):
+        st.session_state.pop(key, None)
+    restore_draft(selected["article_index"], experiment_number)
+
+
+def render_draft_notice():
+    saved_at = st.session_state.get("draft_saved_at")
+    if saved_at:
+        restored = datetime.fromtimestamp(saved_at).strftime("%d %b %Y, %H:%M")
+        st.info(f"Restored the answers you hadn't submitted yet (last changed {restored}).")
+
+
+def render_add_field(spec, entry, inactive_fields, suffix=""):
+    field = spec.code
+    key = field_key(spec, suffix)
+    if field in inactive_fields:
+        # Store the answer as empty rather than keep a stale one
+        entry[field] = None
+        return
+    label = f"[{spec.number + 1}]. {spec.description}"
+
+    if spec.widget == "multiselect":
+        restored = draft_default(key, None)
+        default = ["Not Reported"] if restored is None else [v for v in restored if v in spec.options]
+        selection = st.multiselect(label, spec.options, default=default, help=spec.help, key=key)
+        entry[field] = "; ".join(selection)
+    elif spec.widget == "choice":
+        value = draft_default(key, spec.default)
+        index = spec.options.index(value) if value in spec.options else 0
+        # entry[field] = st.selectbox(label, [""] + options, index=index, key=key, help=help_text)
+        entry[field] = st.radio(label, spec.options, index=index, key=key, help=spec.help, horizontal=True)
+    elif spec.widget == "text_area":
+        entry[field] = st.text_area(label, value=draft_default(key, ""), key=key)
+    else:
+        entry[field] = st.text_input(label, value=draft_default(key, spec.default), key=key, help=spec.help)
+
+    if field in commentable_fields_expandable:
+        with st.expander(f"Add comment on {field.replace('_', ' ').capitalize()} (optional)"):
+            entry[f"{field}_comment"] = st.text_area("", value=draft_default(f"{key}_comment", ""), key=f"{key}_comment")
+
+    # change_label_style(label, '20px')
+
+
+# Reruns on its own timer, so progress made by other coders shows up without
+# any interaction; each run only reads the change log since the last one
+@st.fragment(run_every=LIVE_PROGRESS_SECONDS)
+def render_live_progress(num_articles):
+    st.metric("Articles coded", f"{len(db.coded_index.coded_articles())} / {num_articles}")
+
+
+@perf.traced()
+def render_article_table(filtered_df, journal_name, page_size=DEFAULT_PAGE_SIZE):
+    # Only the current page is turned into widgets, so a rerun costs
+    # O(page_size) elements however large the workbook is
+    offset = render_pagination(filtered_df.height, journal_name, page_size)
+    page_df = filtered_df.slice(offset, page_size)
+
     # Header row
     header_cols = st.columns([2.5, 1, 1, 6, 2, 2, 2])
     header_cols[0].markdown("**Author**")
@@ -104,10 +302,8 @@ def render_article_table(filtered_df, journal_name):
     header_cols[6].markdown("**Status**")
 
     # Data rows
-
-    # Data rows
-    for row_idx, row in enumerate(filtered_df.iter_rows(named=True)):
-        is_coded = row["Status"] == "✅ Coded"
+    for row_idx, row in enumerate(page_df.iter_rows(named=True), start=offset):
+        is_coded = row["coded"]
         button_label = "🔍 Review" if is_coded else "📝 Annotate"
         
         # Generate unique entry ID
@@ -120,66 +316,59 @@ def render_article_table(filtered_df, journal_name):
         cols[2].markdown(str(exp_number))
         cols[3].markdown(f"{row['title']}")
         cols[4].markdown(f"[Open]({row['url']})", unsafe_allow_html=True)
-        cols[6].markdown(str(row['Status']))
+        cols[6].markdown("✅ Coded" if is_coded else "❌ Not coded")
 
         # Make button key unique per experiment
         if cols[5].button(button_label, key=f"annotate_{entry_id}_{row_idx}"):
             # Load annotation
             if is_coded:
-                # Pull full annotation for this article+experiment
-                session = SessionLocal()
+                # Pull this coder's annotations of every experiment of the
+                # article, in the order they were saved; the Review form opens
+                # the first and offers the others
+                session = db.SessionLocal()
                 existing = (
-                    session.query(Annotation)
-                    .filter(Annotation.article_index == row["article_index"])
-                    .filter(Annotation.experiment_number == row["experiment_number"])
-                    .first()
+                    session.query(db.Annotation)
+                    .filter(db.Annotation.article_index == row["article_index"])
+                    .filter(db.Annotation.coder == coder_id)
+                    .order_by(db.Annotation.id)
+                    .all()
                 )
                 session.close()
-                if existing:
-                    row_dict = {col.name: getattr(existing, col.name) for col in Annotation.__table__.columns}
-                else:
+                if not existing:
                     st.warning(f"Could not find annotation for {entry_id} in database.")
                     return
+                experiments = {
+                    annotation.experiment_number: dict(
+                        {col.name: getattr(annotation, col.name) for col in db.Annotation.__table__.columns},
+                        journal=journal_name,
+                    )
+                    for annotation in existing
+                }
+                experiment_number = next(iter(experiments))
+                row_dict = experiments[experiment_number]
+                st.session_state["review_experiment"] = experiment_number
             else:
                 # Use row directly as a new annotation
-                row_dict = dict(row)
+                row_dict = {k: v for k, v in row.items() if k not in ("catalog_row", "coded", "search_rank")}
+                row_dict["journal"] = journal_name
+                experiments, experiment_number = {}, WHOLE_ARTICLE
 
-            row_dict["journal"] = journal_name
             st.session_state["selected_article"] = row_dict
+            st.session_state["review_experiments"] = experiments
+            restore_draft(row["article_index"], experiment_number)
             st.query_params.update({"mode": "Review Entry" if is_coded else "Add Entry"})
             st.rerun()
 
-# For saving annotations
-def save_annotation(entry_dict):
-    with db_lock:
-        session = SessionLocal()
-        try:
-            existing = session.query(Annotation).filter(
-                Annotation.article_index == entry_dict["article_index"],
-                Annotation.experiment_number == entry_dict["experiment_number"]
-            ).first()
-
-            if existing:
-                # Update existing fields
-                for k, v in entry_dict.items():
-                    setattr(existing, k, v)
-            else:
-                # Create new record
-                new = Annotation(**entry_dict)
-                session.add(new)
-
-            session.commit()
-        finally:
-            session.close()
-
 # === Define the output file ===
 output_file = "new_annotations.csv"
 
 # === Load article list from Excel file with multiple sheets (each sheet = one journal) ===
-# Pandas is still needed for reading multi-sheet Excel files
+# Parsed once into a Polars catalog (calamine if installed, else openpyxl via
+# pandas) and kept in a sidecar next to the workbook; see loaders.py
 excel_path = os.path.join(os.path.dirname(__file__), "test_articles_dataset.xlsx")
 
-journal_articles = load_journal_articles(excel_path)
+excel_modified = os.path.getmtime(excel_path) if os.path.exists(excel_path) else 0
+catalog, catalog_journals, journal_names, sheets_without_index, workbook_load_report = load_shared_catalog(excel_path, excel_modified)
 
 # === Get the codes for annotation ===
 # Read in the codebook
@@ -187,45 +376,11 @@ codebook_path = os.path.join(os.path.dirname(__file__), "codebook_for_app.csv")
 
 # `getmtime`` returns the last modified time as a float (seconds since epoch)
 last_modified = os.path.getmtime(codebook_path) if os.path.exists(codebook_path) else 0
-df = load_codebook(codebook_path, last_modified)
-
-# Create dictionary to store sections preserving code
-ordered_fields = df.select(["section", "code"]).iter_rows(named=True)
-field_sections = {}
-for row in ordered_fields:
-    sec = row["section"]
-    code = row["code"]
-    if sec not in field_sections:
-        field_sections[sec] = []
-    field_sections[sec].append(code)
-
-# Create dictionary to store description for each code
-field_descriptions = {
-    row["code"]: row["description"]
-    for row in df.select(["code", "description"]).iter_rows(named=True)
-}
-
-# Get list of codes for checkboxes (check all that apply):
-checkall_codes = df.filter(pl.col("checkall") == "yes").select("code").to_series().to_list()
-
-# Create dictionary to store default values for relevant codes
-default_values_df = df.filter(pl.col("default").is_not_null()).select(["code", "default"])
-default_values = {
-    row["code"]: row["default"] for row in default_values_df.iter_rows(named=True)
-}
-
-# Create dictionary to store list of values for codes
-codebook_values_df = df.filter(pl.col("values").is_not_null()).select(["code", "values"])
-codebook_values = {
-    row["code"]: [v.strip() for v in row["values"].split("; ")]
-    for row in codebook_values_df.iter_rows(named=True)
-}
-
-# Create dictionary for the help descriptions
-help_descriptions = {
-    row["code"]: row["help"]
-    for row in df.select(["code", "help"]).iter_rows(named=True)
-}
+codebook = load_codebook_schema(codebook_path, last_modified)
+
+# Open annotations.db (in the working directory) with a model built from the
+# same codebook as the forms; only the first run in the process does any work
+db.init_db(db.DATABASE_FILE, codebook_path)
 
 # Create list of specific code that might be tricky. We'll add a comment box
 # for each of these...
@@ -254,7 +409,23 @@ st.markdown("""
 # Sidebar for mode selection
 # mode = st.sidebar.radio("Select mode:", ["Article Dashboard", "Add Entry", "Review Entries"])
 
+# Coder ID: annotations are saved under it, so several coders can code the
+# same experiment (for reliability checks). It is kept in the URL so that it
+# survives the Home button and reloads; blank is the default, single coder.
+coder_id = st.sidebar.text_input(
+    "Coder ID",
+    value=st.query_params.get("coder", ""),
+    key="coder_id",
+    help="Your initials or name. Leave blank if only one person codes."
+).strip()
+if coder_id != st.query_params.get("coder", ""):
+    if coder_id:
+        st.query_params["coder"] = coder_id
+    else:
+        del st.query_params["coder"]
+
 # Sidebar Home button
+coder_field = f'<input type="hidden" name="coder" value="{html.escape(coder_id)}">' if coder_id else ""
 st.sidebar.markdown(
     """
     <style>
@@ -276,13 +447,19 @@ st.sidebar.markdown(
         text-decoration: none !important;
     }
     </style>
+    """ + f"""
     <form action="/?mode=Article+Dashboard" method="get">
         <button type="submit" class="home-button">Dashboard Home</button>
+        {coder_field}
     </form>
     """,
     unsafe_allow_html=True
 )
 
+if st.sidebar.button("📊 Summaries", key="summaries_button"):
+    st.query_params.update({"mode": "Summaries"})
+    st.rerun()
+
 # Get mode from URL query param, default to dashboard
 mode = st.query_params.get("mode", "Article Dashboard")
 
@@ -291,6 +468,30 @@ query_mode = st.query_params.get("mode")
 if query_mode:
     mode = query_mode
 
+# === Performance panel (opt in) ===
+# Timing is on or off for the whole server process, so the box shows the
+# process's current setting and ticking or unticking it changes it for every
+# session
+def toggle_perf():
+    perf.enable(st.session_state["perf_panel"])
+
+
+st.session_state["perf_panel"] = perf.ENABLED
+if st.sidebar.checkbox("⏱️ Performance panel", key="perf_panel", on_change=toggle_perf):
+    with st.sidebar.expander("Performance", expanded=True):
+        stages = perf.snapshot()
+        if stages:
+            st.dataframe(pl.DataFrame(stages), hide_index=True)
+            st.download_button(
+                "Download timings (JSON lines)",
+                perf.to_jsonl(),
+                file_name="perf_timings.jsonl",
+                mime="application/x-ndjson",
+            )
+            st.button("Reset timings", on_click=perf.reset)
+        else:
+            st.caption("Timings appear from the next rerun.")
+
 # Clear button check logic
 if st.session_state.get("confirm_clear", False):
     with st.expander("⚠️ Confirm Clear Fields"):
@@ -298,13 +499,13 @@ if st.session_state.get("confirm_clear", False):
         col1, col2 = st.columns(2)
         if col1.button("Yes, clear all fields"):
             # Clear all coding fields (but keep metadata)
-            preserved = ["article_index", "title", "author", "journal", "year", "url", "searchterms"]
+            preserved = ["article_index", "title", "author", "journal", "year", "url", "searchterms", "coder_id"]
             for field in list(st.session_state.keys()):
                 if field not in preserved and not field.startswith("_"):  # Avoid Streamlit internals
                     st.session_state[field] = ""
             st.session_state["confirm_clear"] = False
             st.success("Annotation fields cleared.")
-            st.experimental_rerun()
+            st.rerun()
 
         if col2.button("Cancel"):
             st.session_state["confirm_clear"] = False
@@ -328,127 +529,170 @@ if mode == "Article Dashboard":
         )
         sort_descending = st.checkbox("Sort descending", value=False)
 
+        page_size = st.selectbox(
+            "Articles per page",
+            options=PAGE_SIZE_OPTIONS,
+            index=PAGE_SIZE_OPTIONS.index(DEFAULT_PAGE_SIZE),
+            key="page_size"
+        )
+
+        render_live_progress(catalog.height)
+
         # 🔹 Spacer to push download to the bottom
         st.markdown("<div style='flex:1'></div>", unsafe_allow_html=True)
 
         # 🔹 Bottom section: download button
         st.markdown("### Download")
-        try:
-            session = SessionLocal()
-            df = pd.read_sql("SELECT * FROM annotations", session.bind)
-            session.close()
-        except Exception as e:
-            st.error(f"Could not load annotations: {e}")
-            df = pd.DataFrame()
-
-        if not df.empty:
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-            export_filename = f"annotations_from_articles_{timestamp}.csv"
-
-            # Insert the button *inside* the styled box
-            st.download_button(
-                label="📥 Download annotations as CSV",
-                data=df.to_csv(index=False),
-                file_name=export_filename,
-                mime="text/csv",
-                key="download_csv_button"
-            )
-        else:
+        if not db.coded_index.coded_articles():
             st.info("No annotations available yet.")
+        else:
+            export_format = st.selectbox("Export format", available_formats(), key="export_format")
+            data_version = db.db_version.current()
+
+            # The export is only built when asked for, and is dropped again
+            # once the database changes underneath it
+            if st.button("Prepare export", key="prepare_export_button"):
+                st.session_state["export_request"] = (export_format, data_version)
+
+            if st.session_state.get("export_request") == (export_format, data_version):
+                try:
+                    data = build_annotation_export(db.DATABASE_PATH, export_format, data_version)
+                except Exception as e:
+                    st.error(f"Could not export annotations: {e}")
+                else:
+                    extension, mime = EXPORT_FORMATS[export_format]
+                    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+                    export_filename = f"annotations_from_articles_{timestamp}{extension}"
+
+                    st.download_button(
+                        label=f"📥 Download annotations as {export_format}",
+                        data=data,
+                        file_name=export_filename,
+                        mime=mime,
+                        key="download_csv_button"
+                    )
+
+        # How the workbook was loaded when the catalog was last built
+        if workbook_load_report["source"] != "missing":
+            st.caption(
+                f"Articles loaded from {workbook_load_report['source']} "
+                f"in {workbook_load_report['seconds'] * 1000:.0f} ms"
+            )
 
-
-    if not journal_articles:
+    if not journal_names:
         st.warning(f"No article file found at '{excel_path}'")
     else:
-        # ✅ Load coded entries from SQLite, using timestamp for cache busting
-        last_modified = os.path.getmtime("annotations.db")
-        coded_df = load_coded_df("annotations.db", last_modified)
+        # ✅ Coded status comes from the in-process index, which is only
+        # rebuilt when annotations.db is changed from outside this process.
+        # It is this coder's status: others' annotations don't count.
+        coded_articles = list(db.coded_index.coded_articles(coder_id))
+
+        # Only the selected journal is rendered: st.tabs would build every
+        # journal's table on every rerun, even the hidden ones
+        journal_name = st.radio(
+            "Journal",
+            journal_names,
+            horizontal=True,
+            key="active_journal",
+            label_visibility="collapsed"
+        )
 
-        if coded_df.is_empty():
-            coded_articles = []
-        else:
-            coded_articles = coded_df.select("article_index").unique().to_series().to_list()
+        if journal_name in sheets_without_index:
+            st.warning(f"Sheet '{journal_name}' is missing the 'article_index' column and cannot create one.")
+            st.stop()
 
-        tabs = st.tabs(list(journal_articles.keys()))
+        # The journal's rows are one contiguous slice of the catalog
+        first_row, end_row = catalog_journals.get(journal_name, (0, 0))
+        num_total = end_row - first_row
+        if num_total > 0:
+            # Filled in once the query below has run
+            status_message = st.empty()
+
+            # Add a search box just above the article list
+            search_col, fuzzy_col = st.columns([8, 2])
+            search_query = search_col.text_input(
+                f"🔍 Search articles in {journal_name}",
+                key=f"search_{journal_name}",
+                help="Finds articles with a word in the title, authors or index starting with each word you type."
+            )
+            fuzzy_search = fuzzy_col.checkbox(
+                "Fuzzy match",
+                key=f"fuzzy_{journal_name}",
+                help="Tolerate typos; results are ordered by how well they match."
+            )
 
-        for i, (journal_name, df) in enumerate(journal_articles.items()):
-            with tabs[i]:
-                df = df.clone()  # polars doesn't have .copy(); use .clone() instead
-                
-                if "Include" in df.columns:
-                    df = df.with_columns(
-                        pl.col("Include").cast(str).fill_null("").alias("Include")
-                    ).filter(pl.col("Include") != "x")
-                if df.height > 0:
-                    df = df.rename({col: col.strip().lower().replace(" ", "_") for col in df.columns if isinstance(col, str)})
-
-                    if "article_index" not in df.columns:
-                        if "title" in df.columns and "date" in df.columns:
-                            df = df.with_columns([
-                                pl.struct(["author"]).map_elements(lambda x: abbreviate_authors(x["author"]), return_dtype=pl.Utf8).alias("author_abbr"),
-                                pl.col("date").cast(pl.Utf8).alias("date_str"),
-                                pl.struct(["title"]).map_elements(lambda x: abbreviate_title(x["title"]), return_dtype=pl.Utf8).alias("title_abbr")
-                            ])
-                            df = df.with_columns(
-                                (pl.col("author_abbr") + "_" + pl.col("date_str") + "_" + pl.col("title_abbr")).alias("article_index")
-                            )
-                        else:
-                            st.warning(f"Sheet '{journal_name}' is missing the 'article_index' column and cannot create one.")
-                            continue
-
-                    df = df.with_columns([
-                        pl.when(pl.col("article_index").is_in(coded_articles))
-                        .then(pl.lit("✅ Coded"))
-                        .otherwise(pl.lit("❌ Not coded"))
-                        .alias("Status"),
-
-                        pl.col("url").fill_null("").map_elements(lambda x: f"[Open]({x})", return_dtype=pl.Utf8).alias("Link")
-                    ])
-
-                    if filter_option == "Coded":
-                        filtered_df = df.filter(pl.col("Status") == "✅ Coded")
-                    elif filter_option == "Not coded":
-                        filtered_df = df.filter(pl.col("Status") == "❌ Not coded")
+            # One lazy plan per rerun: slice out the journal, keep only the
+            # table's columns, add coded status, filter, search and sort, and
+            # collect it together with the coded count so the shared part
+            # runs once. No intermediate frame is materialized.
+            with perf.timed("journal_query") as timer:
+                journal_lf = (
+                    catalog.lazy()
+                    .slice(first_row, num_total)
+                    .select([c for c in TABLE_COLUMNS if c in catalog.columns])
+                    .with_columns(pl.col("article_index").is_in(coded_articles).alias("coded"))
+                )
+                counts_lf = journal_lf.select(pl.col("coded").sum().alias("num_coded"))
+
+                table_lf = journal_lf
+                if filter_option == "Coded":
+                    table_lf = table_lf.filter(pl.col("coded"))
+                elif filter_option == "Not coded":
+                    table_lf = table_lf.filter(~pl.col("coded"))
+
+                # Fuzzy results are cut to the best few, after filtering
+                result_limit = None
+                if search_query:
+                    # Look the query up in the prebuilt word index rather than
+                    # scanning every title; the query is never treated as a regex
+                    search_index = load_search_index(excel_path, excel_modified)
+                    if fuzzy_search:
+                        from search import SEARCH_LIMIT as result_limit
+
+                        hits = search_index.fuzzy_search(search_query, journal_name, limit=None)
                     else:
-                        filtered_df = df
-
-                    num_coded = df.filter(pl.col("Status") == "✅ Coded").height
-                    num_total = df.height
-
-                    # Messages above table
-                    st.markdown(f"Articles coded in *{journal_name}* so far: {num_coded} / {num_total}. **Note that some articles may involve more than one experiment.**")
-
-                    # st.markdown("### Articles")
-
-                    # Add a search box just above the article list
-                    search_query = st.text_input(f"🔍 Search articles in {journal_name}", key=f"search_{journal_name}")
-
-                    if search_query:
-                        # Create searchable text field
-                        filtered_df = filtered_df.with_columns([
-                            (
-                                pl.col("title").fill_null("") + " " +
-                                pl.col("author").fill_null("") + " " +
-                                pl.col("article_index").fill_null("")
-                            ).alias("search_text")
-                        ])
-                        
-                        # Filter using case-insensitive match
-                        filtered_df = filtered_df.filter(
-                            pl.col("search_text").str.to_lowercase().str.contains(search_query.lower())
-                        )
-                    
-                    # sort the dataframe
-                    filtered_df = filtered_df.sort(sort_column, descending=sort_descending)
-
-                    # Render the articles for the journal
-                    render_article_table(filtered_df, journal_name)
+                        hits = search_index.search(search_query, journal_name)
+                    ranks = pl.LazyFrame({
+                        "catalog_row": pl.Series(hits, dtype=catalog.schema["catalog_row"]),
+                        "search_rank": pl.Series(range(len(hits)), dtype=pl.UInt32),
+                    })
+                    table_lf = table_lf.join(ranks, on="catalog_row", how="inner")
+
+                # sort the dataframe (fuzzy results keep their match ranking)
+                if search_query and fuzzy_search:
+                    table_lf = table_lf.sort("search_rank").head(result_limit + 1)
                 else:
-                    st.info(f"No articles found for {journal_name}.")
-                   
+                    table_lf = table_lf.sort(sort_column, descending=sort_descending)
+
+                filtered_df, counts = pl.collect_all([table_lf, counts_lf])
+                num_coded = counts["num_coded"][0]
+                truncated = result_limit is not None and filtered_df.height > result_limit
+                if truncated:
+                    filtered_df = filtered_df.head(result_limit)
+                timer.rows = filtered_df.height
+
+            # Messages above table
+            status_message.markdown(f"Articles coded in *{journal_name}* so far: {num_coded} / {num_total}. **Note that some articles may involve more than one experiment.**")
+
+            if truncated:
+                st.caption(
+                    f"Results truncated: showing the {result_limit} best fuzzy matches. "
+                    "Add words to the search, or untick Fuzzy match to see every article that matches."
+                )
+
+            # Render the articles for the journal
+            render_article_table(filtered_df, journal_name, page_size)
+        else:
+            st.info(f"No articles found for {journal_name}.")
+
 
 # === Mode: Add Entry ====================================================
 elif mode == "Add Entry":
+    # Articles reporting several experiments are coded in one form and saved
+    # in one transaction
+    num_experiments = st.number_input(
+        "Experiments in this article", min_value=1, max_value=MAX_EXPERIMENTS, step=1, key="add_num_experiments"
+    )
     with st.form("coding_form_add"):
         # Pre-fill metadata if selected from dashboard
         selected_article = st.session_state.get("selected_article", {})
@@ -460,6 +704,7 @@ elif mode == "Add Entry":
         if prefill["author"] and prefill["date"]:
             header += f" — {abbreviate_authors(prefill['author'])} ({prefill['date']})"
         st.subheader(header)
+        render_draft_notice()
 
         new_entry = {
             "article_index": prefill['article_index'],
@@ -468,7 +713,8 @@ elif mode == "Add Entry":
             "title": prefill["title"],
             "journal": prefill["journal"],
             "url": prefill['url'],
-            "searchterms": prefill['searchterm']
+            "searchterms": prefill['searchterm'],
+            "coder": coder_id
         }
 
         st.markdown("### Metadata")
@@ -480,43 +726,44 @@ elif mode == "Add Entry":
         url = st.text_input("URL", value=prefill["url"])
         searchterm = st.text_input("Search terms", value=prefill['searchterm'])
 
-        field_counter = 0
-        for section, fields in field_sections.items():
-            st.markdown(f"### {section}")
-            for i, field in enumerate(fields):
-                field_counter += 1
-                description_text = field_descriptions.get(field, "")
-                description_text = f"[{field_counter+1}]. {description_text}"
-                help_text = help_descriptions.get(field, "")
-                default = default_values.get(field, "")
-                label = description_text if description_text else field.replace("_", " ").capitalize()
-                
-                if field in checkall_codes:
-                    options = codebook_values[field]
-                    selection = st.multiselect(label, options, default=["Not Reported"], help=help_text, key=field)
-                    new_entry[field] = "; ".join(selection)
-                elif field in codebook_values:
-                    options = codebook_values.get(field)
-                    if default in options:
-                        index = options.index(default)
-                    else:
-                        index = 0
-                    # new_entry[field] = st.selectbox(label, [""] + options, index=index, key=field, help=help_text)
-                    new_entry[field] = st.radio(label, options, index=index, key=field, help=help_text, horizontal=True)
-                elif field in ["instructions", "coder_comments"]:
-                    new_entry[field] = st.text_area(label, key=field)
-                else:
-                    new_entry[field] = st.text_input(label, value=default, key=field, help=help_text)
-
-                if field in commentable_fields_expandable:
-                    with st.expander(f"Add comment on {field.replace('_', ' ').capitalize()} (optional)"):
-                        new_entry[f"{field}_comment"] = st.text_area("", key=f"{field}_comment")
-                
-                # change_label_style(label, '20px')
-
-        col1, col2, spacer = st.columns([2, 1, 7])
+        if num_experiments == 1:
+            inactive_fields, newly_shown = conditional_fields("add", {})
+            for section, specs in codebook.sections.items():
+                st.markdown(f"### {section}")
+                for spec in specs:
+                    render_add_field(spec, new_entry, inactive_fields)
+            entries = [new_entry]
+        else:
+            # Article-level codes are answered once and copied to every
+            # experiment; the rest get one tab per experiment
+            new_entry["N_experiments"] = num_experiments
+            inactive_fields, newly_shown = conditional_fields("add", {})
+            st.markdown("### Article")
+            for spec in codebook:
+                if spec.scope == "article" and spec.code != "N_experiments":
+                    render_add_field(spec, new_entry, inactive_fields)
+
+            entries = []
+            tabs = st.tabs([f"Experiment {n}" for n in range(1, num_experiments + 1)])
+            for n, tab in enumerate(tabs, start=1):
+                suffix = f"__exp{n}"
+                entry = dict(new_entry, experiment_number=n)
+                inactive_fields, shown = conditional_fields(f"add{suffix}", {}, suffix)
+                newly_shown |= shown
+                with tab:
+                    for section, specs in codebook.sections.items():
+                        specs = [spec for spec in specs if spec.scope == "experiment" and spec.code != "experiment_number"]
+                        if specs:
+                            st.markdown(f"### {section}")
+                        for spec in specs:
+                            render_add_field(spec, entry, inactive_fields, suffix)
+                entries.append(entry)
+
+        col1, col2, col3, spacer = st.columns([2, 1, 1.5, 5.5])
         with col1:
             submitted = st.form_submit_button("Submt New Annotation")
+        with col3:
+            save_draft = st.form_submit_button("💾 Save draft")
         with col2:
             cancel = st.form_submit_button("❌ Cancel")
             st.markdown(
@@ -536,74 +783,106 @@ elif mode == "Add Entry":
     if clear_clicked:
         st.session_state["confirm_clear"] = True
 
+    # Any of the form's buttons brings its answers to the server; keep them
+    # as a draft until they are saved
+    suffixes = [""] + [f"__exp{n}" for n in range(1, num_experiments + 1)]
+    if submitted or save_draft:
+        autosave_draft(prefill["article_index"], WHOLE_ARTICLE, ["add_num_experiments"] + form_widget_keys(suffixes))
+
     if cancel:
+        discard_draft(prefill["article_index"], WHOLE_ARTICLE)
         st.query_params.update({"mode": "Article Dashboard"})
         st.rerun()
+    elif save_draft:
+        st.success("Draft saved. It is restored when you reopen this article from the dashboard.")
+    elif submitted and newly_shown:
+        st.warning("Your answers added questions to the form; please answer them and submit again.")
+
     elif submitted:
         try:
-            save_annotation(new_entry)
-            st.success("New annotation saved!")
+            db.save_annotations(entries)
+            discard_draft(prefill["article_index"], WHOLE_ARTICLE)
+            st.success("New annotation saved!" if len(entries) == 1 else f"{len(entries)} experiments saved!")
         except Exception as e:
             st.error(f"Error: {e}")
 
-        load_coded_df.clear()
         st.query_params.update({"mode": "Article Dashboard"})
         st.rerun()
 
 # === Mode: Review Entries =========================================
 elif mode == "Review Entry":
+    # An article with several coded experiments is reviewed one experiment
+    # at a time
+    review_experiments = st.session_state.get("review_experiments") or {}
+    if len(review_experiments) > 1:
+        st.selectbox(
+            "Experiment", list(review_experiments), key="review_experiment", on_change=select_review_experiment
+        )
+
     with st.form("coding_form_review"):
         selected_article = st.session_state.get("selected_article", {})
         if not selected_article:
             st.warning("No article selected for review.")
             st.stop()
 
-        metadata_fields = ["article_index", "title", "author", "journal", "year", "url", "searchterms"]
+        # Stored annotations name the authors column "authors" (the catalog
+        # calls it "author")
+        metadata_fields = ["article_index", "title", "authors", "journal", "year", "url", "searchterms"]
         prefill = {field: selected_article.get(field, "") for field in metadata_fields}
+        experiment_number = str(selected_article.get("experiment_number") or "1")
 
-        st.subheader(f"Update Annotation — {prefill.get('article_index', '')}")
+        st.subheader(f"Update Annotation — {prefill.get('article_index', '')} (experiment {experiment_number})")
+        render_draft_notice()
 
         new_entry = {
             "article_index": prefill['article_index'],
-            "authors": prefill['author'],
+            "authors": prefill['authors'],
             "year": prefill['year'],
             "title": prefill["title"],
             "journal": prefill["journal"],
             "url": prefill['url'],
-            "searchterms": prefill['searchterms']
+            "searchterms": prefill['searchterms'],
+            "experiment_number": experiment_number,
+            "coder": coder_id
         }
 
         st.markdown("### Metadata")
         article_index = st.text_input("Article ID", value=prefill["article_index"], disabled=True)
         title = st.text_input("Title", value=prefill["title"])
-        authors = st.text_input("Authors", value=prefill["author"])
+        authors = st.text_input("Authors", value=prefill["authors"])
         year = st.text_input("Year", value=prefill["year"])
         journal = st.text_input("Journal", value=prefill["journal"])
         url = st.text_input("URL", value=prefill["url"])
         searchterm = st.text_input("Search terms", value=prefill["searchterms"])
 
-        for section, fields in field_sections.items():
+        inactive_fields, newly_shown = conditional_fields("review", selected_article)
+        for section, specs in codebook.sections.items():
             st.markdown(f"### {section}")
-            for i, field in enumerate(fields):
-                description_text = field_descriptions.get(field, "")
-                description_text = f"[{i+1}]. {description_text}"
-                help_text = help_descriptions.get(field, "")
-                default = default_values.get(field, "")
-                label = description_text if description_text else field.replace("_", " ").capitalize()
-
-                if field in checkall_codes:
-                    options = codebook_values[field]
+            for i, spec in enumerate(specs):
+                field = spec.code
+                if field in inactive_fields:
+                    new_entry[field] = None
+                    continue
+                # The stored answer, unless a draft of this form replaces it
+                default = stored_default(spec, selected_article)
+                label = f"[{i+1}]. {spec.description}"
+
+                if field == "experiment_number":
+                    # Part of the annotation's key: pick another experiment above
+                    st.text_input(label, value=experiment_number, disabled=True, help=spec.help)
+                elif spec.widget == "multiselect":
                     current = [v.strip() for v in default.split(";")] if default else ["Not Reported"]
-                    selection = st.multiselect(label, options, default=current, help=help_text, key=field)
+                    current = [v for v in draft_default(field, current) if v in spec.options]
+                    selection = st.multiselect(label, spec.options, default=current, help=spec.help, key=field)
                     new_entry[field] = "; ".join(selection)
-                elif field in codebook_values:
-                    options = codebook_values.get(field)
-                    index = options.index(default) + 1 if default in options else 0
-                    new_entry[field] = st.selectbox(label, [""] + options, index=index, key=field, help=help_text)
-                elif field in ["instructions", "coder_comments"]:
-                    new_entry[field] = st.text_area(label, value=default, key=field)
+                elif spec.widget == "choice":
+                    default = draft_default(field, default)
+                    index = spec.options.index(default) + 1 if default in spec.options else 0
+                    new_entry[field] = st.selectbox(label, ("",) + spec.options, index=index, key=field, help=spec.help)
+                elif spec.widget == "text_area":
+                    new_entry[field] = st.text_area(label, value=draft_default(field, default), key=field)
                 else:
-                    new_entry[field] = st.text_input(label, value=default, key=field, help=help_text)
+                    new_entry[field] = st.text_input(label, value=draft_default(field, default), key=field, help=spec.help)
                 
                 # change_label_style(label, '20px')
 
@@ -611,11 +890,15 @@ elif mode == "Review Entry":
                 comment_default = selected_article.get(f"{field}_comment", "")
                 if field in commentable_fields_expandable:
                     with st.expander(f"Add comment on {field.replace('_', ' ').capitalize()} (optional)"):
-                        new_entry[f"{field}_comment"] = st.text_area("", value=comment_default, key=f"{field}_comment")
+                        new_entry[f"{field}_comment"] = st.text_area(
+                            "", value=draft_default(f"{field}_comment", comment_default), key=f"{field}_comment"
+                        )
 
-        col1, col2, spacer = st.columns([2, 1, 7])
+        col1, col2, col3, spacer = st.columns([2, 1, 1.5, 5.5])
         with col1:
             submitted = st.form_submit_button("Update Entry")
+        with col3:
+            save_draft = st.form_submit_button("💾 Save draft")
         with col2:
             cancel = st.form_submit_button("❌ Cancel")
             st.markdown(
@@ -635,21 +918,88 @@ elif mode == "Review Entry":
     if clear_clicked:
         st.session_state["confirm_clear"] = True
 
+    if submitted or save_draft:
+        autosave_draft(prefill["article_index"], experiment_number, form_widget_keys([""]))
+
     if cancel:
+        discard_draft(prefill["article_index"], experiment_number)
         st.query_params.update({"mode": "Article Dashboard"})
         st.rerun()
 
+    elif save_draft:
+        st.success("Draft saved. It is restored when you reopen this article from the dashboard.")
+    elif submitted and newly_shown:
+        st.warning("Your answers added questions to the form; please answer them and submit again.")
+
     elif submitted:
         try:
-            save_annotation(new_entry)
+            db.save_annotation(new_entry)
+            discard_draft(prefill["article_index"], experiment_number)
             st.success("Entry updated!")
         except Exception as e:
             st.error(f"Error: {e}")
 
 
-        load_coded_df.clear()
         st.query_params.update({"mode": "Article Dashboard"})
         st.rerun()
 
 
+# === Mode: Summaries ====================================================
+elif mode == "Summaries":
+    st.subheader("Summaries of the coded experiments")
+
+    if not db.coded_index.coded_articles():
+        st.info("No annotations available yet.")
+        st.stop()
+
+    view = st.radio("Show", ["Answers", "Inter-coder reliability"], horizontal=True, key="summary_view")
+    if view == "Answers":
+        grouping = st.radio("Split by", list(GROUPINGS), horizontal=True, key="summary_grouping")
+    section = st.selectbox("Codebook section", list(codebook.sections), key="summary_section")
 
+    if view == "Inter-coder reliability":
+        # Experiments saved under two or more Coder IDs
+        scores = load_reliability(db.DATABASE_PATH, db.db_version.current(), codebook_path, last_modified)
+        if scores.is_empty() or scores["experiments"].max() == 0:
+            st.info("No experiment has been coded by two coders yet. Coders set their Coder ID in the sidebar.")
+            st.stop()
+        st.caption(
+            "Agreement is the share of matching answers between coders. Cohen's kappa compares the two "
+            "coders of each experiment; Krippendorff's alpha allows any number (nominal for choices, "
+            "interval for numbers). Checkall codes are scored as one yes/no judgment per answer."
+        )
+        table = scores.filter(pl.col("section") == section).drop("section")
+        if table.is_empty():
+            st.info(f"The codes in {section} are free text, so agreement isn't scored.")
+        else:
+            st.dataframe(table, hide_index=True)
+        st.stop()
+
+    summaries = load_summaries(db.DATABASE_PATH, grouping, db.db_version.current(), codebook_path, last_modified)
+    by = GROUPINGS[grouping]
+
+    # Which summary holds each codebook type; text codes aren't summarized
+    summary_kinds = {"choice": "choice", "multi": "multi", "integer": "numeric", "float": "numeric"}
+    specs = [spec for spec in codebook.sections[section] if spec.type in summary_kinds]
+    if not specs:
+        st.info(f"The codes in {section} are free text, so there is nothing to count.")
+    shown = 0
+    for spec in specs:
+        kind = summary_kinds[spec.type]
+        if summaries[kind].is_empty():
+            continue
+        table = summaries[kind].filter(pl.col("code") == spec.code).drop("code", "section")
+        if table.is_empty():
+            continue
+
+        st.markdown(f"**[{spec.number + 1}]. {spec.description}** (`{spec.code}`)")
+        if kind == "multi":
+            st.caption("Experiments ticking each answer; an experiment can tick several.")
+        if by and kind != "numeric":
+            # One column of counts per journal/year
+            table = table.pivot(on=by[0], index="value", values="n", sort_columns=True).fill_null(0)
+        st.dataframe(table, hide_index=True)
+        shown += 1
+
+    if specs and not shown:
+        st.info(f"No codes in {section} have been answered yet.")
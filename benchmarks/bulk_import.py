@@ -0,0 +1,70 @@
+# Benchmark: cli.py bulk import and streamed export throughput against a
+# fresh annotations.db, for a synthetic CSV of valid annotations.
+#
+# Run from the repo root:  python -m benchmarks.bulk_import [rows]
+import csv
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.generate import random_answers
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_csv(db, path, num_rows, seed=0):
+    from codebook import CodebookSchema
+
+    schema = CodebookSchema.from_csv(db.CODEBOOK_FILE)
+    columns = ["article_index", "experiment_number", "authors", "year", "title", "journal"] + [
+        field for field in db.code_fields if field != "experiment_number"
+    ]
+    rng = random.Random(seed)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(columns)
+        for i in range(num_rows):
+            answers = random_answers(schema, rng)
+            writer.writerow(
+                [f"article_{i // 3}", i % 3 + 1, f"Author {i}", 2000 + i % 25, f"Title {i}", "Journal"]
+                + [answers[field] for field in columns[6:]]
+            )
+
+
+def main(num_rows=100_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        # db.py creates annotations.db next to the working directory's codebook
+        shutil.copy(os.path.join(REPO_ROOT, "codebook_for_app.csv"), tmp)
+        os.chdir(tmp)
+        sys.path.insert(0, REPO_ROOT)
+        import cli
+        import db
+        from export import available_formats, write_export
+
+        source = os.path.join(tmp, "source.csv")
+        write_csv(db, source, num_rows)
+        size_mb = os.path.getsize(source) / 1e6
+
+        print(f"{num_rows:,} rows, {size_mb:.1f} MB CSV")
+        for label in ("import (insert)", "import (update)"):
+            start = time.perf_counter()
+            imported, rejected = cli.import_annotations(source)
+            elapsed = time.perf_counter() - start
+            assert imported == num_rows and not rejected, rejected[:3]
+            print(f"{label:<18} {elapsed:>7.2f} s  {imported / elapsed:>10,.0f} rows/s")
+
+        for export_format in available_formats():
+            start = time.perf_counter()
+            with open(os.path.join(tmp, "export.out"), "wb") as out:
+                exported = write_export(db.engine, export_format, out)
+            elapsed = time.perf_counter() - start
+            print(f"{'export ' + export_format:<18} {elapsed:>7.2f} s  {exported / elapsed:>10,.0f} rows/s")
+
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
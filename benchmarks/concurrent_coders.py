@@ -0,0 +1,127 @@
+# Load test: N coders saving and browsing at the same time against a fresh
+# annotations.db. Reports p50/p99 save and browse latency for the batched
+# writer in db.py, and for the old one-commit-per-save-under-a-lock approach.
+#
+# Run from the repo root:  python -m benchmarks.concurrent_coders [coders] [saves per coder]
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.generate import random_answers
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def make_entry(schema, label, coder, i, rng):
+    entry = random_answers(schema, rng)
+    entry.update({
+        "article_index": f"{label}{coder}_{2000 + i % 20}_article_{i}",
+        "experiment_number": "1",
+        "N_experiments": "1",
+        "authors": f"Coder {coder}",
+        "year": str(2000 + i % 20),
+        "title": f"Article {i}",
+        "journal": "Journal",
+    })
+    return entry
+
+
+def run(db, schema, label, save, num_coders, saves_per_coder):
+    save_times = []
+    browse_times = []
+    lock = threading.Lock()
+
+    def coder(c):
+        rng = random.Random(c)
+        my_saves, my_browses = [], []
+        for i in range(saves_per_coder):
+            entry = make_entry(schema, label, c, i, rng)
+            start = time.perf_counter()
+            save(entry)
+            my_saves.append(time.perf_counter() - start)
+
+            # Browse: dashboard status plus a Review lookup of a random row
+            start = time.perf_counter()
+            db.coded_index.coded_articles()
+            session = db.SessionLocal()
+            session.query(db.Annotation).filter(
+                db.Annotation.article_index == f"{label}{c}_{2000 + (i // 2) % 20}_article_{i // 2}"
+            ).first()
+            session.close()
+            my_browses.append(time.perf_counter() - start)
+        with lock:
+            save_times.extend(my_saves)
+            browse_times.extend(my_browses)
+
+    threads = [threading.Thread(target=coder, args=(c,)) for c in range(num_coders)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    return save_times, browse_times, elapsed
+
+
+def report(label, save_times, browse_times, elapsed):
+    ms = lambda v: v * 1000
+    print(
+        f"{label:<10} saves/s {len(save_times) / elapsed:>8.0f}   "
+        f"save p50 {ms(statistics.median(save_times)):>7.2f} ms  p99 {ms(percentile(save_times, 99)):>7.2f} ms   "
+        f"browse p50 {ms(statistics.median(browse_times)):>6.2f} ms  p99 {ms(percentile(browse_times, 99)):>6.2f} ms"
+    )
+
+
+def main(num_coders=16, saves_per_coder=50):
+    with tempfile.TemporaryDirectory() as tmp:
+        # db.py creates annotations.db next to the working directory's codebook
+        shutil.copy(os.path.join(REPO_ROOT, "codebook_for_app.csv"), tmp)
+        os.chdir(tmp)
+        sys.path.insert(0, REPO_ROOT)
+        import db
+        from codebook import CodebookSchema
+
+        schema = CodebookSchema.from_csv("codebook_for_app.csv")
+        print(f"{num_coders} coders x {saves_per_coder} saves, journal_mode="
+              f"{db.engine.connect().exec_driver_sql('PRAGMA journal_mode').scalar()}")
+
+        # The previous approach: one transaction per save behind a process lock
+        db_lock = threading.Lock()
+
+        def locked_save(entry):
+            with db_lock:
+                session = db.SessionLocal()
+                try:
+                    existing = session.query(db.Annotation).filter(
+                        db.Annotation.article_index == entry["article_index"],
+                        db.Annotation.experiment_number == entry["experiment_number"]
+                    ).first()
+                    if existing:
+                        for k, v in entry.items():
+                            setattr(existing, k, v)
+                    else:
+                        session.add(db.Annotation(**entry))
+                    session.commit()
+                finally:
+                    session.close()
+
+        # Each run codes its own articles, so both measure fresh inserts
+        report("locked", *run(db, schema, "Locked", locked_save, num_coders, saves_per_coder))
+        report("batched", *run(db, schema, "Batched", db.save_annotation, num_coders, saves_per_coder))
+
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,114 @@
+# Benchmark: recording form drafts from many sessions at once. Each session
+# thread records its form's answers over and over (as reruns would), and the
+# time of each call is what a rerun pays. Compares drafts.DraftStore, which
+# coalesces changes in memory and writes them from a background thread, with
+# committing every change on the calling thread. Also reports how many draft
+# rows each approach wrote.
+#
+# Run from the repo root:  python -m benchmarks.drafts [sessions] [changes per session]
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.concurrent_coders import percentile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Widget values per form, about the size of the Add Entry form
+NUM_FIELDS = 62
+
+
+def form_fields(session, change):
+    fields = {f"code_{i}": f"answer {session} {i}" for i in range(NUM_FIELDS)}
+    fields[f"code_{change % NUM_FIELDS}"] = f"changed {change}"
+    return fields
+
+
+def run(record, num_sessions, changes_per_session, interval):
+    times = []
+    lock = threading.Lock()
+
+    def session(s):
+        mine = []
+        for change in range(changes_per_session):
+            fields = form_fields(s, change)
+            start = time.perf_counter()
+            record(s, fields)
+            mine.append(time.perf_counter() - start)
+            time.sleep(interval)
+        with lock:
+            times.extend(mine)
+
+    threads = [threading.Thread(target=session, args=(s,)) for s in range(num_sessions)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return times, time.perf_counter() - start
+
+
+def main(num_sessions=16, changes_per_session=100, interval=0.01):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)
+        sys.path.insert(0, REPO_ROOT)
+        import db
+        from drafts import DraftStore
+
+        store = DraftStore(os.path.join(tmp, "store.drafts.db"))
+        # Count the rows each background write carries
+        writes = []
+        write_fn = store._write_fn
+        store._write_fn = lambda due: (writes.append(len(due)), write_fn(due))[1]
+
+        def record_store(s, fields):
+            store.update("coder", f"article_{s}", 0, fields)
+
+        # Every change committed on the calling thread, one connection per session
+        sync_path = os.path.join(tmp, "sync.drafts.db")
+        DraftStore(sync_path)  # creates the table
+        local = threading.local()
+        sync_rows = []
+
+        def record_sync(s, fields):
+            if not hasattr(local, "conn"):
+                local.conn = sqlite3.connect(sync_path, timeout=db.BUSY_TIMEOUT)
+                local.conn.execute("PRAGMA journal_mode=WAL")
+                local.conn.execute("PRAGMA synchronous=NORMAL")
+            with local.conn:
+                local.conn.execute(
+                    "INSERT INTO drafts VALUES (?, ?, 0, ?, ?) ON CONFLICT DO UPDATE "
+                    "SET fields = excluded.fields, saved_at = excluded.saved_at",
+                    ("coder", f"article_{s}", json.dumps(fields), time.time()),
+                )
+            sync_rows.append(1)
+
+        print(f"{num_sessions} sessions x {changes_per_session} changes, {interval * 1000:.0f} ms apart")
+        print(f"{'':<22} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} {'rows written':>13}")
+        for label, record in (("background (drafts)", record_store), ("commit per change", record_sync)):
+            times, elapsed = run(record, num_sessions, changes_per_session, interval)
+            if record is record_store:
+                store.flush()
+                rows = sum(writes)
+            else:
+                rows = len(sync_rows)
+            print(
+                f"{label:<22} {percentile(times, 50) * 1000:>8.3f} {percentile(times, 99) * 1000:>8.3f}"
+                f" {max(times) * 1000:>8.3f} {rows:>13,}"
+            )
+
+        # Every session's last answers made it to disk
+        conn = sqlite3.connect(store.engine.url.database)
+        stored = dict(conn.execute("SELECT article_index, fields FROM drafts").fetchall())
+        for s in range(num_sessions):
+            assert json.loads(stored[f"article_{s}"]) == form_fields(s, changes_per_session - 1), s
+        conn.close()
+        store.engine.dispose()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:3]])
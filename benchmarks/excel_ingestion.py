@@ -0,0 +1,54 @@
+# Benchmark: cold-start cost of each workbook ingestion path in
+# loaders.load_workbook (openpyxl, calamine if installed, and the Arrow
+# sidecar) on the bundled workbook or one given on the command line.
+#
+# Run from the repo root:  python -m benchmarks.excel_ingestion [workbook.xlsx]
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from loaders import calamine_available, load_workbook, read_workbook, sidecar_dir
+
+REPEATS = 3
+
+
+def best_of(fn, repeats=REPEATS):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main(excel_path):
+    # Work on a copy so the real workbook's sidecar is left alone
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, os.path.basename(excel_path))
+        shutil.copy2(excel_path, path)
+
+        engines = ["openpyxl"] + (["calamine"] if calamine_available() else [])
+        print(f"{'path':<22} {'ms':>10} {'rows':>8}")
+        for engine in engines:
+            t, (sheets, _) = best_of(lambda: read_workbook(path, engine))
+            print(f"{engine:<22} {t * 1000:>10.1f} {sum(df.height for df in sheets.values()):>8}")
+
+        shutil.rmtree(sidecar_dir(path), ignore_errors=True)
+        start = time.perf_counter()
+        sheets, report = load_workbook(path)
+        t = time.perf_counter() - start
+        print(f"{'sidecar build':<22} {t * 1000:>10.1f} {sum(df.height for df in sheets.values()):>8}  (parse via {report['source']})")
+
+        t, (sheets, report) = best_of(lambda: load_workbook(path))
+        assert report["source"] == "sidecar"
+        print(f"{'sidecar (mmap)':<22} {t * 1000:>10.1f} {sum(df.height for df in sheets.values()):>8}")
+
+        if not calamine_available():
+            print("(install `fastexcel` to enable the calamine engine)")
+
+
+if __name__ == "__main__":
+    default = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "test_articles_dataset.xlsx")
+    main(sys.argv[1] if len(sys.argv) > 1 else default)
@@ -0,0 +1,149 @@
+# Synthetic data for benchmarks: multi-sheet article workbooks shaped like
+# test_articles_dataset.xlsx, and annotations.db files filled with valid
+# random answers for every code in codebook_for_app.csv.
+#
+# Run from the repo root:
+#   python -m benchmarks.generate workbook out.xlsx [articles] [journals]
+#   python -m benchmarks.generate db out_dir [articles] [journals]
+import os
+import random
+import shutil
+import string
+import sys
+import time
+
+import polars as pl
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Columns of each journal sheet, as in the bundled workbook
+SHEET_COLUMNS = ["URL", "SearchTerm", "Site", "Title", "Date", "Author", "Include"]
+SEARCH_TERMS = [
+    "acceptability judgment", "acceptability rating", "grammaticality judgment",
+    "naturalness rating", "sentence judgment", "syntactic judgment",
+]
+# Words every generated catalog contains, so benchmark queries have hits
+KNOWN_WORDS = ["syntax", "agreement", "island", "effects", "gradient", "acceptability", "magnitude", "estimation"]
+
+
+# === Workbooks ===
+def make_sheets(num_articles, num_journals, seed=0):
+    # {journal name: DataFrame} with num_articles rows spread over the sheets
+    rng = random.Random(seed)
+    vocab = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 10))) for _ in range(20_000)]
+    vocab += KNOWN_WORDS
+    surnames = [w.title() for w in rng.sample(vocab, 5_000)]
+    sheets = {}
+    for j in range(num_journals):
+        # The first sheets take the remainder so the total is exact
+        n = num_articles // num_journals + (j < num_articles % num_journals)
+        sheets[f"Journal {j}"] = pl.DataFrame({
+            "URL": [f"https://doi.org/10.0/{j}.{i}" for i in range(n)],
+            "SearchTerm": ["; ".join(rng.sample(SEARCH_TERMS, rng.randint(1, 3))) for _ in range(n)],
+            "Site": ["JSTOR (1993-2020)"] * n,
+            "Title": [" ".join(rng.choices(vocab, k=rng.randint(4, 12))).capitalize() for _ in range(n)],
+            "Date": [rng.randint(1990, 2024) for _ in range(n)],
+            "Author": ["; ".join(f"A. {rng.choice(surnames)}" for _ in range(rng.randint(1, 4))) for _ in range(n)],
+            "Include": [None] * n,
+        }, schema_overrides={"Include": pl.String})
+    return sheets
+
+
+def write_workbook(path, sheets):
+    # openpyxl's write-only mode streams rows instead of building every cell
+    from openpyxl import Workbook
+
+    wb = Workbook(write_only=True)
+    for name, df in sheets.items():
+        ws = wb.create_sheet(title=name[:31])
+        ws.append(SHEET_COLUMNS)
+        for row in df.select(SHEET_COLUMNS).iter_rows():
+            ws.append(row)
+    wb.save(path)
+    return path
+
+
+# === Annotation databases ===
+def random_answer(spec, rng):
+    # A valid answer for a codebook field (see codebook.FieldSpec)
+    if spec.type == "integer":
+        return "Not Reported" if rng.random() < 0.1 else str(rng.randint(0, 400))
+    if spec.type == "float":
+        return f"{rng.uniform(1, 100):.1f}"
+    if spec.options and spec.checkall:
+        return "; ".join(rng.sample(spec.options, rng.randint(1, min(3, len(spec.options)))))
+    if spec.options:
+        return rng.choice(spec.options)
+    return " ".join(rng.choices(["lorem", "ipsum", "dolor", "sit", "amet", "judgment", "rating"], k=rng.randint(1, 8)))
+
+
+def random_answers(schema, rng):
+    # code -> random_answer, for every code of a codebook.CodebookSchema
+    return {spec.code: random_answer(spec, rng) for spec in schema}
+
+
+def annotation_entries(catalog, schema, coded_fraction=0.3, max_experiments=4, seed=0):
+    # Yields one entry per experiment for a random share of the catalog's
+    # articles, with 1..max_experiments experiments each
+    rng = random.Random(seed)
+    for article in catalog.select("article_index", "author", "date", "title", "journal", "url").iter_rows(named=True):
+        if rng.random() >= coded_fraction:
+            continue
+        num_experiments = rng.choice([1, 1, 1, 2, 3, max_experiments])
+        for n in range(1, num_experiments + 1):
+            entry = random_answers(schema, rng)
+            entry.update({
+                "article_index": article["article_index"],
+                "experiment_number": str(n),
+                "N_experiments": num_experiments,
+                "authors": article["author"],
+                "year": str(article["date"]),
+                "title": article["title"],
+                "journal": article["journal"],
+                "url": article["url"],
+            })
+            yield entry
+
+
+def populate_annotations(db, entries, batch_size=2000):
+    # Saves entries through db.save_annotations, one transaction per batch;
+    # returns the number of rows written
+    batch = []
+    written = 0
+    for entry in entries:
+        batch.append(entry)
+        if len(batch) >= batch_size:
+            written += db.save_annotations(batch)
+            batch = []
+    if batch:
+        written += db.save_annotations(batch)
+    return written
+
+
+def main(kind, out, num_articles=100_000, num_journals=40):
+    from loaders import build_catalog
+
+    sheets = make_sheets(num_articles, num_journals)
+    start = time.perf_counter()
+    if kind == "workbook":
+        write_workbook(out, sheets)
+        print(f"wrote {out}: {num_articles:,} articles in {num_journals} sheets ({time.perf_counter() - start:.1f} s)")
+        return
+
+    # db.py creates annotations.db in the working directory, next to the codebook
+    os.makedirs(out, exist_ok=True)
+    shutil.copy(os.path.join(REPO_ROOT, "codebook_for_app.csv"), out)
+    os.chdir(out)
+    import db
+    from codebook import CodebookSchema
+
+    catalog, _, _ = build_catalog(sheets)
+    schema = CodebookSchema.from_csv("codebook_for_app.csv")
+    written = populate_annotations(db, annotation_entries(catalog, schema))
+    db.engine.dispose()
+    print(f"wrote {os.path.join(out, 'annotations.db')}: {written:,} rows ({time.perf_counter() - start:.1f} s)")
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, REPO_ROOT)
+    main(sys.argv[1], sys.argv[2], *[int(a) for a in sys.argv[3:5]])
@@ -0,0 +1,77 @@
+# Timing and peak-memory helpers shared by the benchmark suite. Timings are
+# reported the way pytest-benchmark does (min/median/mean/stddev over
+# rounds, after warmup calls), without needing pytest.
+import gc
+import os
+import statistics
+import threading
+import time
+import tracemalloc
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# How often the RSS sampler polls while a measured call runs
+RSS_SAMPLE_SECONDS = 0.002
+
+
+def measure(fn, rounds=5, warmup=1):
+    # Calls fn warmup + rounds times; returns stats over the timed rounds in ms
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "rounds": rounds,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "stddev": statistics.stdev(timings) if rounds > 1 else 0.0,
+    }
+
+
+def current_rss():
+    # Resident set size in bytes, or None where it can't be read cheaply
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_memory(fn):
+    # Runs fn once; returns (peak Python heap MB, peak RSS growth MB). The
+    # heap figure (tracemalloc) misses native buffers such as Polars/Arrow
+    # columns, which the RSS figure includes; RSS is None if unavailable.
+    gc.collect()
+    baseline = current_rss()
+    peak = [baseline]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(RSS_SAMPLE_SECONDS):
+            peak[0] = max(peak[0], current_rss())
+
+    sampler = threading.Thread(target=sample, daemon=True) if baseline is not None else None
+    if sampler:
+        sampler.start()
+    tracemalloc.start()
+    try:
+        fn()
+        _, heap_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        done.set()
+        if sampler:
+            sampler.join()
+    rss_growth = None
+    if baseline is not None:
+        rss_growth = max(peak[0], current_rss()) - baseline
+    return heap_peak / 1e6, rss_growth / 1e6 if rss_growth is not None else None
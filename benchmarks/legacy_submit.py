@@ -0,0 +1,111 @@
+# Benchmark: latency of one Submit Entry in test_annotation_app.py as
+# coded_studies.csv grows, for the old read + concat + rewrite of the whole
+# file versus csv_append.append_row. Also checks that an append after a
+# torn one (a crash mid-write) keeps every whole row, including notes with
+# line breaks.
+#
+# Run from the repo root:  python -m benchmarks.legacy_submit [max rows]
+import csv
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import pandas as pd
+
+from csv_append import append_row, csv_line
+
+SUBMITS_PER_SIZE = 20
+
+
+def make_entry(i):
+    return {
+        "StudyID": f"Author {i} ({2000 + i % 25})",
+        "Year": 2000 + i % 25,
+        "Journal": "Journal",
+        "Framework": "HPSG",
+        "Participants": 20 + i % 80,
+        "L1": "English",
+        "Recruitment": "Online",
+        "TaskType": "Likert Scale",
+        "Scale": "1-7",
+        "Instructions": "Rate how natural each sentence sounds",
+        "Phenomenon": "Island effects",
+        "Modality": "Written",
+        "SentenceLength": "9",
+        "TestItems": 24,
+        "Fillers": 48,
+        "Randomization": "Yes",
+        "StatMethod": "Mixed-effects regression",
+        "RandomEffects": "Participant, Item",
+        "EffectSizes": "Yes",
+        "DataShared": "No",
+        "Results": "Clear effect of the manipulation",
+        "Notes": "",
+        "Confidence": "High",
+    }
+
+
+def rewrite_submit(path, entry):
+    # What test_annotation_app.py used to do on every submit
+    new_entry = pd.DataFrame.from_records([entry])
+    try:
+        existing = pd.read_csv(path)
+        df = pd.concat([existing, new_entry], ignore_index=True)
+    except FileNotFoundError:
+        df = new_entry
+    df.to_csv(path, index=False)
+
+
+def grow_to(path, num_rows):
+    # Fill the file up to num_rows rows in one write
+    have = len(pd.read_csv(path)) if os.path.exists(path) else 0
+    if num_rows > have:
+        rows = pd.DataFrame.from_records([make_entry(i) for i in range(have, num_rows)])
+        rows.to_csv(path, mode="a", header=have == 0, index=False)
+
+
+def median_ms(submit, path, start):
+    times = []
+    for i in range(SUBMITS_PER_SIZE):
+        t = time.perf_counter()
+        submit(path, make_entry(start + i))
+        times.append((time.perf_counter() - t) * 1000)
+    return statistics.median(times)
+
+
+def check_torn_append(tmp):
+    # Rows whose notes span lines, then part of one more, cut right after a
+    # line break inside its notes, as a crash could leave it
+    path = os.path.join(tmp, "torn.csv")
+    rows = [dict(make_entry(i), Notes=notes) for i, notes in enumerate(["One\nTwo", 'Said "no"\n\n', ""])]
+    for row in rows:
+        append_row(path, row)
+    torn = csv_line(list(dict(make_entry(3), Notes="Cut\nhere").values()))
+    with open(path, "a", newline="") as f:
+        f.write(torn[:torn.index("\n") + 1])
+    rows.append(dict(make_entry(4), Notes="After"))
+    append_row(path, rows[-1])
+    with open(path, newline="") as f:
+        stored = list(csv.DictReader(f))
+    assert stored == [{k: str(v) for k, v in row.items()} for row in rows], stored
+
+
+def main(max_rows=100_000):
+    sizes = [size for size in (1_000, 10_000, 50_000, 100_000, 500_000) if size <= max_rows]
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"median ms per submit ({SUBMITS_PER_SIZE} submits per size; appends include fsync)")
+        print(f"{'rows in file':>12} {'rewrite':>10} {'append':>10}")
+        for size in sizes:
+            results = {}
+            for name, submit in [("rewrite", rewrite_submit), ("append", append_row)]:
+                path = os.path.join(tmp, f"{name}.csv")
+                grow_to(path, size)
+                results[name] = median_ms(submit, path, size)
+            print(f"{size:>12,} {results['rewrite']:>10.2f} {results['append']:>10.2f}")
+        check_torn_append(tmp)
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
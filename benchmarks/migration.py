@@ -0,0 +1,173 @@
+# Benchmark: bringing a populated annotations.db in line with a changed
+# codebook (migrate.py). Times adding a new code (ALTER TABLE ADD COLUMN),
+# changing a code's type (chunked table copy, with the longest time between
+# chunks, i.e. how long other processes' saves can be kept waiting) while a
+# coder keeps saving, and, for comparison, exporting the table and importing
+# it into a fresh database with cli.py. Checks that the copy lost no rows and
+# no concurrent save, and that it converts the changed code's values as the
+# form would (db.parse_number), reporting the ones it drops.
+#
+# Run from the repo root:  python -m benchmarks.migration [rows]
+import csv
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bulk_import import write_csv
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Codes whose type the benchmark changes (a float and a text code), and the
+# code it adds
+CHANGED_CODE = ("N_participants_per_item", "integer")
+TEXT_CODE = ("response_levels", "integer")
+NEW_CODE = {"id": "code_new", "section": "Notes", "code": "new_code", "type": "text", "scope": "experiment"}
+
+# Answers written into the text code before it becomes an integer code: signs
+# and exponents the form accepts, and malformed or fractional ones it rejects
+NUMBER_ANSWERS = ["-3", "1e3", "+2", " 12 ", "2.0", "1.2.3", ".", "2.7", "-", "e3", "Not reported"]
+
+
+def write_codebook(source, path, add=False, change=False):
+    with open(source, encoding="utf-8-sig", newline="") as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        for code, new_type in (CHANGED_CODE, TEXT_CODE):
+            if change and row["code"] == code:
+                row["type"] = new_type
+    if add:
+        rows.append({**dict.fromkeys(rows[0], ""), **NEW_CODE})
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def table_for(codebook_path):
+    import db
+    from codebook import CodebookSchema
+
+    _, annotation, _ = db.build_models(CodebookSchema.from_csv(codebook_path))
+    return annotation.__table__
+
+
+def keep_saving(db_path, stop, saved, waits):
+    # A coder updating existing rows and adding new ones until `stop` is set
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=30)
+    i = 0
+    while not stop.is_set():
+        start = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("UPDATE annotations SET title = ? WHERE article_index = ?", (f"Saved {i}", f"article_{i}"))
+        conn.execute(
+            "INSERT INTO annotations (article_index, experiment_number, coder, title) VALUES (?, '1', 'second', ?)",
+            (f"article_{i}", f"Saved {i}"),
+        )
+        conn.execute("COMMIT")
+        waits.append(time.perf_counter() - start)
+        saved.append(i)
+        i += 1
+        time.sleep(0.002)
+    conn.close()
+
+
+def main(num_rows=200_000):
+    with tempfile.TemporaryDirectory() as tmp:
+        shutil.copy(os.path.join(REPO_ROOT, "codebook_for_app.csv"), tmp)
+        os.chdir(tmp)
+        sys.path.insert(0, REPO_ROOT)
+        import cli
+        import db
+        from migrate import migrate_annotations
+
+        source = os.path.join(tmp, "source.csv")
+        write_csv(db, source, num_rows)
+        imported, rejected = cli.import_annotations(source)
+        assert imported == num_rows and not rejected, rejected[:3]
+        db_path = db.DATABASE_PATH
+        print(f"{num_rows:,} rows, {os.path.getsize(db_path) / 1e6:.0f} MB database")
+
+        # Some rows get the answers above; the rest keep the generated text
+        conn = sqlite3.connect(db_path)
+        with conn:
+            conn.executemany(
+                f"UPDATE annotations SET {TEXT_CODE[0]} = ? WHERE id = ?",
+                [(answer, i + 1) for i, answer in enumerate(NUMBER_ANSWERS)],
+            )
+        before = dict(conn.execute(f"SELECT id, {TEXT_CODE[0]} FROM annotations"))
+        conn.close()
+
+        added_codebook = os.path.join(tmp, "added.csv")
+        write_codebook("codebook_for_app.csv", added_codebook, add=True)
+        start = time.perf_counter()
+        report = migrate_annotations(db_path, table_for(added_codebook))
+        elapsed = time.perf_counter() - start
+        assert report.added == [NEW_CODE["code"]] and report.copied is None, report
+        print(f"{'add a code':<24} {elapsed * 1000:>9.1f} ms")
+
+        changed_codebook = os.path.join(tmp, "changed.csv")
+        write_codebook("codebook_for_app.csv", changed_codebook, add=True, change=True)
+        stop, saved, waits = threading.Event(), [], []
+        saver = threading.Thread(target=keep_saving, args=(db_path, stop, saved, waits))
+        saver.start()
+        start = time.perf_counter()
+        try:
+            report = migrate_annotations(db_path, table_for(changed_codebook))
+        finally:
+            stop.set()
+            saver.join()
+        elapsed = time.perf_counter() - start
+        print(
+            f"{'change a type (copy)':<24} {elapsed * 1000:>9.1f} ms  {report.copied / elapsed:>10,.0f} rows/s"
+            f"  {len(saved):,} saves meanwhile, longest {max(waits) * 1000:.0f} ms"
+        )
+
+        # Every row and every concurrent save made it into the new table (the
+        # last saves may land after the copy finished)
+        conn = sqlite3.connect(db_path)
+        expected = num_rows + len(saved)
+        (count,) = conn.execute("SELECT COUNT(*) FROM annotations").fetchone()
+        assert report.copied <= count == expected and not report.merged, (report, count, expected)
+        for i in saved:
+            # The article's three experiments, updated, and the second coder's row
+            rows, titles = conn.execute(
+                "SELECT COUNT(*), SUM(title = ?) FROM annotations WHERE article_index = ?", (f"Saved {i}", f"article_{i}")
+            ).fetchone()
+            assert rows == titles == 4, (i, rows, titles)
+        column_type = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(annotations)")}[CHANGED_CODE[0]]
+        assert column_type == "INTEGER", column_type
+        after = dict(conn.execute(f"SELECT id, {TEXT_CODE[0]} FROM annotations WHERE id <= ?", (num_rows,)))
+        conn.close()
+        dropped = 0
+        for row_id, value in before.items():
+            try:
+                number = db.parse_number(value, int)
+            except ValueError:
+                number = None
+                dropped += 1
+            assert after[row_id] == number, (row_id, value, after[row_id])
+        assert report.dropped.get(TEXT_CODE[0], 0) == dropped, (report.dropped, dropped)
+        assert [after[i + 1] for i in range(5)] == [-3, 1000, 2, 12, 2], [after[i + 1] for i in range(5)]
+        db.engine.dispose()
+
+        # The alternative: export, then import into a fresh database
+        fresh = os.path.join(tmp, "fresh")
+        os.mkdir(fresh)
+        shutil.copy(changed_codebook, os.path.join(fresh, "codebook_for_app.csv"))
+        export_path = os.path.join(tmp, "export.csv")
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(REPO_ROOT, "cli.py"), "export", export_path], check=True)
+        subprocess.run(
+            [sys.executable, os.path.join(REPO_ROOT, "cli.py"), "import", export_path], cwd=fresh, check=True
+        )
+        elapsed = time.perf_counter() - start
+        print(f"{'export + reimport':<24} {elapsed * 1000:>9.1f} ms  {expected / elapsed:>10,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
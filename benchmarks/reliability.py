@@ -0,0 +1,167 @@
+# Benchmark: inter-coder reliability (reliability.py) for thousands of
+# double-coded experiments, against a straightforward per-code reference
+# that builds each code's coincidence matrix in Python. Also checks that both
+# give the same kappa and alpha.
+#
+# Run from the repo root:  python -m benchmarks.reliability [experiments] [agreement]
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+
+import polars as pl
+
+from benchmarks.generate import random_answer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Share of experiments with a third coder
+THIRD_CODER = 0.1
+
+
+def stored_answer(column, spec, rng):
+    # A random answer (see benchmarks.generate) as its column stores it
+    return column.type.process_bind_param(random_answer(spec, rng), None)
+
+
+def double_coded_frame(schema, num_experiments, agreement, seed=0):
+    # Stored-form rows (see aggregate.read_stored): each experiment coded by
+    # "a" and "b", some by "c" too; the other coders copy a's answer to each
+    # code with probability `agreement`, and answer at random otherwise
+    from aggregate import stored_schema, summary_columns
+
+    rng = random.Random(seed)
+    choice, multi, numeric = summary_columns()
+    columns = [(c, schema.fields[c.name]) for c in choice + multi + numeric]
+    rows = []
+    for i in range(num_experiments):
+        first = {c.name: stored_answer(c, spec, rng) for c, spec in columns}
+        coders = ["a", "b", "c"] if rng.random() < THIRD_CODER else ["a", "b"]
+        for coder in coders:
+            answers = first if coder == "a" else {
+                c.name: first[c.name] if rng.random() < agreement else stored_answer(c, spec, rng)
+                for c, spec in columns
+            }
+            rows.append({
+                "article_index": f"article_{i // 3}", "experiment_number": str(i % 3 + 1), "coder": coder,
+                "journal": f"Journal {i % 7}", "year": str(1990 + i % 30), **answers,
+            })
+    return pl.DataFrame(rows, schema=stored_schema()).with_columns(pl.col("year").cast(pl.Int32, strict=False))
+
+
+# === Reference ===
+def alpha_from_units(units, delta):
+    # Krippendorff's alpha from {unit: [values]} with difference function delta
+    coincidence = Counter()
+    for values in units.values():
+        m = len(values)
+        if m < 2:
+            continue
+        for i, a in enumerate(values):
+            for j, b in enumerate(values):
+                if i != j:
+                    coincidence[a, b] += 1 / (m - 1)
+    n_c = Counter()
+    for (a, _), o in coincidence.items():
+        n_c[a] += o
+    n = sum(n_c.values())
+    if n <= 1:
+        return math.nan
+    observed = sum(o * delta(a, b) for (a, b), o in coincidence.items()) / n
+    expected = sum(n_c[a] * n_c[b] * delta(a, b) for a in n_c for b in n_c) / (n * (n - 1))
+    return 1 - observed / expected if expected else math.nan
+
+
+def kappa_from_pairs(pairs):
+    if not pairs:
+        return math.nan
+    total = len(pairs)
+    observed = sum(a == b for a, b in pairs) / total
+    first, second = Counter(a for a, _ in pairs), Counter(b for _, b in pairs)
+    chance = sum(first[c] * second[c] for c in first) / total ** 2
+    return (observed - chance) / (1 - chance) if chance != 1 else math.nan
+
+
+def reference(df):
+    # {code: (kappa, alpha)}, one code at a time
+    from aggregate import summary_columns
+
+    choice, multi, numeric = summary_columns()
+    by_unit = defaultdict(list)
+    for row in df.sort("coder").iter_rows(named=True):
+        by_unit[row["article_index"], row["experiment_number"]].append(row)
+    by_unit = {key: rows for key, rows in by_unit.items() if len(rows) >= 2}
+    nominal = lambda a, b: a != b
+    interval = lambda a, b: (a - b) ** 2
+
+    results = {}
+    for column in choice + multi + numeric:
+        name = column.name
+        items = range(len(column.type.values)) if column in multi else [None]
+        units, pairs = {}, []
+        for key, rows in by_unit.items():
+            for item in items:
+                values = [r[name] for r in rows if r[name] is not None]
+                if item is not None:
+                    values = [bool(v & (1 << item)) for v in values]
+                units[key, item] = values
+                if len(values) == 2:
+                    pairs.append(tuple(values))
+        if column in numeric:
+            results[name] = (math.nan, alpha_from_units(units, interval))
+        else:
+            results[name] = (kappa_from_pairs(pairs), alpha_from_units(units, nominal))
+    return results
+
+
+def main(num_experiments=5000, agreement=0.8):
+    with tempfile.TemporaryDirectory() as tmp:
+        # db.py (imported for the table's code types) opens annotations.db
+        # next to the working directory's codebook
+        shutil.copy(os.path.join(REPO_ROOT, "codebook_for_app.csv"), tmp)
+        os.chdir(tmp)
+        sys.path.insert(0, REPO_ROOT)
+        try:
+            compare(num_experiments, agreement)
+        finally:
+            os.chdir(REPO_ROOT)
+
+
+def compare(num_experiments, agreement):
+    from codebook import CodebookSchema
+    from reliability import reliability
+
+    schema = CodebookSchema.from_csv("codebook_for_app.csv")
+    df = double_coded_frame(schema, num_experiments, agreement)
+    print(f"{num_experiments:,} experiments, {df.height:,} coded rows, agreement {agreement}")
+
+    start = time.perf_counter()
+    fast = reliability(df, schema)
+    fast_time = time.perf_counter() - start
+    start = time.perf_counter()
+    slow = reference(df)
+    slow_time = time.perf_counter() - start
+    print(f"reliability.py: {fast_time * 1000:8.1f} ms for {fast.height} codes")
+    print(f"per-code loop:  {slow_time * 1000:8.1f} ms ({slow_time / fast_time:.0f}x)")
+
+    def same(a, b):
+        if a is None or (isinstance(a, float) and math.isnan(a)):
+            return b is None or math.isnan(b)
+        return b is not None and math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+    mismatched = [
+        row["code"] for row in fast.iter_rows(named=True)
+        if not (same(row["kappa"], slow[row["code"]][0]) and same(row["alpha"], slow[row["code"]][1]))
+    ]
+    if mismatched:
+        sys.exit(f"results differ for: {', '.join(mismatched)}")
+    print("results match")
+    print(fast.select("code", "level", "experiments", "agreement", "kappa", "alpha").head(10))
+
+
+if __name__ == "__main__":
+    main(*[int(sys.argv[1])] if len(sys.argv) > 1 else [], *[float(sys.argv[2])] if len(sys.argv) > 2 else [])
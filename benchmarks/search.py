@@ -0,0 +1,60 @@
+# Benchmark: article search latency on a synthetic 100k-article catalog,
+# comparing the old per-keystroke str.contains scan with the word index in
+# search.py (prefix and fuzzy modes). Checks that prefix mode returns every
+# article a word-prefix scan finds, also for a query matching most of them.
+#
+# Run from the repo root:  python -m benchmarks.search
+import time
+
+import polars as pl
+
+from benchmarks.generate import make_sheets
+from loaders import build_catalog
+from search import SEARCH_LIMIT, SearchIndex, search_text_expr, tokenize
+
+NUM_ARTICLES = 100_000
+NUM_JOURNALS = 10
+QUERIES = ["syntax", "agree", "island effects", "gradient acceptability", "magnitde estimaton", "ab"]
+REPEATS = 5
+
+
+def best_ms(fn, repeats=REPEATS):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+def prefix_scan(catalog, query):
+    # Catalog rows where each query word starts a word of the search text
+    matched = pl.lit(True)
+    for word in tokenize(query):
+        matched &= pl.col("search_text").str.contains(f"(?:^|[\\W_]){word}")
+    return catalog.filter(matched)["catalog_row"].to_list()
+
+
+def main():
+    catalog, _, _ = build_catalog(make_sheets(NUM_ARTICLES, NUM_JOURNALS))
+    start = time.perf_counter()
+    index = SearchIndex(catalog)
+    print(f"index build: {(time.perf_counter() - start) * 1000:.0f} ms for {catalog.height} articles, {len(index.vocab)} words")
+
+    # Search across the whole catalog, the worst case for the dashboard; the
+    # scan needs the search text materialized as a column
+    scan_catalog = catalog.with_columns(search_text_expr())
+    journal = None
+    print(f"{'query':<26} {'scan (ms)':>10} {'index (ms)':>11} {'fuzzy (ms)':>11} {'hits':>6}")
+    for query in QUERIES:
+        scan = best_ms(lambda: scan_catalog.filter(pl.col("search_text").str.contains(query.lower(), literal=True)))
+        indexed = best_ms(lambda: index.search(query, journal))
+        fuzzy = best_ms(lambda: index.fuzzy_search(query, journal))
+        hits = index.search(query, journal)
+        print(f"{query:<26} {scan:>10.2f} {indexed:>11.2f} {fuzzy:>11.2f} {len(hits):>6}")
+        assert hits == prefix_scan(scan_catalog, query), query
+    assert len(index.search("ab")) > SEARCH_LIMIT
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# Startup benchmark: time to first render of the dashboard in a fresh
+# process, and where the import part of it goes, from `python -X importtime`.
+# Each run is a new interpreter rendering app.py once through Streamlit's
+# AppTest, against a copy of the repo's files in a scratch directory (with the
+# workbook sidecar already built, as on a server that has run before). Also
+# lists which heavy libraries the first render loaded.
+#
+# Run from the repo root:  python -m benchmarks.startup [runs]
+import glob
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries the dashboard shouldn't need before its first render, or only
+# needs once something is asked of it
+HEAVY_LIBRARIES = ["pandas", "numpy", "pyarrow", "rapidfuzz", "openpyxl", "polars", "sqlalchemy"]
+
+# Run in the fresh interpreter: render once, report the time since start
+RENDER = """
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+at = AppTest.from_file("app.py", default_timeout=600).run()
+assert not at.exception, at.exception
+print(json.dumps({"render": time.perf_counter() - start, "modules": sorted(sys.modules)}))
+"""
+
+
+def import_times(stderr):
+    # {top-level module: cumulative import ms} from -X importtime output
+    # ("import time: self [us] | cumulative | imported package"); nested
+    # imports are indented, so only unindented names are counted
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.endswith("imported package"):
+            continue
+        _, cumulative, name = line.split("|")
+        if name.startswith("  "):
+            continue
+        name = name.strip().split(".")[0]
+        times[name] = times.get(name, 0) + int(cumulative) / 1000
+    return times
+
+
+def render_once(tmp):
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", RENDER],
+        cwd=tmp, capture_output=True, text=True, check=True,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report["render"] * 1000, import_times(result.stderr), set(report["modules"])
+
+
+def main(runs=5):
+    with tempfile.TemporaryDirectory() as tmp:
+        for path in glob.glob(os.path.join(REPO_ROOT, "*.py")) + glob.glob(os.path.join(REPO_ROOT, "*.csv")):
+            shutil.copy(path, tmp)
+        shutil.copy(os.path.join(REPO_ROOT, "test_articles_dataset.xlsx"), tmp)
+
+        # The first run parses the workbook and writes the sidecar
+        render_once(tmp)
+        renders, imports, modules = [], {}, set()
+        for _ in range(runs):
+            render_ms, times, loaded = render_once(tmp)
+            renders.append(render_ms)
+            for name, ms in times.items():
+                imports.setdefault(name, []).append(ms)
+            modules = loaded
+
+    medians = {name: statistics.median(ms) for name, ms in imports.items()}
+    print(f"time to first render: median {statistics.median(renders):.0f} ms, min {min(renders):.0f} ms over {runs} runs")
+    print(f"imports, all modules: {sum(medians.values()):.0f} ms (median per module)")
+    print()
+    print(f"{'module':<24} {'import ms':>10}")
+    for name, ms in sorted(medians.items(), key=lambda item: -item[1])[:15]:
+        print(f"{name:<24} {ms:>10.0f}")
+    print()
+    print("loaded by the first render: " + ", ".join(
+        f"{name} {'yes' if name in modules else 'no'}" for name in HEAVY_LIBRARIES
+    ))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
@@ -0,0 +1,236 @@
+# Benchmark suite: times the app's data paths on a synthetic workbook and
+# annotations.db (see benchmarks/generate.py), with peak memory for each,
+# and the dashboard's reruns headless through Streamlit's AppTest. The
+# Review step checks that a coded article's form shows its stored answers
+# and that submitting it unchanged leaves them as they were.
+#
+# Run from the repo root:
+#   python -m benchmarks.suite [--articles 100000] [--journals 40] [--json results.json]
+import argparse
+import glob
+import itertools
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.generate import annotation_entries, make_sheets, populate_annotations, random_answers, write_workbook
+from benchmarks.harness import measure, peak_memory
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKBOOK_NAME = "test_articles_dataset.xlsx"
+
+
+def setup(tmp, num_articles, num_journals, coded_fraction):
+    # The app's modules and codebook are copied next to the generated data,
+    # so AppTest runs the real app against it
+    for path in glob.glob(os.path.join(REPO_ROOT, "*.py")) + glob.glob(os.path.join(REPO_ROOT, "*.csv")):
+        shutil.copy(path, tmp)
+    start = time.perf_counter()
+    sheets = make_sheets(num_articles, num_journals)
+    write_workbook(os.path.join(tmp, WORKBOOK_NAME), sheets)
+    print(f"workbook: {num_articles:,} articles in {num_journals} sheets ({time.perf_counter() - start:.1f} s)")
+
+    # db.py opens annotations.db and the codebook in the working directory
+    os.chdir(tmp)
+    sys.path.insert(0, tmp)
+    import db
+    from codebook import CodebookSchema
+    from loaders import build_catalog
+
+    assert os.path.dirname(os.path.abspath(db.__file__)) == os.path.abspath(tmp), db.__file__
+
+    start = time.perf_counter()
+    catalog, _, _ = build_catalog(sheets)
+    schema = CodebookSchema.from_csv("codebook_for_app.csv")
+    written = populate_annotations(db, annotation_entries(catalog, schema, coded_fraction))
+    print(f"annotations.db: {written:,} rows ({time.perf_counter() - start:.1f} s)")
+    return db, schema
+
+
+def data_benchmarks(tmp, db, schema, rounds):
+    # (name, fn, rounds, warmup); fns run in the order listed
+    import polars as pl
+
+    from aggregate import StoredAnnotations, read_stored, summarize
+    from export import write_export
+    from loaders import build_catalog, journal_ranges, load_workbook, sidecar_dir
+    from search import SearchIndex
+
+    workbook = os.path.join(tmp, WORKBOOK_NAME)
+    state = {}
+
+    def cold_workbook():
+        shutil.rmtree(sidecar_dir(workbook), ignore_errors=True)
+        state["sheets"] = load_workbook(workbook)[0]
+
+    def catalog():
+        state["catalog"] = build_catalog(state["sheets"])[0]
+        state["ranges"] = journal_ranges(state["catalog"])
+
+    def journal_query():
+        # Mirrors the dashboard's per-journal query, for the largest journal
+        coded = list(db.coded_index.coded_articles())
+        start, end = max(state["ranges"].values(), key=lambda r: r[1] - r[0])
+        journal_lf = (
+            state["catalog"].lazy().slice(start, end - start)
+            .select("catalog_row", "article_index", "author", "date", "title", "url", "searchterm")
+            .with_columns(pl.col("article_index").is_in(coded).alias("coded"))
+        )
+        return pl.collect_all([
+            journal_lf.filter(~pl.col("coded")).sort("date"),
+            journal_lf.select(pl.col("coded").sum()),
+        ])
+
+    def search_index():
+        state["index"] = SearchIndex(state["catalog"])
+
+    rng = random.Random(1)
+    counter = itertools.count()
+
+    def new_entry(experiment="1"):
+        entry = random_answers(schema, rng)
+        entry.update(article_index=f"bench_{next(counter)}", experiment_number=experiment)
+        return entry
+
+    def save_three():
+        article = new_entry()
+        db.save_annotations([dict(article, experiment_number=n) for n in "123"])
+
+    stored = StoredAnnotations(db.engine, db.db_version)
+
+    def summaries_after_save():
+        # What the Summaries view does after a coder saves: catch up on the
+        # change log, then summarize by journal
+        db.save_annotation(new_entry())
+        return summarize(stored.frame(), schema, ["journal"])
+
+    def export_csv():
+        with open(os.path.join(tmp, "export.csv"), "wb") as out:
+            write_export(db.engine, "CSV", out)
+
+    return [
+        ("load_journal_articles (parse + sidecar)", cold_workbook, 1, 0),
+        ("load_journal_articles (sidecar)", lambda: load_workbook(workbook), rounds, 1),
+        ("build_catalog", catalog, rounds, 0),
+        ("journal query (largest journal)", journal_query, rounds, 1),
+        ("search index build", search_index, rounds, 0),
+        ("search (prefix)", lambda: state["index"].search("agree"), rounds * 4, 1),
+        ("search (fuzzy)", lambda: state["index"].fuzzy_search("agreemnt"), rounds * 4, 1),
+        ("save_annotation", lambda: db.save_annotation(new_entry()), rounds * 10, 1),
+        ("save_annotations (3 experiments)", save_three, rounds * 10, 1),
+        ("read stored annotations", lambda: read_stored(db.engine), rounds, 0),
+        ("summaries (all experiments)", lambda: summarize(stored.frame(), schema, []), rounds, 1),
+        ("summaries after a save (by journal)", summaries_after_save, rounds, 1),
+        ("export CSV", export_csv, rounds, 0),
+    ]
+
+
+def stored_annotation(db, annotation_id):
+    session = db.SessionLocal()
+    try:
+        annotation = session.get(db.Annotation, annotation_id)
+        return {col.name: getattr(annotation, col.name) for col in db.Annotation.__table__.columns}
+    finally:
+        session.close()
+
+
+def app_benchmarks(tmp, db, schema, rounds):
+    # Dashboard reruns through AppTest; each step's state carries over
+    from streamlit.testing.v1 import AppTest
+
+    at = AppTest.from_file(os.path.join(tmp, "app.py"), default_timeout=600)
+
+    def journal():
+        return at.radio(key="active_journal").value
+
+    def check(at_):
+        assert not at_.exception, at_.exception
+
+    def search():
+        at.text_input(key=f"search_{journal()}").set_value("agree").run()
+        check(at)
+        at.text_input(key=f"search_{journal()}").set_value("").run()
+
+    def review():
+        # Open the first coded article of the page in the Review form, then
+        # submit it unchanged
+        status_filter = next(r for r in at.radio if r.label.startswith("Filter"))
+        status_filter.set_value("Coded").run()
+        next(b for b in at.button if b.key and b.key.startswith("annotate_")).click().run()
+        check(at)
+        annotation_id = at.session_state["selected_article"]["id"]
+        before = stored_annotation(db, annotation_id)
+        authors = next(t for t in at.text_input if t.label == "Authors").value
+        assert authors == (before["authors"] or ""), authors
+        for spec in schema:
+            value = before[spec.code]
+            if value is None or spec.code not in at.session_state:
+                continue
+            shown = at.session_state[spec.code]
+            shown = "; ".join(shown) if isinstance(shown, list) else shown
+            assert shown == str(value), (spec.code, shown, value)
+        next(b for b in at.button if b.label == "Update Entry").click().run()
+        check(at)
+        # The form blanks codes whose condition doesn't hold, which the
+        # generated answers don't respect
+        hidden = schema.inactive_fields(before)
+        after = stored_annotation(db, annotation_id)
+        changed = {k: (before[k], after[k]) for k in before if before[k] != after[k] and k not in hidden}
+        assert not changed, changed
+        status_filter = next(r for r in at.radio if r.label.startswith("Filter"))
+        status_filter.set_value("All").run()
+
+    return [
+        ("dashboard first run", lambda: check(at.run()), 1, 0),
+        ("dashboard rerun", lambda: check(at.run()), rounds, 1),
+        ("dashboard search + clear", search, rounds, 1),
+        ("dashboard next page", lambda: check(at.button(key=f"next_{journal()}").click().run()), rounds, 1),
+        ("review a coded article + update", review, rounds, 1),
+    ]
+
+
+def run(benchmarks, results):
+    for name, fn, rounds, warmup in benchmarks:
+        stats = measure(fn, rounds, warmup)
+        stats["heap_mb"], stats["rss_mb"] = peak_memory(fn)
+        results.append({"name": name, "stats": stats})
+        rss = f"{stats['rss_mb']:>8.1f}" if stats["rss_mb"] is not None else f"{'n/a':>8}"
+        print(
+            f"{name:<40} {stats['rounds']:>6} {stats['min']:>10.2f} {stats['median']:>10.2f} "
+            f"{stats['mean']:>10.2f} {stats['stddev']:>8.2f} {stats['heap_mb']:>8.1f} {rss}"
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the benchmark suite on synthetic data")
+    parser.add_argument("--articles", type=int, default=100_000)
+    parser.add_argument("--journals", type=int, default=40)
+    parser.add_argument("--coded", type=float, default=0.3, help="share of articles with annotations")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--no-app", action="store_true", help="skip the AppTest dashboard runs")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db, schema = setup(tmp, args.articles, args.journals, args.coded)
+        print()
+        print(f"{'benchmark':<40} {'rounds':>6} {'min ms':>10} {'median ms':>10} {'mean ms':>10} {'stddev':>8} {'heap MB':>8} {'rss MB':>8}")
+        run(data_benchmarks(tmp, db, schema, args.rounds), results)
+        if not args.no_app:
+            run(app_benchmarks(tmp, db, schema, args.rounds), results)
+        db.engine.dispose()
+        os.chdir(REPO_ROOT)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"machine": sys.platform, "python": sys.version.split()[0], "args": vars(args), "benchmarks": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# Benchmark: annotation save throughput with the old SELECT-then-write ORM
+# path versus the single INSERT ... ON CONFLICT DO UPDATE in db.py, for fresh
+# inserts and for updates of existing rows; and saving multi-experiment
+# articles one experiment at a time versus with one save_annotations call.
+#
+# Run from the repo root:  python -m benchmarks.upsert [rows]
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.generate import random_answers
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def make_rows(schema, label, num_rows, seed):
+    rng = random.Random(seed)
+    return [
+        dict(
+            random_answers(schema, rng),
+            article_index=f"{label}_{i // 2}",
+            experiment_number=str(i % 2 + 1),
+            N_experiments="2",
+        )
+        for i in range(num_rows)
+    ]
+
+
+def select_then_write(db, session, row):
+    existing = session.query(db.Annotation).filter(
+        db.Annotation.article_index == row["article_index"],
+        db.Annotation.experiment_number == row["experiment_number"]
+    ).first()
+    if existing:
+        for k, v in row.items():
+            setattr(existing, k, v)
+    else:
+        session.add(db.Annotation(**row))
+    session.flush()
+
+
+def upsert(db, session, row):
+    session.execute(db.upsert_statement(row), row)
+
+
+def timed(db, save, rows, commit_each):
+    session = db.SessionLocal()
+    start = time.perf_counter()
+    for row in rows:
+        save(db, session, row)
+        if commit_each:
+            session.commit()
+    session.commit()
+    elapsed = time.perf_counter() - start
+    session.close()
+    return len(rows) / elapsed
+
+
+def main(num_rows=5000):
+    with tempfile.TemporaryDirectory() as tmp:
+        # db.py creates annotations.db next to the working directory's codebook
+        shutil.copy(os.path.join(REPO_ROOT, "codebook_for_app.csv"), tmp)
+        os.chdir(tmp)
+        sys.path.insert(0, REPO_ROOT)
+        import db
+        from codebook import CodebookSchema
+
+        schema = CodebookSchema.from_csv("codebook_for_app.csv")
+        print(f"{num_rows} rows; rows/s")
+        print(f"{'mode':<22} {'select+write':>13} {'upsert':>10}")
+        for commit_each in (False, True):
+            label = "commit per row" if commit_each else "one transaction"
+            results = {}
+            for name, save in [("select", select_then_write), ("upsert", upsert)]:
+                tag = f"{name}_{int(commit_each)}"
+                inserted = timed(db, save, make_rows(schema, tag, num_rows, 0), commit_each)
+                updated = timed(db, save, make_rows(schema, tag, num_rows, 1), commit_each)
+                results[name] = (inserted, updated)
+            print(f"{label + ', insert':<22} {results['select'][0]:>13.0f} {results['upsert'][0]:>10.0f}")
+            print(f"{label + ', update':<22} {results['select'][1]:>13.0f} {results['upsert'][1]:>10.0f}")
+
+        # Whole articles of 2 experiments, through the app's save path
+        articles = make_rows(schema, "bulk", num_rows, 0)
+        start = time.perf_counter()
+        for row in articles:
+            db.save_annotation(row)
+        per_experiment = num_rows / (time.perf_counter() - start)
+        articles = make_rows(schema, "bulk", num_rows, 1)
+        start = time.perf_counter()
+        for i in range(0, num_rows, 2):
+            db.save_annotations(articles[i:i + 2])
+        per_article = num_rows / (time.perf_counter() - start)
+        print(f"{'save per experiment':<22} {per_experiment:>13.0f}")
+        print(f"{'save per article':<22} {per_article:>13.0f}")
+
+        db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:2]])
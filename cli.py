@@ -0,0 +1,260 @@
+# Command-line import/export for annotations.db, without going through
+# Streamlit. Run from the repo root (db.py opens annotations.db and the
+# codebook relative to the working directory):
+#
+#   python cli.py import coded.csv [--legacy] [--batch-size N] [--invalid reject|null]
+#   python cli.py export annotations.parquet [--format Parquet]
+#   python cli.py migrate
+#
+# Imports accept .csv, .csv.gz and .parquet files, e.g. an export from the
+# app or the coded_studies.csv written by test_annotation_app.py (--legacy).
+# Rows are upserted on (article_index, experiment_number, coder) in batches, one
+# executemany and one transaction per batch. `migrate` brings annotations.db in
+# line with a changed codebook (see migrate.py), showing the progress of a
+# table copy.
+import argparse
+import csv
+import functools
+import gzip
+import sys
+import time
+
+from sqlalchemy.types import TypeDecorator
+
+import db
+from export import EXPORT_FORMATS, available_formats, write_export
+
+IMPORT_BATCH_SIZE = 5000
+
+# coded_studies.csv column -> annotations column, for the columns that have
+# a codebook equivalent; the others are dropped
+LEGACY_COLUMNS = {
+    "StudyID": "article_index",
+    "Year": "year",
+    "Journal": "journal",
+    "Participants": "N_participants_recruited",
+    "L1": "language",
+    "Instructions": "instructions",
+    "Modality": "presentation_modality",
+    "TestItems": "N_target_items",
+    "Fillers": "N_fillers",
+    "EffectSizes": "effect_sizes",
+    "Notes": "coder_comments",
+}
+
+
+# === Progress reporting ===
+class Progress:
+    # Prints a running row count and rate to stderr, at most twice a second
+    def __init__(self, label, stream=sys.stderr, interval=0.5):
+        self.label = label
+        self.stream = stream
+        self.interval = interval
+        self.rows = 0
+        self.start = time.perf_counter()
+        self._last_report = 0.0
+
+    def __call__(self, num_rows):
+        self.rows += num_rows
+        now = time.perf_counter()
+        # Redrawn in place, so only when attached to a terminal
+        if self.stream.isatty() and now - self._last_report >= self.interval:
+            self._last_report = now
+            self._report(now, end="\r")
+
+    def rate(self, now=None):
+        elapsed = (now or time.perf_counter()) - self.start
+        return self.rows / elapsed if elapsed > 0 else 0.0
+
+    def _report(self, now, end):
+        print(f"{self.label}: {self.rows:,} rows ({self.rate(now):,.0f} rows/s)", end=end, file=self.stream, flush=True)
+
+    def finish(self):
+        self._report(time.perf_counter(), end="\n")
+
+
+# === Import ===
+def open_text(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8-sig", newline="")
+    return open(path, encoding="utf-8-sig", newline="")
+
+
+def read_csv_batches(path, batch_size):
+    # Yields lists of (line number, row dict); "" cells are read as missing
+    with open_text(path) as f:
+        reader = csv.DictReader(f)
+        batch = []
+        for entry in reader:
+            batch.append((reader.line_num, {k: (v if v != "" else None) for k, v in entry.items()}))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def read_parquet_batches(path, batch_size):
+    import pyarrow.parquet as pq
+
+    line = 0
+    for record_batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+        rows = record_batch.to_pylist()
+        yield list(enumerate(rows, start=line + 1))
+        line += len(rows)
+
+
+def batch_reader(path):
+    if path.endswith(".parquet"):
+        return read_parquet_batches
+    return read_csv_batches
+
+
+@functools.cache
+def encoders():
+    # Encoders of the typed codebook columns (see db.py), looked up once, on
+    # first use, so importing cli.py doesn't initialize the database
+    return {
+        column.name: column.type.process_bind_param
+        for column in db.Annotation.__table__.columns
+        if isinstance(column.type, TypeDecorator)
+    }
+
+
+def convert_row(entry, invalid="reject"):
+    # The row as stored: only real columns, typed codebook values encoded.
+    # Raises ValueError for a value its column can't hold, unless `invalid`
+    # is "null", which stores such values as empty instead.
+    if not entry.get("article_index"):
+        raise ValueError("article_index is empty")
+    row = db.annotation_row(entry)
+    encode = encoders()
+    for name, value in row.items():
+        if value is None or name not in encode:
+            continue
+        try:
+            row[name] = encode[name](value, None)
+        except ValueError as e:
+            if invalid != "null":
+                raise ValueError(f"{name}: {e}")
+            row[name] = None
+    return row
+
+
+@functools.lru_cache(maxsize=8)
+def driver_upsert(columns):
+    # db.py's upsert as plain SQL with positional parameters: the rows are
+    # already encoded, so they go straight to sqlite3's executemany without
+    # a second pass through SQLAlchemy's per-value bind processing
+    compiled = db.upsert_statement(dict.fromkeys(columns)).compile(
+        dialect=db.engine.dialect, column_keys=list(columns)
+    )
+    return compiled.string, tuple(compiled.positiontup)
+
+
+def import_annotations(path, batch_size=IMPORT_BATCH_SIZE, legacy=False, invalid="reject", progress=None):
+    # Returns (rows imported, [(line number, error message), ...] for rows skipped)
+    imported = 0
+    rejected = []
+    for batch in batch_reader(path)(path, batch_size):
+        groups = {}
+        for line, entry in batch:
+            if legacy:
+                entry = {LEGACY_COLUMNS[k]: v for k, v in entry.items() if k in LEGACY_COLUMNS}
+            try:
+                row = convert_row(entry, invalid)
+            except ValueError as e:
+                rejected.append((line, str(e)))
+                continue
+            groups.setdefault(tuple(sorted(row)), []).append(row)
+
+        with db.engine.begin() as conn:
+            for columns, group in groups.items():
+                sql, order = driver_upsert(columns)
+                conn.exec_driver_sql(sql, [tuple(row[k] for k in order) for row in group])
+        num_rows = sum(len(group) for group in groups.values())
+        imported += num_rows
+        if progress is not None:
+            progress(num_rows)
+    return imported, rejected
+
+
+# === Migration ===
+def migrate_database():
+    # Runs before db.init_db, which would otherwise migrate without progress
+    from codebook import CodebookSchema
+    from migrate import MigrationError, migrate_annotations
+
+    _, annotation, _ = db.build_models(CodebookSchema.from_csv(db.CODEBOOK_FILE))
+    progress = Progress("copied")
+    try:
+        report = migrate_annotations(db.DATABASE_FILE, annotation.__table__, progress)
+    except MigrationError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    if report.copied is not None:
+        progress.finish()
+    print(f"added columns: {', '.join(report.added)}" if report.added else "no columns added", file=sys.stderr)
+    for warning in report.warnings():
+        print(f"warning: {warning}", file=sys.stderr)
+    return 0
+
+
+# === Command line ===
+def format_for_path(path):
+    for label, (extension, _) in EXPORT_FORMATS.items():
+        if path.endswith(extension) and label != "CSV":
+            return label
+    return "CSV"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import, export or migrate annotations.db")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    import_parser = commands.add_parser("import", help="upsert annotations from a CSV or Parquet file")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--legacy", action="store_true", help="the file is a coded_studies.csv from test_annotation_app.py")
+    import_parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+    import_parser.add_argument(
+        "--invalid", choices=["reject", "null"], default="reject",
+        help="skip rows with values their column can't hold (reject), or store those values as empty (null)",
+    )
+
+    export_parser = commands.add_parser("export", help="write all annotations to a file")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--format", choices=list(EXPORT_FORMATS), help="default: from the file extension")
+    export_parser.add_argument("--chunk-size", type=int, default=IMPORT_BATCH_SIZE)
+
+    commands.add_parser("migrate", help="update annotations.db to the codebook's codes and types")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "migrate":
+        return migrate_database()
+
+    if args.command == "import":
+        progress = Progress("imported")
+        imported, rejected = import_annotations(args.path, args.batch_size, args.legacy, args.invalid, progress)
+        progress.finish()
+        for line, message in rejected[:20]:
+            print(f"line {line}: {message}", file=sys.stderr)
+        if len(rejected) > 20:
+            print(f"... and {len(rejected) - 20} more", file=sys.stderr)
+        if rejected:
+            print(f"{len(rejected):,} rows skipped", file=sys.stderr)
+            return 1
+        return 0
+
+    export_format = args.format or format_for_path(args.path)
+    if export_format not in available_formats():
+        parser.error(f"{export_format} export needs pyarrow installed")
+    progress = Progress("exported")
+    with open(args.path, "wb") as out:
+        write_export(db.engine, export_format, out, args.chunk_size, progress)
+    progress.finish()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
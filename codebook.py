@@ -0,0 +1,180 @@
+import os
+import re
+from dataclasses import dataclass
+from graphlib import CycleError, TopologicalSorter
+
+import polars as pl
+
+# Codes answered in a text area rather than a one-line text input
+TEXT_AREA_CODES = frozenset({"instructions", "coder_comments"})
+
+# Answers that leave a bare `depends: code` condition unmet
+UNSET_ANSWERS = frozenset({"", "No", "Not Reported", "NA", "N/A", "0"})
+
+
+# === Codebook schema ===
+# The codebook is parsed once into one immutable spec per code, so the
+# annotation forms loop over ready-made specs instead of probing half a
+# dozen dictionaries (and a list) for every field on every rerun.
+@dataclass(frozen=True, slots=True)
+class FieldSpec:
+    code: str
+    section: str
+    number: int  # 1-based position in the codebook
+    description: str
+    help: str
+    default: str
+    options: tuple  # allowed values; empty for free-form codes
+    checkall: bool
+    type: str
+    depends: str  # raw condition from the codebook; "" if always shown
+    scope: str  # "article" (shared by all its experiments) or "experiment"
+
+    @property
+    def widget(self):
+        # "multiselect", "choice", "text_area" or "text_input"
+        if self.checkall and self.options:
+            return "multiselect"
+        if self.options:
+            return "choice"
+        if self.code in TEXT_AREA_CODES:
+            return "text_area"
+        return "text_input"
+
+
+def _text(value):
+    return "" if value is None else str(value)
+
+
+# === Conditional fields ===
+# A code's `depends` column says when it applies, in terms of other codes'
+# answers:
+#   other_instr                           other_instr answered (not No/Not Reported/NA)
+#   other_instr = Yes                     answer is Yes (for checkall codes: Yes was ticked)
+#   design_type != Within-subjects        answer is not Within-subjects
+#   design_type in (Between-subjects; Mixed)
+# Terms combine with "and"/"or" ("and" binds tighter). Conditions are parsed
+# once when the codebook is loaded; a field whose parent is itself inactive
+# is inactive too.
+TERM_PATTERN = re.compile(r"^(?P<code>[\w-]+)\s*(?:(?P<op>!=|=|\bin\b)\s*(?P<value>.+))?$")
+
+
+@dataclass(frozen=True, slots=True)
+class Term:
+    code: str
+    values: frozenset  # empty: the code just has to be answered
+    negate: bool
+
+    def holds(self, answer):
+        if isinstance(answer, str):
+            answer = {a.strip() for a in answer.split(";")} if ";" in answer else {answer.strip()}
+        else:
+            answer = {_text(a) for a in answer} if isinstance(answer, (list, tuple, set)) else {_text(answer)}
+        if not self.values:
+            return bool(answer - UNSET_ANSWERS)
+        return bool(answer & self.values) != self.negate
+
+
+def parse_condition(text, known_codes):
+    # Returns the condition as a tuple of alternatives, each a tuple of Terms
+    alternatives = []
+    for alternative in re.split(r"\s+or\s+", text.strip()):
+        terms = []
+        for term in re.split(r"\s+and\s+", alternative.strip()):
+            match = TERM_PATTERN.match(term.strip())
+            if not match or match["code"] not in known_codes:
+                raise ValueError(f"can't parse condition {term!r} in {text!r}")
+            value = (match["value"] or "").strip()
+            if match["op"] == "in":
+                value = value.removeprefix("(").removesuffix(")")
+                values = frozenset(v.strip() for v in value.split(";") if v.strip())
+            else:
+                values = frozenset([value]) if value else frozenset()
+            terms.append(Term(match["code"], values, match["op"] == "!="))
+        alternatives.append(tuple(terms))
+    return tuple(alternatives)
+
+
+class CodebookSchema:
+    __slots__ = ("fields", "sections", "conditions", "parents", "order")
+
+    def __init__(self, specs):
+        # code -> FieldSpec, in codebook order
+        self.fields = {spec.code: spec for spec in specs}
+        # section -> tuple of FieldSpecs, in codebook order
+        sections = {}
+        for spec in self.fields.values():
+            sections.setdefault(spec.section, []).append(spec)
+        self.sections = {section: tuple(specs) for section, specs in sections.items()}
+
+        # code -> parsed condition, for conditional codes only
+        self.conditions = {
+            spec.code: parse_condition(spec.depends, self.fields)
+            for spec in self.fields.values()
+            if spec.depends
+        }
+        graph = {
+            code: {term.code for alternative in condition for term in alternative}
+            for code, condition in self.conditions.items()
+        }
+        # Codes whose answers other codes depend on
+        self.parents = frozenset().union(*graph.values())
+        # Conditional codes ordered so each comes after the codes it depends on
+        try:
+            self.order = tuple(c for c in TopologicalSorter(graph).static_order() if c in graph)
+        except CycleError as e:
+            raise ValueError(f"circular depends in codebook: {e.args[1]}") from None
+
+    @classmethod
+    def from_frame(cls, df):
+        if df.is_empty():
+            return cls([])
+        specs = []
+        for number, row in enumerate(df.iter_rows(named=True), start=1):
+            values = row.get("values")
+            specs.append(
+                FieldSpec(
+                    code=row["code"],
+                    section=_text(row.get("section")),
+                    number=number,
+                    description=_text(row.get("description")),
+                    help=_text(row.get("help")),
+                    default=_text(row.get("default")),
+                    options=tuple(v.strip() for v in values.split("; ")) if values else (),
+                    checkall=row.get("checkall") == "yes",
+                    type=_text(row.get("type")) or "text",
+                    depends=_text(row.get("depends")).strip(),
+                    scope=_text(row.get("scope")) or "experiment",
+                )
+            )
+        return cls(specs)
+
+    @classmethod
+    def from_csv(cls, codebook_path):
+        if not os.path.exists(codebook_path):
+            return cls([])
+        return cls.from_frame(pl.read_csv(codebook_path))
+
+    def inactive_fields(self, answers):
+        # Codes whose conditions are unmet given `answers` (code -> answer)
+        inactive = set()
+        for code in self.order:
+            condition = self.conditions[code]
+            if not any(
+                all(term.code not in inactive and term.holds(answers.get(term.code)) for term in alternative)
+                for alternative in condition
+            ):
+                inactive.add(code)
+        return inactive
+
+    def __contains__(self, code):
+        return code in self.fields
+
+    def __getitem__(self, code):
+        return self.fields[code]
+
+    def __iter__(self):
+        return iter(self.fields.values())
+
+    def __len__(self):
+        return len(self.fields)
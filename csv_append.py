@@ -0,0 +1,127 @@
+# Append-only CSV writer for the coding form in test_annotation_app.py.
+# Each submit appends one line instead of re-reading and rewriting the whole
+# file, so its cost doesn't grow with the file. Appends hold an exclusive
+# lock on the file (so sessions can't interleave rows) and are fsync'd
+# before returning.
+import csv
+import io
+import os
+
+from file_lock import locked
+
+# (inode, size, mtime) of each file as this process's last append left it,
+# ending with a whole record. An append that finds the file unchanged skips
+# drop_torn_line, which reads the whole file.
+_appended = {}
+
+
+def csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator="\n").writerow(values)
+    return buffer.getvalue()
+
+
+def read_header(fd):
+    os.lseek(fd, 0, os.SEEK_SET)
+    first = b""
+    while not first.endswith(b"\n"):
+        chunk = os.read(fd, 4096)
+        if not chunk:
+            break
+        first += chunk
+        if b"\n" in first:
+            first = first[:first.index(b"\n") + 1]
+    return next(csv.reader([first.decode("utf-8")]), [])
+
+
+def drop_torn_line(fd, size, chunk_size=1 << 20):
+    # A crash mid-append can leave a partial last record; cut the file back
+    # to the end of the last complete one before appending after it. As the
+    # csv module reads the file, a newline only ends a record outside a
+    # quoted field (a note can hold line breaks), i.e. after an even number
+    # of quotes. Quotes are counted from the start of the file, then the
+    # chunks are searched from the end for such a newline.
+    chunks = []  # (offset, quotes before it)
+    offset = quotes = 0
+    os.lseek(fd, 0, os.SEEK_SET)
+    while offset < size:
+        chunk = os.read(fd, min(chunk_size, size - offset))
+        if not chunk:
+            break
+        chunks.append((offset, quotes))
+        quotes += chunk.count(b'"')
+        offset += len(chunk)
+
+    end = 0
+    for start, before in reversed(chunks):
+        os.lseek(fd, start, os.SEEK_SET)
+        chunk = os.read(fd, min(chunk_size, size - start))
+        # Walk the parts between quotes backwards; part i follows
+        # before + i quotes
+        parts = chunk.split(b'"')
+        position = start + len(chunk)
+        for i in range(len(parts) - 1, -1, -1):
+            position -= len(parts[i])
+            newline = parts[i].rfind(b"\n") if (before + i) % 2 == 0 else -1
+            if newline != -1:
+                end = position + newline + 1
+                break
+            position -= 1
+        if end:
+            break
+    if end != size:
+        os.ftruncate(fd, end)
+
+
+def append_row(path, row):
+    # Appends `row` (a dict) to the CSV at `path`, writing the header first
+    # if the file is new or empty. Columns follow the existing header; a row
+    # with columns the header lacks raises ValueError.
+    path = os.path.abspath(path)
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        with locked(fd):
+            stat = os.fstat(fd)
+            size = stat.st_size
+            if size == 0:
+                header = list(row)
+                data = csv_line(header)
+            else:
+                header = read_header(fd)
+                data = ""
+                unknown = [k for k in row if k not in header]
+                if unknown:
+                    raise ValueError(f"{path} has no column(s) {unknown} in its header")
+                if _appended.get(path) != (stat.st_ino, size, stat.st_mtime_ns):
+                    drop_torn_line(fd, size)
+            data += csv_line([row.get(k, "") for k in header])
+            # One write at the end of the file, then flushed to disk
+            os.lseek(fd, 0, os.SEEK_END)
+            os.write(fd, data.encode("utf-8"))
+            os.fsync(fd)
+            stat = os.fstat(fd)
+            _appended[path] = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    finally:
+        os.close(fd)
+
+
+def compact_to_parquet(path, parquet_path=None):
+    # Writes the CSV out as a Parquet file (needs pyarrow) and returns its path
+    import pandas as pd
+
+    parquet_path = parquet_path or os.path.splitext(path)[0] + ".parquet"
+    fd = os.open(path, os.O_RDWR | getattr(os, "O_BINARY", 0))
+    try:
+        # Hold the lock so no append lands halfway through the read
+        with locked(fd):
+            os.lseek(fd, 0, os.SEEK_SET)
+            chunks = []
+            while chunk := os.read(fd, 1 << 20):
+                chunks.append(chunk)
+    finally:
+        os.close(fd)
+    df = pd.read_csv(io.BytesIO(b"".join(chunks)))
+    tmp_path = parquet_path + ".tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, parquet_path)
+    return parquet_path
@@ -1,37 +1,655 @@
-from sqlalchemy import create_engine, Column, String, Text, Integer
+from sqlalchemy import create_engine, event, Column, Float, Index, String, Text, Integer, SmallInteger
+from sqlalchemy.types import TypeDecorator
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
-import pandas as pd
+from sqlalchemy.pool import QueuePool
+from concurrent.futures import Future
+import functools
+import json
+import perf
+import os
+import queue
+import sqlite3
+import sys
+import threading
 
-# Load in the codes
-codebook_df = pd.read_csv("codebook_for_app.csv")
-code_fields = codebook_df["code"].tolist()
+# Where the database and codebook are looked for unless init_db is given
+# other paths; relative to the working directory
+DATABASE_FILE = "annotations.db"
+CODEBOOK_FILE = "codebook_for_app.csv"
 
-# Define SQLite path
-DATABASE_URL = "sqlite:///annotations.db"
+# Seconds a connection waits on a locked database before giving up
+BUSY_TIMEOUT = 30
 
-# Set up SQLAlchemy engine and session
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-SessionLocal = sessionmaker(bind=engine)
+# Applied to every new connection. WAL lets coders keep reading while a save
+# is being written; synchronous=NORMAL is durable under WAL except on power
+# loss, and the cache/mmap sizes keep the hot pages of the table in memory.
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": BUSY_TIMEOUT * 1000,
+    "cache_size": -64000,  # KiB, i.e. ~64 MB
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "foreign_keys": "ON",
+}
 
-Base = declarative_base()
+# Streamlit runs each browser session's script in its own thread, so the pool
+# has to serve many short-lived checkouts from different threads. SQLite
+# connections are cheap, so we keep a modest pool and allow overflow.
+POOL_SIZE = 8
+POOL_MAX_OVERFLOW = 16
 
-# Define your annotation table
-class Annotation(Base):
-    __tablename__ = "annotations"
 
-    id = Column(Integer, primary_key=True, index=True)
-    article_index = Column(String, index=True)
-    authors = Column(String)
-    year = Column(String)
-    title = Column(String)
-    journal = Column(String)
-    url = Column(String)
-    searchterms = Column(String)
+def apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {pragma}={value}")
+    cursor.close()
 
-# Dynamically add all codebook fields as String/Text columns
-for field in code_fields:
-    setattr(Annotation, field, Column(String))
 
-# Create table if it doesn't exist
-Base.metadata.create_all(bind=engine)
+def make_engine(database_path):
+    engine = create_engine(
+        f"sqlite:///{database_path}",
+        connect_args={"check_same_thread": False, "timeout": BUSY_TIMEOUT},
+        poolclass=QueuePool,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=BUSY_TIMEOUT,
+    )
+    event.listen(engine, "connect", apply_sqlite_pragmas)
+    return engine
+
+
+# Columns that identify an annotation
+KEY_COLUMNS = ["article_index", "experiment_number", "coder"]
+
+# === Typed codebook columns ===
+# The form hands us strings; these types store them natively so aggregates
+# can run in SQL, and give the same strings back when rows are read through
+# SQLAlchemy. Choice codes are stored as their position in the codebook's
+# `values` list and multi-select codes as a bitmask over it (bit i set when
+# value i was ticked). Appending values to a list keeps the stored codes'
+# meaning; reordering or removing values makes migrate.py convert them (see
+# annotation_codes below).
+
+# Answers meaning "no number given" for numeric codes
+BLANK_NUMBERS = {"", "na", "n/a", "not reported"}
+
+
+def parse_number(value, cast):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        number = value
+    else:
+        text = str(value).strip()
+        if text.lower() in BLANK_NUMBERS:
+            return None
+        try:
+            number = float(text)
+        except ValueError:
+            raise ValueError(f"{value!r} is not a number")
+    # "2.0" is fine for an integer code, "2.7" isn't rounded or cut to 2
+    if cast is int and not float(number).is_integer():
+        raise ValueError(f"{value!r} is not a whole number")
+    return cast(number)
+
+
+class CodedInteger(TypeDecorator):
+    impl = Integer
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return int
+
+    def process_bind_param(self, value, dialect):
+        return parse_number(value, int)
+
+
+class CodedFloat(TypeDecorator):
+    impl = Float
+    cache_ok = True
+
+    @property
+    def python_type(self):
+        return float
+
+    def process_bind_param(self, value, dialect):
+        return parse_number(value, float)
+
+
+class ChoiceCode(TypeDecorator):
+    impl = SmallInteger
+    cache_ok = True
+
+    def __init__(self, values):
+        super().__init__()
+        self.values = tuple(values)
+        self._codes = {v: i for i, v in enumerate(self.values)}
+
+    @property
+    def python_type(self):
+        return str
+
+    def process_bind_param(self, value, dialect):
+        if value is None or value == "":
+            return None
+        if isinstance(value, int):
+            return value
+        if value not in self._codes:
+            raise ValueError(f"{value!r} is not one of {list(self.values)}")
+        return self._codes[value]
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return self.values[value]
+
+
+class MultiChoiceCode(TypeDecorator):
+    impl = Integer
+    cache_ok = True
+
+    def __init__(self, values):
+        super().__init__()
+        self.values = tuple(values)
+        self._bits = {v: 1 << i for i, v in enumerate(self.values)}
+
+    @property
+    def python_type(self):
+        return str
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, int):
+            return value
+        if isinstance(value, str):
+            value = [v.strip() for v in value.split(";") if v.strip()]
+        mask = 0
+        for v in value:
+            if v not in self._bits:
+                raise ValueError(f"{v!r} is not one of {list(self.values)}")
+            mask |= self._bits[v]
+        return mask
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return "; ".join(v for v, bit in self._bits.items() if value & bit)
+
+
+def column_type(spec):
+    # Column type for a codebook.FieldSpec
+    if spec.type == "integer":
+        return CodedInteger()
+    if spec.type == "float":
+        return CodedFloat()
+    if spec.type == "choice" and spec.options:
+        return ChoiceCode(spec.options)
+    if spec.type == "multi" and spec.options:
+        return MultiChoiceCode(spec.options)
+    return String()
+
+
+# === Codebook the stored values were saved with ===
+# Stored choice positions and bitmasks only mean something together with the
+# options they were saved with, so `annotation_codes` records the codebook
+# type and options of every column. migrate.py decodes old values through
+# them when a code's type or options change; init_db records them for a new
+# database.
+CODES_TABLE = "annotation_codes"
+CREATE_CODES_TABLE = (
+    f"CREATE TABLE IF NOT EXISTS {CODES_TABLE} "
+    "(code VARCHAR PRIMARY KEY, type VARCHAR NOT NULL, options TEXT NOT NULL)"
+)
+
+
+def code_kind(column):
+    # The codebook type a column stores: "integer", "float", "choice",
+    # "multi" or "text"
+    for kind, type_class in (
+        ("integer", CodedInteger), ("float", CodedFloat), ("choice", ChoiceCode), ("multi", MultiChoiceCode)
+    ):
+        if isinstance(column.type, type_class):
+            return kind
+    return "text"
+
+
+def code_rows(table):
+    # (code, type, options as JSON) for every column but the id
+    return [
+        (column.name, code_kind(column), json.dumps(list(getattr(column.type, "values", ()))))
+        for column in table.columns
+        if column.name != "id"
+    ]
+
+
+def record_codes_sql(replace=True):
+    # Existing rows are kept with replace=False, for recording a database's
+    # codebook only where it isn't known yet
+    return f"INSERT OR {'REPLACE' if replace else 'IGNORE'} INTO {CODES_TABLE} (code, type, options) VALUES (?, ?, ?)"
+
+
+# === Models ===
+# Built from the codebook by init_db, so the table has a column for every
+# code, typed as the codebook says
+def build_models(schema):
+    # Returns (Base, Annotation, AnnotationChange) for a codebook.CodebookSchema
+    Base = declarative_base()
+
+    class Annotation(Base):
+        __tablename__ = "annotations"
+        # One row per experiment of an article and coder; saves upsert on this key
+        __table_args__ = (
+            Index("ux_annotations_key", "article_index", "experiment_number", "coder", unique=True),
+        )
+
+        id = Column(Integer, primary_key=True, index=True)
+        article_index = Column(String, index=True, nullable=False)
+        # As the authors number them, e.g. "1", "2a", "2b"
+        experiment_number = Column(String, nullable=False, default="1")
+        # Who coded the row, so an article can be double-coded; "" when the
+        # coder didn't give an ID (and for rows saved before coder IDs existed)
+        coder = Column(String, nullable=False, default="", server_default="")
+        authors = Column(String)
+        year = Column(String)
+        title = Column(String)
+        journal = Column(String)
+        url = Column(String)
+        searchterms = Column(String)
+
+    # Add all codebook fields with the column type the codebook asks for
+    for spec in schema:
+        if spec.code not in Annotation.__table__.columns:
+            setattr(Annotation, spec.code, Column(column_type(spec)))
+
+    # The change log (see below)
+    class AnnotationChange(Base):
+        __tablename__ = "annotation_changes"
+        __table_args__ = {"sqlite_autoincrement": True}
+
+        seq = Column(Integer, primary_key=True)
+        op = Column(String, nullable=False)  # "insert", "update" or "delete"
+        article_index = Column(String, nullable=False)
+        experiment_number = Column(String, nullable=False)
+        coder = Column(String, nullable=False, default="", server_default="")
+
+    return Base, Annotation, AnnotationChange
+
+
+# === Change log ===
+# Triggers append every insert, update and delete on `annotations` to
+# `annotation_changes`, whose AUTOINCREMENT `seq` only ever grows. A process
+# that has seen the log up to some seq can catch up on other coders' saves by
+# reading just the rows after it, instead of re-reading the whole table. The
+# triggers also catch writes that bypass save_annotations (e.g. cli.py). The
+# AnnotationChange model is built with Annotation in build_models.
+def log_change_sql(op, row):
+    return (
+        f"INSERT INTO annotation_changes (op, article_index, experiment_number, coder) "
+        f"VALUES ('{op}', {row}.article_index, {row}.experiment_number, {row}.coder);"
+    )
+
+
+SAME_KEY = " AND ".join(f"OLD.{column} IS NEW.{column}" for column in KEY_COLUMNS)
+CHANGE_LOG_TRIGGERS = {
+    "annotations_log_insert": f"AFTER INSERT ON annotations BEGIN {log_change_sql('insert', 'NEW')} END",
+    "annotations_log_update": f"AFTER UPDATE ON annotations WHEN {SAME_KEY} BEGIN {log_change_sql('update', 'NEW')} END",
+    # A changed key is the old key going away and the new one appearing
+    "annotations_log_rekey": (
+        f"AFTER UPDATE ON annotations WHEN NOT ({SAME_KEY}) "
+        f"BEGIN {log_change_sql('delete', 'OLD')} {log_change_sql('insert', 'NEW')} END"
+    ),
+    "annotations_log_delete": f"AFTER DELETE ON annotations BEGIN {log_change_sql('delete', 'OLD')} END",
+}
+
+# Log rows kept when pruning at startup; a process further behind than this
+# rebuilds its view from the annotations table instead
+CHANGE_LOG_KEEP = 50_000
+
+
+def change_log_statements(log_columns):
+    # Logs written before coder IDs existed get the column added in place,
+    # keeping their seqs; the triggers are recreated so they always match
+    # the columns above. Also run by migrate.py after copying the table.
+    statements = []
+    if "coder" not in log_columns:
+        statements.append("ALTER TABLE annotation_changes ADD COLUMN coder VARCHAR NOT NULL DEFAULT ''")
+    for name, body in CHANGE_LOG_TRIGGERS.items():
+        statements += [f"DROP TRIGGER IF EXISTS {name}", f"CREATE TRIGGER {name} {body}"]
+    return statements
+
+
+def install_change_log(conn):
+    log_columns = {row[1] for row in conn.exec_driver_sql("PRAGMA table_info(annotation_changes)")}
+    for statement in change_log_statements(log_columns):
+        conn.exec_driver_sql(statement)
+    conn.exec_driver_sql(
+        "DELETE FROM annotation_changes WHERE seq <= (SELECT MAX(seq) FROM annotation_changes) - ?",
+        (CHANGE_LOG_KEEP,),
+    )
+
+
+# === Database change detection ===
+# `PRAGMA data_version` changes whenever another connection commits to the
+# database, so a long-lived watcher connection gives us a cheap version number
+# for cache keys. The file's inode is included so that replacing annotations.db
+# (e.g. restoring a backup) also counts as a change.
+class DataVersion:
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._inode = None
+
+    def current(self):
+        with self._lock:
+            if not os.path.exists(self.db_path):
+                return None
+            stat = os.stat(self.db_path)
+            inode = (stat.st_dev, stat.st_ino)
+            if self._conn is None or inode != self._inode:
+                # (Re)open the watcher connection if the file was replaced
+                if self._conn is not None:
+                    self._conn.close()
+                self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+                self._inode = inode
+            (data_version,) = self._conn.execute("PRAGMA data_version").fetchone()
+            return inode, data_version
+
+
+# === In-process index of coded (article_index, experiment_number, coder) keys ===
+# The dashboard only needs to know which articles are coded, so rather than
+# re-reading the whole annotations table after every save we keep the set of
+# keys in memory. When the database changes, only the change log rows after
+# the last seq seen are applied; the index is rebuilt from scratch only when
+# the file was replaced or the log no longer reaches back that far.
+class CodedIndex:
+    def __init__(self, data_version):
+        self.data_version = data_version
+        self._lock = threading.Lock()
+        self._version = None
+        self._seq = 0
+        self._keys = set()
+        # article -> number of coded experiments, over all coders and per coder
+        self._article_counts = {}
+        self._coder_articles = {}
+
+    def _rebuild(self):
+        self._keys = set()
+        self._article_counts = {}
+        self._coder_articles = {}
+        with engine.connect() as conn:
+            # Read the keys and the log position from one snapshot
+            conn.exec_driver_sql("BEGIN")
+            rows = conn.exec_driver_sql("SELECT article_index, experiment_number, coder FROM annotations").fetchall()
+            self._seq = conn.exec_driver_sql("SELECT COALESCE(MAX(seq), 0) FROM annotation_changes").scalar()
+            conn.exec_driver_sql("COMMIT")
+        for article_index, experiment_number, coder in rows:
+            self._add_key(article_index, experiment_number, coder)
+
+    def _apply_changes(self):
+        # Returns False if changes after our seq were pruned from the log
+        with engine.connect() as conn:
+            changes = conn.exec_driver_sql(
+                "SELECT seq, op, article_index, experiment_number, coder FROM annotation_changes "
+                "WHERE seq > ? ORDER BY seq",
+                (self._seq,),
+            ).fetchall()
+        # Writes are serialized, so seqs have no gaps unless rows were pruned
+        if changes and changes[0][0] != self._seq + 1:
+            return False
+        for seq, op, article_index, experiment_number, coder in changes:
+            if op == "delete":
+                self._remove_key(article_index, experiment_number, coder)
+            else:
+                self._add_key(article_index, experiment_number, coder)
+            self._seq = seq
+        return True
+
+    def _add_key(self, article_index, experiment_number, coder):
+        key = (str(article_index), str(experiment_number), coder or "")
+        if key not in self._keys:
+            self._keys.add(key)
+            self._article_counts[key[0]] = self._article_counts.get(key[0], 0) + 1
+            articles = self._coder_articles.setdefault(key[2], {})
+            articles[key[0]] = articles.get(key[0], 0) + 1
+
+    def _remove_key(self, article_index, experiment_number, coder):
+        key = (str(article_index), str(experiment_number), coder or "")
+        if key in self._keys:
+            self._keys.remove(key)
+            for counts in (self._article_counts, self._coder_articles[key[2]]):
+                counts[key[0]] -= 1
+                if not counts[key[0]]:
+                    del counts[key[0]]
+
+    def refresh(self):
+        with self._lock:
+            version = self.data_version.current()
+            if version == self._version:
+                return
+            # A different file (inode) means the log can't be trusted
+            replaced = self._version is None or version is None or version[0] != self._version[0]
+            if replaced or not self._apply_changes():
+                self._rebuild()
+            self._version = version
+
+    def add(self, article_index, experiment_number, coder=""):
+        # Record a save made through this process right away; the next
+        # refresh reads it from the log again, which is harmless
+        with self._lock:
+            self._add_key(article_index, experiment_number, coder)
+
+    def is_coded(self, article_index, experiment_number, coder=""):
+        self.refresh()
+        with self._lock:
+            return (str(article_index), str(experiment_number), coder or "") in self._keys
+
+    def coded_articles(self, coder=None):
+        # Articles with at least one coded experiment, by anyone or by `coder`.
+        # Copied under the lock: other sessions' saves change the counts.
+        self.refresh()
+        with self._lock:
+            if coder is None:
+                return set(self._article_counts)
+            return set(self._coder_articles.get(coder, ()))
+
+
+# === Batched writes ===
+# SQLite allows one writer at a time, so rather than every coder's thread
+# taking a lock and committing on its own, saves are queued to a single
+# writer thread. Whatever has queued up while the previous commit was running
+# is written in one transaction (group commit), so N simultaneous saves cost
+# one fsync instead of N, and readers are never blocked under WAL.
+MAX_WRITE_BATCH = 64
+
+
+class BatchWriter:
+    def __init__(self, session_factory, max_batch=MAX_WRITE_BATCH, name="annotation-writer"):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.name = name
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def submit(self, write_fn):
+        # `write_fn(session)` runs inside the writer's transaction; returns a
+        # Future resolved with its return value once the batch has committed
+        future = Future()
+        self._queue.put((write_fn, future))
+        self._ensure_started()
+        return future
+
+    def run(self, write_fn):
+        return self.submit(write_fn).result()
+
+    def _run(self):
+        while True:
+            jobs = [self._queue.get()]
+            while len(jobs) < self.max_batch:
+                try:
+                    jobs.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write_batch(jobs)
+
+    def _write_batch(self, jobs):
+        session = self.session_factory()
+        try:
+            results = [write_fn(session) for write_fn, _ in jobs]
+            session.commit()
+        except Exception:
+            session.rollback()
+            session.close()
+            if len(jobs) > 1:
+                # Don't let one bad entry fail everyone else's save
+                for job in jobs:
+                    self._write_batch([job])
+            else:
+                _, future = jobs[0]
+                future.set_exception(sys.exc_info()[1])
+            return
+        session.close()
+        for (_, future), result in zip(jobs, results):
+            future.set_result(result)
+
+
+# === Saving annotations ===
+def annotation_row(entry_dict):
+    # Keep only real columns, with the experiment number ("1" if none given)
+    # and the coder ("" if none given) as trimmed strings, since both are in
+    # the key
+    ensure_db()
+    row = {k: v for k, v in entry_dict.items() if k in WRITABLE_COLUMNS}
+    row["experiment_number"] = str(row.get("experiment_number") or "").strip() or "1"
+    row["coder"] = str(row.get("coder") or "").strip()
+    return row
+
+
+# Compiled once per set of columns being saved (in practice, one per form)
+# and executed with bound parameters; only the columns present are updated
+@functools.lru_cache(maxsize=32)
+def _upsert_for_columns(columns):
+    stmt = insert(Annotation.__table__)
+    updates = {k: stmt.excluded[k] for k in columns if k not in KEY_COLUMNS}
+    if not updates:
+        return stmt.on_conflict_do_nothing(index_elements=KEY_COLUMNS)
+    return stmt.on_conflict_do_update(index_elements=KEY_COLUMNS, set_=updates)
+
+
+def upsert_statement(row):
+    ensure_db()
+    return _upsert_for_columns(tuple(sorted(row)))
+
+
+def save_annotations(entries):
+    # Saves several rows (e.g. every experiment of one article) in a single
+    # transaction: either all of them are stored or none are
+    rows = [annotation_row(entry) for entry in entries]
+    if not rows:
+        return 0
+
+    # Rows saving the same columns share one INSERT ... ON CONFLICT DO UPDATE
+    # on the composite key, executed with a parameter list
+    groups = {}
+    for row in rows:
+        groups.setdefault(tuple(sorted(row)), []).append(row)
+
+    def write(session):
+        for columns, group in groups.items():
+            session.execute(_upsert_for_columns(columns), group)
+
+    with perf.timed("save_annotations", rows=len(rows)):
+        writer.run(write)
+    for row in rows:
+        coded_index.add(row["article_index"], row["experiment_number"], row["coder"])
+    return len(rows)
+
+
+def save_annotation(entry_dict):
+    save_annotations([entry_dict])
+
+
+# === Initialization ===
+# Importing db.py reads and creates nothing. init_db() loads the codebook,
+# builds the models, opens the engine, brings the database up to date and
+# starts the coded index and writer, once per process. The app calls it with
+# its own paths; elsewhere the first use of any of the names below (e.g.
+# `db.engine`, or `from db import engine`) initializes with the defaults.
+INITIALIZED_NAMES = frozenset({
+    "code_fields", "code_types", "code_values", "engine", "SessionLocal", "DATABASE_PATH",
+    "Base", "Annotation", "AnnotationChange", "WRITABLE_COLUMNS", "db_version", "coded_index", "writer",
+})
+
+_init_lock = threading.Lock()
+_initialized_paths = None
+
+
+def init_db(database_path=DATABASE_FILE, codebook_path=CODEBOOK_FILE):
+    global code_fields, code_types, code_values, engine, SessionLocal, DATABASE_PATH
+    global Base, Annotation, AnnotationChange, WRITABLE_COLUMNS, db_version, coded_index, writer
+    global _initialized_paths
+    paths = (os.path.abspath(database_path), os.path.abspath(codebook_path))
+    with _init_lock:
+        if _initialized_paths is not None:
+            if paths != _initialized_paths:
+                raise RuntimeError(f"db.py is already initialized for {_initialized_paths[0]}")
+            return
+        # Imported here so importing db.py doesn't load Polars
+        from codebook import CodebookSchema
+
+        schema = CodebookSchema.from_csv(codebook_path)
+        code_fields = list(schema.fields)
+        # How each code is stored: "integer", "float", "choice" (one of its
+        # options), "multi" (any of them, i.e. checkall) or "text"
+        code_types = {spec.code: spec.type for spec in schema}
+        # Allowed values of the choice/multi codes, in codebook order
+        code_values = {spec.code: list(spec.options) for spec in schema if spec.options}
+
+        engine = make_engine(database_path)
+        SessionLocal = sessionmaker(bind=engine)
+        DATABASE_PATH = engine.url.database
+        Base, Annotation, AnnotationChange = build_models(schema)
+        # Columns a saved row may set (the id is assigned by SQLite)
+        WRITABLE_COLUMNS = frozenset(Annotation.__table__.columns.keys()) - {"id"}
+
+        # Bring an existing database in line with the codebook (see
+        # migrate.py), then create the tables if they don't exist and
+        # record the codebook a new database is saved with
+        from migrate import migrate_annotations
+
+        for warning in migrate_annotations(DATABASE_PATH, Annotation.__table__).warnings():
+            print(f"migrate: {warning}", file=sys.stderr)
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            install_change_log(conn)
+            conn.exec_driver_sql(CREATE_CODES_TABLE)
+            conn.exec_driver_sql(record_codes_sql(replace=False), code_rows(Annotation.__table__))
+
+        db_version = DataVersion(DATABASE_PATH)
+        coded_index = CodedIndex(db_version)
+        writer = BatchWriter(SessionLocal)
+        _initialized_paths = paths
+
+
+def ensure_db():
+    # Initializes with the defaults unless init_db has already run
+    if _initialized_paths is None:
+        init_db()
+
+
+def __getattr__(name):
+    if name in INITIALIZED_NAMES:
+        ensure_db()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
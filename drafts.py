@@ -0,0 +1,172 @@
+# Drafts of the Add Entry and Review Entry forms, so answers that haven't
+# been submitted yet survive a dropped connection or a server restart. A
+# draft is the form's widget values, keyed on (coder, article, experiment),
+# and is restored when the coder reopens the article from the dashboard.
+#
+# Recording a draft never touches the disk on the calling (script) thread:
+# update() only replaces the key's pending value in memory. A background
+# thread writes a key once it has gone DRAFT_DEBOUNCE seconds without a
+# change (or has waited DRAFT_MAX_DELAY), all keys that are due in one
+# transaction through a db.BatchWriter. Values identical to the ones last
+# written are skipped.
+#
+# Drafts live in their own database file next to annotations.db, so writing
+# one doesn't change annotations.db's data version and invalidate the
+# summaries and exports cached on it.
+import json
+import os
+import threading
+import time
+
+from sqlalchemy import Column, Float, String, Text
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.orm import sessionmaker
+
+from db import BatchWriter, make_engine
+
+# Seconds a draft has to stay unchanged before it is written, and the longest
+# a changing draft waits
+DRAFT_DEBOUNCE = 2.0
+DRAFT_MAX_DELAY = 10.0
+
+# The Add Entry form covers all experiments of an article; its drafts are
+# stored under this experiment number
+WHOLE_ARTICLE = ""
+
+Base = declarative_base()
+
+
+class Draft(Base):
+    __tablename__ = "drafts"
+
+    coder = Column(String, primary_key=True)
+    article_index = Column(String, primary_key=True)
+    experiment_number = Column(String, primary_key=True)
+    fields = Column(Text, nullable=False)  # JSON object of widget key -> value
+    saved_at = Column(Float, nullable=False)  # time.time() of the last change
+
+
+def drafts_path(database_path):
+    # annotations.db -> annotations.drafts.db
+    return os.path.splitext(database_path)[0] + ".drafts.db"
+
+
+class PendingDraft:
+    __slots__ = ("fields", "saved_at", "first_change", "last_change")
+
+    def __init__(self, fields, now):
+        self.fields = fields
+        self.saved_at = time.time()
+        self.first_change = now
+        self.last_change = now
+
+
+class DraftStore:
+    def __init__(self, database_path, debounce=DRAFT_DEBOUNCE, max_delay=DRAFT_MAX_DELAY):
+        self.engine = make_engine(database_path)
+        Base.metadata.create_all(bind=self.engine)
+        self.SessionLocal = sessionmaker(bind=self.engine)
+        self.writer = BatchWriter(self.SessionLocal, name="draft-writer")
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._changed = threading.Condition()
+        self._pending = {}  # key -> PendingDraft
+        self._written = {}  # key -> (fields, saved_at) as last handed to the writer
+        self._thread = threading.Thread(target=self._run, name="draft-autosave", daemon=True)
+        self._thread.start()
+
+    def update(self, coder, article_index, experiment_number, fields):
+        # Called on every rerun of a form; cheap when nothing changed
+        key = (coder, article_index, experiment_number)
+        now = time.monotonic()
+        with self._changed:
+            pending = self._pending.get(key)
+            if pending is not None:
+                if pending.fields != fields:
+                    pending.fields = fields
+                    pending.saved_at = time.time()
+                    pending.last_change = now
+            elif self._written.get(key, (None,))[0] != fields:
+                self._pending[key] = PendingDraft(fields, now)
+                self._changed.notify()
+
+    def discard(self, coder, article_index, experiment_number):
+        # After the annotation is saved (or the form cancelled); queued behind
+        # any write of the same draft already handed to the writer
+        key = (coder, article_index, experiment_number)
+        with self._changed:
+            self._pending.pop(key, None)
+            self._written.pop(key, None)
+            self.writer.submit(lambda session: session.query(Draft).filter_by(
+                coder=coder, article_index=article_index, experiment_number=experiment_number
+            ).delete())
+
+    def load(self, coder, article_index, experiment_number):
+        # (fields, saved_at) of the newest draft, or None: this process's own
+        # unwritten or just-written draft, else the stored one
+        key = (coder, article_index, experiment_number)
+        with self._changed:
+            if key in self._pending:
+                return self._pending[key].fields, self._pending[key].saved_at
+            if key in self._written:
+                return self._written[key]
+        session = self.SessionLocal()
+        try:
+            draft = session.get(Draft, key)
+            return (json.loads(draft.fields), draft.saved_at) if draft is not None else None
+        finally:
+            session.close()
+
+    def flush(self):
+        # Writes everything pending now and waits for it to commit
+        with self._changed:
+            future = self._submit_due(lambda pending: True)
+        if future is not None:
+            future.result()
+
+    def _submit_due(self, is_due):
+        # Hands the due drafts to the writer, under the lock so that a
+        # discard() can't be queued ahead of the write it should follow
+        due = {key: pending for key, pending in self._pending.items() if is_due(pending)}
+        if not due:
+            return None
+        for key, pending in due.items():
+            del self._pending[key]
+            self._written[key] = (pending.fields, pending.saved_at)
+        return self.writer.submit(self._write_fn(due))
+
+    def _write_fn(self, due):
+        rows = [
+            {
+                "coder": coder,
+                "article_index": article_index,
+                "experiment_number": experiment_number,
+                "fields": json.dumps(pending.fields),
+                "saved_at": pending.saved_at,
+            }
+            for (coder, article_index, experiment_number), pending in due.items()
+        ]
+        stmt = insert(Draft.__table__)
+        upsert = stmt.on_conflict_do_update(
+            index_elements=["coder", "article_index", "experiment_number"],
+            set_={"fields": stmt.excluded.fields, "saved_at": stmt.excluded.saved_at},
+        )
+        return lambda session: session.execute(upsert, rows)
+
+    def _run(self):
+        with self._changed:
+            while True:
+                now = time.monotonic()
+                self._submit_due(
+                    lambda p: now - p.last_change >= self.debounce or now - p.first_change >= self.max_delay
+                )
+                # Sleep until the earliest pending draft is due
+                timeout = min(
+                    (
+                        min(p.last_change + self.debounce, p.first_change + self.max_delay) - now
+                        for p in self._pending.values()
+                    ),
+                    default=None,
+                )
+                self._changed.wait(timeout)
@@ -0,0 +1,108 @@
+import csv
+import gzip
+import importlib.util
+import io
+
+from sqlalchemy import select
+
+import db
+
+# Rows fetched from SQLite per round trip; memory use is bounded by this,
+# not by the size of the annotations table
+CHUNK_SIZE = 5000
+
+# label -> (file extension, mime type)
+EXPORT_FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def iter_annotation_chunks(engine, chunk_size=CHUNK_SIZE, table=None, progress=None):
+    # Yields (column names, list of row tuples) from a DB cursor. Selecting
+    # through the table (not raw SQL) decodes the typed codebook columns back
+    # to the strings the coders entered. Defaults to the annotations table.
+    table = db.Annotation.__table__ if table is None else table
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True).execute(select(table))
+        columns = list(result.keys())
+        while True:
+            rows = result.fetchmany(chunk_size)
+            if not rows:
+                break
+            if progress is not None:
+                progress(len(rows))
+            yield columns, [tuple(row) for row in rows]
+
+
+def write_csv(engine, out, chunk_size=CHUNK_SIZE, progress=None):
+    # `out` is a binary file object; returns the number of rows written
+    text = io.TextIOWrapper(out, encoding="utf-8", newline="", write_through=True)
+    writer = csv.writer(text, lineterminator="\n")
+    num_rows = 0
+    header_written = False
+    for columns, rows in iter_annotation_chunks(engine, chunk_size, progress=progress):
+        if not header_written:
+            writer.writerow(columns)
+            header_written = True
+        writer.writerows(rows)
+        num_rows += len(rows)
+    text.flush()
+    text.detach()  # leave `out` open for the caller
+    return num_rows
+
+
+def write_csv_gzip(engine, out, chunk_size=CHUNK_SIZE, progress=None):
+    with gzip.GzipFile(fileobj=out, mode="wb") as gz:
+        return write_csv(engine, gz, chunk_size, progress)
+
+
+def arrow_schema(table=None):
+    import pyarrow as pa
+
+    # Types follow the model, i.e. the values as decoded by SQLAlchemy
+    table = db.Annotation.__table__ if table is None else table
+    arrow_types = {int: pa.int64(), float: pa.float64()}
+    return pa.schema(
+        [pa.field(col.name, arrow_types.get(col.type.python_type, pa.string())) for col in table.columns]
+    )
+
+
+def write_parquet(engine, out, chunk_size=CHUNK_SIZE, progress=None):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = arrow_schema()
+    num_rows = 0
+    with pq.ParquetWriter(out, schema, compression="zstd") as writer:
+        for columns, rows in iter_annotation_chunks(engine, chunk_size, progress=progress):
+            # Transpose the chunk into columns rather than building per-row dicts
+            arrays = [
+                pa.array(values, type=schema.field(name).type)
+                for name, values in zip(columns, zip(*rows))
+            ]
+            batch = pa.RecordBatch.from_arrays(arrays, schema=schema)
+            writer.write_batch(batch)
+            num_rows += len(rows)
+    return num_rows
+
+
+def available_formats():
+    # Parquet needs pyarrow; only offer it when it can be imported
+    formats = ["CSV", "CSV (gzip)"]
+    if importlib.util.find_spec("pyarrow") is not None:
+        formats.append("Parquet")
+    return formats
+
+
+WRITERS = {
+    "CSV": write_csv,
+    "CSV (gzip)": write_csv_gzip,
+    "Parquet": write_parquet,
+}
+
+
+def write_export(engine, export_format, out, chunk_size=CHUNK_SIZE, progress=None):
+    # `progress`, if given, is called with the size of each chunk read
+    return WRITERS[export_format](engine, out, chunk_size, progress)
@@ -0,0 +1,31 @@
+# Exclusive lock on an open file, held for the duration of a `with` block:
+# flock on POSIX, a one-byte msvcrt lock on Windows. Used to serialize
+# processes around a file (csv_append.py), a cache rebuild (shared_cache.py)
+# and a database migration (migrate.py). Blocks until the lock is free.
+import os
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+@contextmanager
+def locked(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        # msvcrt locks a byte range; lock the first byte as a file-wide mutex
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
@@ -0,0 +1,292 @@
+import hashlib
+import importlib.util
+import json
+import os
+import string
+import time
+
+import polars as pl
+
+
+# === Article catalog ===
+# Every sheet of the workbook (one per journal) is normalized once into a
+# single frame with `article_index` and `journal` filled in, so a rerun only
+# has to filter it rather than rebuild `article_index` row by row.
+
+# Same character set as `string.punctuation`
+PUNCTUATION_PATTERN = r"[!-/:-@\[-`{-~]"
+
+
+def is_missing(value):
+    # None or NaN, as an empty workbook cell may come back as either
+    return value is None or value != value
+
+
+def abbreviate_title(title):
+    if is_missing(title):
+        return "no_title"
+    words = [w.translate(str.maketrans('', '', string.punctuation)) for w in str(title).split()]
+    return "_".join(words[:3]).lower()
+
+
+def abbreviate_authors(authors):
+    if is_missing(authors):
+        return "no_authors"
+    surnames = [n.split(" ")[-1] for n in str(authors).split("; ")]
+    surnames = [n.title() for n in surnames]
+    if len(surnames) <= 3:
+        return ", ".join(surnames)
+    else:
+        return ", ".join(surnames[:3]) + " et al."
+
+
+# Native Polars equivalents of the two functions above, for whole columns
+def abbreviate_title_expr(col):
+    words = (
+        col.cast(pl.Utf8)
+        .str.strip_chars()
+        .str.replace_all(r"\s+", " ")
+        .str.split(" ")
+        .list.head(3)
+        .list.eval(pl.element().str.replace_all(PUNCTUATION_PATTERN, ""))
+    )
+    return (
+        pl.when(col.is_null())
+        .then(pl.lit("no_title"))
+        .otherwise(words.list.join("_").str.to_lowercase())
+    )
+
+
+def abbreviate_authors_expr(col):
+    surnames = (
+        col.cast(pl.Utf8)
+        .str.split("; ")
+        .list.eval(pl.element().str.split(" ").list.last().str.to_titlecase())
+    )
+    return (
+        pl.when(col.is_null())
+        .then(pl.lit("no_authors"))
+        .when(surnames.list.len() <= 3)
+        .then(surnames.list.join(", "))
+        .otherwise(surnames.list.head(3).list.join(", ") + pl.lit(" et al."))
+    )
+
+
+def normalize_sheet(df):
+    if "Include" in df.columns:
+        df = df.with_columns(
+            pl.col("Include").cast(pl.Utf8).fill_null("").alias("Include")
+        ).filter(pl.col("Include") != "x")
+    return df.rename({col: col.strip().lower().replace(" ", "_") for col in df.columns if isinstance(col, str)})
+
+
+def build_catalog(journal_articles):
+    # Returns (catalog, journal names in workbook order, sheets that could
+    # not be given an article_index)
+    frames = []
+    skipped = []
+    for journal_name, df in journal_articles.items():
+        df = normalize_sheet(df)
+        if "article_index" not in df.columns:
+            if "title" in df.columns and "date" in df.columns:
+                df = df.with_columns(
+                    (
+                        abbreviate_authors_expr(pl.col("author")) + "_" +
+                        pl.col("date").cast(pl.Utf8) + "_" +
+                        abbreviate_title_expr(pl.col("title"))
+                    ).alias("article_index")
+                )
+            else:
+                skipped.append(journal_name)
+                continue
+        for col in ["title", "author", "url"]:
+            if col not in df.columns:
+                df = df.with_columns(pl.lit(None, dtype=pl.Utf8).alias(col))
+        frames.append(df.with_columns(pl.lit(journal_name).alias("journal")))
+
+    if not frames:
+        return pl.DataFrame(), list(journal_articles), skipped
+
+    # No derived display or search columns are stored: the catalog is cached
+    # for the life of the process, and search.SearchIndex builds its own text
+    catalog = pl.concat(frames, how="diagonal_relaxed").with_row_index("catalog_row")
+    # Concat leaves one chunk per sheet; store the catalog contiguously (this
+    # also avoids a hang seen when st.cache_data pickles multi-chunk frames)
+    return catalog.rechunk(), list(journal_articles), skipped
+
+
+# Part of the shared cache key for catalogs; bump it whenever build_catalog's
+# output changes so replicas don't pick up catalogs built by older code
+CATALOG_VERSION = 2
+
+
+def shared_catalog(store, excel_path):
+    # Same result as build_catalog(load_workbook(...)) plus the load report,
+    # served from a shared_cache.ArrowStore keyed on the workbook's content
+    start = time.perf_counter()
+
+    def build():
+        sheets, report = load_workbook(excel_path)
+        catalog, journal_names, skipped = build_catalog(sheets)
+        meta = {"journal_names": journal_names, "skipped": skipped, "report": report}
+        return {"catalog": catalog}, meta
+
+    frames, meta, hit = store.get_or_build("catalog", workbook_key(excel_path), build)
+    report = {"source": "shared cache", "seconds": time.perf_counter() - start} if hit else meta["report"]
+    return frames["catalog"], meta["journal_names"], meta["skipped"], report
+
+
+def journal_ranges(catalog):
+    # {journal: (first catalog_row, end catalog_row)}; build_catalog keeps
+    # each journal's rows together, so a journal is one contiguous slice
+    if catalog.is_empty():
+        return {}
+    ranges = (
+        catalog.select(pl.col("journal"), pl.col("catalog_row"))
+        .group_by("journal", maintain_order=True)
+        .agg(pl.col("catalog_row").min().alias("start"), pl.col("catalog_row").max().alias("end"))
+    )
+    return {row["journal"]: (row["start"], row["end"] + 1) for row in ranges.iter_rows(named=True)}
+
+
+# === Workbook ingestion ===
+# Parsing the .xlsx is by far the slowest part of a cold start, so the parsed
+# sheets are written once to a sidecar directory of Arrow IPC files next to
+# the workbook. Later starts memory-map those instead of re-parsing. The
+# sidecar is keyed on the workbook's size + mtime, falling back to a content
+# hash when only the mtime differs (e.g. after a fresh git checkout).
+SIDECAR_SUFFIX = ".sidecar"
+SIDECAR_MANIFEST = "manifest.json"
+
+
+def sidecar_dir(excel_path):
+    return excel_path + SIDECAR_SUFFIX
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def calamine_available():
+    return importlib.util.find_spec("fastexcel") is not None
+
+
+def read_workbook(excel_path, engine=None):
+    # Returns ({sheet name: frame}, engine used). calamine (via fastexcel) is
+    # several times faster than openpyxl but is an optional extra.
+    if engine is None:
+        engine = "calamine" if calamine_available() else "openpyxl"
+    if engine == "calamine":
+        sheets = pl.read_excel(excel_path, sheet_id=0, engine="calamine")
+    else:
+        # pandas is only needed here, so it isn't imported until a workbook
+        # has to be parsed without calamine (the sidecar is read by Polars)
+        import pandas as pd
+
+        sheets_dict = pd.read_excel(excel_path, sheet_name=None, engine="openpyxl")
+        sheets = {sheet_name: pl.from_pandas(df) for sheet_name, df in sheets_dict.items()}
+    return sheets, engine
+
+
+def read_sidecar_manifest(excel_path):
+    try:
+        with open(os.path.join(sidecar_dir(excel_path), SIDECAR_MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def sidecar_is_fresh(excel_path, manifest):
+    if manifest is None:
+        return False
+    stat = os.stat(excel_path)
+    if manifest.get("size") != stat.st_size:
+        return False
+    if manifest.get("mtime_ns") == stat.st_mtime_ns:
+        return True
+    # Same size, different mtime: only a content hash can tell
+    if manifest.get("sha256") != file_hash(excel_path):
+        return False
+    manifest["mtime_ns"] = stat.st_mtime_ns
+    write_sidecar_manifest(excel_path, manifest)
+    return True
+
+
+def write_sidecar_manifest(excel_path, manifest):
+    path = os.path.join(sidecar_dir(excel_path), SIDECAR_MANIFEST)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
+
+
+def write_sidecar(excel_path, sheets):
+    directory = sidecar_dir(excel_path)
+    os.makedirs(directory, exist_ok=True)
+    stat = os.stat(excel_path)
+    manifest = {
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "sha256": file_hash(excel_path),
+        "sheets": [],
+    }
+    for i, (sheet_name, df) in enumerate(sheets.items()):
+        file_name = f"sheet_{i:03d}.arrow"
+        # Uncompressed IPC so it can be memory-mapped on read. Write beside
+        # and rename, since another process may have the old file mapped.
+        path = os.path.join(directory, file_name)
+        df.write_ipc(path + ".tmp", compression="uncompressed")
+        os.replace(path + ".tmp", path)
+        manifest["sheets"].append({"name": sheet_name, "file": file_name})
+    # The manifest goes last, so a half-written sidecar is never picked up
+    write_sidecar_manifest(excel_path, manifest)
+
+
+def read_sidecar(excel_path, manifest):
+    # Polars memory-maps uncompressed IPC files from local disk by default
+    directory = sidecar_dir(excel_path)
+    return {
+        sheet["name"]: pl.read_ipc(os.path.join(directory, sheet["file"]))
+        for sheet in manifest["sheets"]
+    }
+
+
+def workbook_key(excel_path):
+    # Content hash of the workbook plus the catalog version, reusing the
+    # sidecar's hash when the sidecar is fresh
+    manifest = read_sidecar_manifest(excel_path)
+    digest = manifest["sha256"] if sidecar_is_fresh(excel_path, manifest) else file_hash(excel_path)
+    return f"{digest[:32]}-v{CATALOG_VERSION}"
+
+
+def load_workbook(excel_path, use_sidecar=True, engine=None):
+    # Returns ({sheet name: frame}, report), where report records which path
+    # was taken and how long it took
+    start = time.perf_counter()
+    if not os.path.exists(excel_path):
+        return {}, {"source": "missing", "seconds": 0.0}
+
+    if use_sidecar:
+        manifest = read_sidecar_manifest(excel_path)
+        if sidecar_is_fresh(excel_path, manifest):
+            try:
+                sheets = read_sidecar(excel_path, manifest)
+                return sheets, {"source": "sidecar", "seconds": time.perf_counter() - start}
+            except OSError:
+                pass  # fall through and rebuild it
+
+    sheets, engine = read_workbook(excel_path, engine)
+    parsed = time.perf_counter()
+    report = {"source": engine, "seconds": parsed - start}
+    if use_sidecar:
+        try:
+            write_sidecar(excel_path, sheets)
+            report["sidecar_write_seconds"] = time.perf_counter() - parsed
+        except OSError:
+            # A read-only checkout just means no sidecar
+            pass
+    return sheets, report
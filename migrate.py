@@ -0,0 +1,481 @@
+# Brings an existing annotations table in line with the model built from the
+# codebook (see db.build_models), in place, so a changed codebook never needs
+# an export and reimport. The live schema is diffed against the model:
+#   - codes new to the codebook are added with ALTER TABLE ADD COLUMN, which
+#     SQLite does without touching the rows, however large the table;
+#   - a code whose storage type changed, whose codebook type or options
+#     changed other than by appending options (as recorded in
+#     annotation_codes, see db.py), or a table from before the current key
+#     (older databases had no uniqueness on article and experiment, so
+#     possibly duplicate rows per experiment, and had no coder column; some
+#     stored experiment_number as INTEGER), needs the table copied: SQLite
+#     can't change a column's type or a table's key in place.
+#
+# The copy goes into a new table in chunks of COPY_CHUNK_SIZE rows by id,
+# converting values in SQL and keeping the newest row per key, each chunk in
+# its own short transaction, with a pause in between, so other processes'
+# saves only wait for about one chunk. Rows saved meanwhile (newer ids, and
+# keys in the change log) are copied again in the final transaction, which
+# swaps the new table in and builds its indexes; that is the longest wait,
+# about as long as building the indexes of a fresh import. A backup copy of
+# the file is taken first. Columns that are no longer in the codebook are
+# kept, with their data.
+#
+# Choice positions and multi bitmasks are decoded through the options they
+# were saved with and encoded again for the new codebook. Numbers saved with
+# options nobody recorded (a database from before annotation_codes) can't be
+# decoded, so such a change is refused before anything is touched. Values the
+# new codebook can't hold are dropped; they, and rows merged into a newer row
+# with the same key, are counted in the MigrationReport, and the backup still
+# has them.
+#
+# App processes started before a codebook change keep their old model, so
+# restart them afterwards. For a large table, run `python cli.py migrate`
+# before starting the app to see the copy's progress.
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+
+from sqlalchemy import MetaData
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.schema import CreateColumn, CreateIndex, CreateTable
+
+from db import (
+    BLANK_NUMBERS,
+    BUSY_TIMEOUT,
+    CODES_TABLE,
+    CREATE_CODES_TABLE,
+    KEY_COLUMNS,
+    ChoiceCode,
+    CodedFloat,
+    CodedInteger,
+    MultiChoiceCode,
+    change_log_statements,
+    code_kind,
+    code_rows,
+    parse_number,
+    record_codes_sql,
+)
+from file_lock import locked
+
+# Rows copied per transaction when a column's type changes, and the pause
+# between transactions. SQLite's busy handler retries a waiting write after
+# sleeps of up to 100 ms, so without the pause the copy could take the next
+# chunk before a waiting save gets its turn.
+COPY_CHUNK_SIZE = 20_000
+COPY_PAUSE = 0.1
+
+# Name of the table being filled during a copy, of its temporary key, and of
+# the table collecting the values the copy drops
+COPY_TABLE = "annotations_migration"
+COPY_KEY_INDEX = "ux_annotations_migration_key"
+DROPPED_TABLE = "annotations_migration_dropped"
+
+# Dropped values shown per code in a warning
+DROPPED_EXAMPLES = 3
+
+# SQL function, registered on the migration's connection, converting a value
+# for a numeric code with db.parse_number, the rule the form saves by
+NUMBER_FUNCTION = "coded_number"
+
+DIALECT = sqlite.dialect()
+
+
+class MigrationError(Exception):
+    pass
+
+
+@dataclass
+class MigrationReport:
+    added: list = field(default_factory=list)  # names of the columns added
+    copied: int | None = None  # rows in the new table, None if not copied
+    merged: int = 0  # old rows dropped for a newer row with the same key
+    dropped: dict = field(default_factory=dict)  # code -> values dropped
+    dropped_examples: dict = field(default_factory=dict)  # code -> the most common of them
+    backup_path: str | None = None
+
+    def warnings(self):
+        # What the copy lost, for the person running it
+        if self.merged:
+            yield (
+                f"{self.merged} rows were merged into newer rows with the same article, experiment and coder; "
+                f"the old rows are in {self.backup_path}"
+            )
+        for code, count in self.dropped.items():
+            examples = ", ".join(repr(value) for value in self.dropped_examples[code])
+            yield (
+                f"{count} {code} values don't fit the codebook's type or options and were dropped "
+                f"(e.g. {examples}); the old values are in {self.backup_path}"
+            )
+
+
+def live_column_types(conn, table_name="annotations"):
+    return {row[1]: row[2].upper() for row in conn.execute(f"PRAGMA table_info({table_name})")}
+
+
+def model_column_type(column):
+    return column.type.compile(dialect=DIALECT).upper()
+
+
+# === Recorded codebook ===
+def stored_codes(conn):
+    # code -> (codebook type, options) the stored values were saved with; {}
+    # for a database from before annotation_codes
+    if not live_column_types(conn, CODES_TABLE):
+        return {}
+    return {
+        code: (kind, tuple(json.loads(options)))
+        for code, kind, options in conn.execute(f"SELECT code, type, options FROM {CODES_TABLE}")
+    }
+
+
+def model_codes(table):
+    # The model's codes as stored_codes() reads them back once recorded
+    return {code: (kind, tuple(json.loads(options))) for code, kind, options in code_rows(table)}
+
+
+def record_codes(conn, table):
+    # Within the caller's transaction; codes no longer in the codebook keep
+    # their rows, like their columns
+    conn.execute(CREATE_CODES_TABLE)
+    conn.executemany(record_codes_sql(), code_rows(table))
+
+
+def codes_changed(column, saved):
+    # Whether values saved as `saved` (type, options) mean something else
+    # under the column's codebook entry now; appended options are fine
+    kind, options = saved
+    new_options = getattr(column.type, "values", ())
+    return kind != code_kind(column) or kind in ("choice", "multi") and new_options[: len(options)] != options
+
+
+def plan_migration(conn, table, codes):
+    # (model columns missing from the live table, live columns whose values
+    # have to be converted, whether the table has to be copied); nothing to
+    # do for a table that doesn't exist yet
+    live = live_column_types(conn, table.name)
+    if not live:
+        return [], [], False
+    indexes = {row[1] for row in conn.execute(f"PRAGMA index_list({table.name})")}
+    added = [column for column in table.columns if column.name not in live]
+    changed = [
+        column for column in table.columns
+        if column.name in live and (
+            live[column.name] != model_column_type(column)
+            or column.name in codes and codes_changed(column, codes[column.name])
+        )
+    ]
+    rekey = "experiment_number" not in live or "coder" not in live or "ux_annotations_key" not in indexes
+    return added, changed, bool(changed) or rekey
+
+
+def undecodable_columns(live, changed, codes):
+    # Changed columns holding numbers that may be choice positions or
+    # bitmasks, saved with options nobody recorded
+    return [
+        column.name for column in changed
+        if column.name not in codes and column.name not in KEY_COLUMNS and live[column.name] in ("INTEGER", "SMALLINT")
+    ]
+
+
+# === Adding columns ===
+def add_columns(conn, table, columns):
+    # One transaction; ADD COLUMN only rewrites the schema, not the rows
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for column in columns:
+            conn.execute(f"ALTER TABLE {table.name} ADD COLUMN {CreateColumn(column).compile(dialect=DIALECT)}")
+        for index in table.indexes:
+            if any(column in columns for column in index.columns):
+                conn.execute(str(CreateIndex(index, if_not_exists=True).compile(dialect=DIALECT)))
+        record_codes(conn, table)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+# === Copying the table ===
+def sql_literal(text):
+    return "'" + text.replace("'", "''") + "'"
+
+
+def decoded_sql(name, saved):
+    # SQL giving a stored value as the form would: choice positions and multi
+    # bitmasks as their options, decoded through the options they were saved
+    # with; other values (numbers, text) as they are
+    kind, options = saved or ("text", ())
+    if kind == "choice":
+        cases = " ".join(f"WHEN {i} THEN {sql_literal(v)}" for i, v in enumerate(options))
+        return f"CASE WHEN typeof({name}) = 'integer' THEN CASE {name} {cases} END ELSE {name} END"
+    if kind == "multi":
+        # Each ticked option with a leading separator, the first one cut off
+        ticked = " || ".join(
+            f"(CASE WHEN {name} & {1 << i} THEN {sql_literal('; ' + v)} ELSE '' END)" for i, v in enumerate(options)
+        )
+        return f"CASE WHEN typeof({name}) = 'integer' THEN substr({ticked}, 3) ELSE {name} END"
+    return name
+
+
+def coded_number(value, kind):
+    # NUMBER_FUNCTION: the number an integer or float code stores for
+    # `value`, or NULL if the form would reject it
+    try:
+        return parse_number(value, int if kind == "integer" else float)
+    except ValueError:
+        return None
+
+
+def ticked_sql(trimmed, values):
+    # SQL per option: whether the "; "-separated text `trimmed` lists it
+    padded = f"('; ' || {trimmed} || '; ')"
+    return [f"instr({padded}, {sql_literal('; ' + v + '; ')}) > 0" for v in values]
+
+
+def conversion_sql(column, saved=None):
+    # SQL turning an old value of `column`, saved as `saved` (type, options)
+    # or as the form gives it if unknown, into its new storage
+    name = f'"{column.name}"'
+    if column.name == "experiment_number":
+        # Kept as the authors wrote it ("2a"); blank falls back to "1"
+        return f"COALESCE(NULLIF(TRIM(CAST({name} AS TEXT)), ''), '1')"
+    source = decoded_sql(name, saved)
+    trimmed = f"TRIM({source})"
+    if isinstance(column.type, CodedInteger):
+        # Whole numbers only ("2" or "2.0"); "2.7" becomes NULL, not 2
+        return f"{NUMBER_FUNCTION}({source}, 'integer')"
+    if isinstance(column.type, CodedFloat):
+        return f"{NUMBER_FUNCTION}({source}, 'float')"
+    if isinstance(column.type, ChoiceCode):
+        cases = " ".join(f"WHEN {sql_literal(v)} THEN {i}" for i, v in enumerate(column.type.values))
+        return f"CASE {trimmed} {cases} END"
+    if isinstance(column.type, MultiChoiceCode):
+        bits = " + ".join(
+            f"(CASE WHEN {ticked} THEN {1 << i} ELSE 0 END)"
+            for i, ticked in enumerate(ticked_sql(trimmed, column.type.values))
+        )
+        return f"CASE WHEN {source} IS NOT NULL THEN {bits} END"
+    return source
+
+
+def dropped_sql(column, saved=None):
+    # SQL true for an old value that isn't blank but loses something in the
+    # conversion: becomes NULL, or for a multi code, lists an option the new
+    # codebook doesn't have
+    name = f'"{column.name}"'
+    source = decoded_sql(name, saved)
+    trimmed = f"TRIM({source})"
+    blanks = ", ".join(sql_literal(blank) for blank in sorted(BLANK_NUMBERS))
+    answered = f"{name} IS NOT NULL AND ({source} IS NULL OR lower({trimmed}) NOT IN ({blanks}))"
+    if isinstance(column.type, MultiChoiceCode):
+        listed = f"(length({trimmed}) - length(replace({trimmed}, ';', '')) + 1)"
+        matched = " + ".join(f"({ticked})" for ticked in ticked_sql(trimmed, column.type.values))
+        return f"{answered} AND ({source} IS NULL OR {matched} < {listed})"
+    return f"{answered} AND ({conversion_sql(column, saved)}) IS NULL"
+
+
+def dropped_select(table, column, saved=None):
+    # SELECT of (id, code, value as the form would give it) for the rows
+    # matching a {where} clause whose value of `column` is dropped
+    name = f'"{column.name}"'
+    value = f"COALESCE({decoded_sql(name, saved)}, {name})"
+    return (
+        f"SELECT id, {sql_literal(column.name)}, {value} FROM {table.name} "
+        f"WHERE ({{where}}) AND {dropped_sql(column, saved)}"
+    )
+
+
+def backup_database(db_path, suffix=".bak"):
+    backup_path = db_path + suffix
+    src = sqlite3.connect(db_path)
+    dst = sqlite3.connect(backup_path)
+    try:
+        src.backup(dst)
+    finally:
+        dst.close()
+        src.close()
+    return backup_path
+
+
+def copy_statements(table, live, changed, codes):
+    # (CREATE TABLE for the copy, ALTERs adding the live columns that are no
+    # longer in the codebook to it, INSERT copying the rows matching a
+    # {where} clause into it, INSERT recording those rows' dropped values in
+    # DROPPED_TABLE (None if no code changed), and the old table's key as SQL)
+    copy = table.to_metadata(MetaData(), name=COPY_TABLE)
+    removed = [name for name in live if name not in table.columns]
+    extra = [f'ALTER TABLE {COPY_TABLE} ADD COLUMN "{name}" {live[name]}' for name in removed]
+    copy_columns = [c for c in table.columns if c.name in live]
+    insert_list = [f'"{c.name}"' for c in copy_columns] + [f'"{name}"' for name in removed]
+    # The experiment number is part of the key, so it's trimmed even when
+    # its type is unchanged
+    select_list = [
+        conversion_sql(c, codes.get(c.name)) if c in changed or c.name == "experiment_number" else f'"{c.name}"'
+        for c in copy_columns
+    ] + [f'"{name}"' for name in removed]
+    experiment = conversion_sql(table.c.experiment_number) if "experiment_number" in live else "1"
+    if "experiment_number" not in live:
+        insert_list.append("experiment_number")
+        select_list.append("1")
+    # Rows from before coder IDs get the column's default, ""; of several
+    # rows with the same key, the newest (highest id) is copied last and wins
+    insert = (
+        f"INSERT OR REPLACE INTO {COPY_TABLE} ({', '.join(insert_list)}) "
+        f"SELECT {', '.join(select_list)} FROM {table.name} WHERE {{where}} ORDER BY id"
+    )
+    checks = [dropped_select(table, c, codes.get(c.name)) for c in changed if c.name not in KEY_COLUMNS]
+    record_dropped = (
+        f"INSERT INTO {DROPPED_TABLE} (id, code, value) " + " UNION ALL ".join(checks) if checks else None
+    )
+    key = f"article_index, {experiment}, " + ("coder" if "coder" in live else "''")
+    return str(CreateTable(copy).compile(dialect=DIALECT)), extra, insert, record_dropped, key
+
+
+def copy_rows(conn, insert, record_dropped, where, params):
+    # Copies the rows matching `where` and records their dropped values;
+    # returns the number of rows copied. (The statements are filled in with
+    # replace() rather than format(), as option labels may contain braces.)
+    cursor = conn.execute(insert.replace("{where}", where), params)
+    if record_dropped is not None:
+        conn.execute(record_dropped.replace("{where}", where), params * record_dropped.count("{where}"))
+    return cursor.rowcount
+
+
+def copy_table(conn, db_path, table, changed, codes, report, progress=None, chunk_size=COPY_CHUNK_SIZE):
+    # Fills in the report's copied, merged, dropped and backup_path
+    report.backup_path = backup_database(db_path)
+    live = live_column_types(conn, table.name)
+    create, extra, insert, record_dropped, key = copy_statements(table, live, changed, codes)
+    log_columns = live_column_types(conn, "annotation_changes")
+    if log_columns and "coder" not in log_columns:
+        # Saves logged during the copy need a coder to be matched on
+        conn.execute("ALTER TABLE annotation_changes ADD COLUMN coder VARCHAR NOT NULL DEFAULT ''")
+        log_columns["coder"] = "VARCHAR"
+
+    # Left over if an earlier copy was interrupted; the live table is intact
+    conn.execute(f"DROP TABLE IF EXISTS {COPY_TABLE}")
+    conn.execute(f"DROP TABLE IF EXISTS {DROPPED_TABLE}")
+    conn.execute(create)
+    for statement in extra:
+        conn.execute(statement)
+    conn.execute(f"CREATE UNIQUE INDEX {COPY_KEY_INDEX} ON {COPY_TABLE} (article_index, experiment_number, coder)")
+    conn.execute(f"CREATE TABLE {DROPPED_TABLE} (id INTEGER NOT NULL, code VARCHAR NOT NULL, value)")
+    start_seq = 0
+    if log_columns:
+        (start_seq,) = conn.execute("SELECT COALESCE(MAX(seq), 0) FROM annotation_changes").fetchone()
+
+    # Rows saved after this are left to the final transaction
+    (max_id,) = conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table.name}").fetchone()
+    last_id = 0
+    while last_id < max_id:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (end_id,) = conn.execute(
+                f"SELECT MAX(id) FROM (SELECT id FROM {table.name} WHERE id > ? AND id <= ? ORDER BY id LIMIT ?)",
+                (last_id, max_id, chunk_size),
+            ).fetchone()
+            end_id = end_id or max_id
+            copied = copy_rows(conn, insert, record_dropped, "id > ? AND id <= ?", [last_id, end_id])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        last_id = end_id
+        if progress is not None:
+            progress(copied)
+        time.sleep(COPY_PAUSE)
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Catch up on saves made during the copy: rows added since, and the
+        # keys the change log saw updated or deleted since it began
+        where = "id > ?"
+        params = [last_id]
+        if log_columns:
+            logged = (
+                "SELECT article_index, CAST(experiment_number AS TEXT), coder FROM annotation_changes WHERE seq > ?"
+            )
+            stale = f"FROM {COPY_TABLE} WHERE (article_index, experiment_number, coder) IN ({logged})"
+            conn.execute(f"DELETE FROM {DROPPED_TABLE} WHERE id IN (SELECT id {stale})", (start_seq,))
+            conn.execute(f"DELETE {stale}", (start_seq,))
+            where += f" OR ({key}) IN ({logged})"
+            params.append(start_seq)
+        copy_rows(conn, insert, record_dropped, where, params)
+
+        (old_count,) = conn.execute(f"SELECT COUNT(*) FROM {table.name}").fetchone()
+        (report.copied,) = conn.execute(f"SELECT COUNT(*) FROM {COPY_TABLE}").fetchone()
+        report.merged = old_count - report.copied
+        # Only the values of rows that made it into the new table, most
+        # common first
+        for code, value, count in conn.execute(
+            f"SELECT code, value, COUNT(*) FROM {DROPPED_TABLE} WHERE id IN (SELECT id FROM {COPY_TABLE}) "
+            "GROUP BY code, value ORDER BY code, COUNT(*) DESC"
+        ):
+            report.dropped[code] = report.dropped.get(code, 0) + count
+            examples = report.dropped_examples.setdefault(code, [])
+            if len(examples) < DROPPED_EXAMPLES:
+                examples.append(value)
+        conn.execute(f"DROP TABLE {DROPPED_TABLE}")
+
+        # Swap the tables; dropping the old one drops its indexes and
+        # triggers, which are recreated on the new one
+        conn.execute(f"DROP TABLE {table.name}")
+        conn.execute(f"ALTER TABLE {COPY_TABLE} RENAME TO {table.name}")
+        conn.execute(f"DROP INDEX {COPY_KEY_INDEX}")
+        for index in table.indexes:
+            conn.execute(str(CreateIndex(index).compile(dialect=DIALECT)))
+        if log_columns:
+            for statement in change_log_statements(log_columns):
+                conn.execute(statement)
+        record_codes(conn, table)
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+# === Entry point ===
+def migrate_annotations(db_path, table, progress=None, chunk_size=COPY_CHUNK_SIZE):
+    # Returns a MigrationReport, or raises MigrationError, having changed
+    # nothing, if stored values can't be decoded. `progress(num_rows)` is
+    # called after each copied chunk.
+    report = MigrationReport()
+    if not os.path.exists(db_path):
+        return report
+    # Processes starting together take turns; the later ones find nothing to do
+    fd = os.open(db_path + ".migrate.lock", os.O_RDWR | os.O_CREAT, 0o644)
+    conn = sqlite3.connect(db_path, isolation_level=None, timeout=BUSY_TIMEOUT)
+    conn.create_function(NUMBER_FUNCTION, 2, coded_number, deterministic=True)
+    try:
+        with locked(fd):
+            codes = stored_codes(conn)
+            live = live_column_types(conn, table.name)
+            added, changed, needs_copy = plan_migration(conn, table, codes)
+            undecodable = undecodable_columns(live, changed, codes)
+            if undecodable:
+                raise MigrationError(
+                    f"can't convert {', '.join(undecodable)}: {db_path} doesn't record the options their "
+                    "values were saved with. Start the app once with the codebook they were saved with, "
+                    "which records them, then change the codebook again."
+                )
+            report.added = [c.name for c in added]
+            if needs_copy:
+                copy_table(conn, db_path, table, changed, codes, report, progress, chunk_size)
+            elif added:
+                add_columns(conn, table, added)
+            elif live and any(codes.get(code) != saved for code, saved in model_codes(table).items()):
+                # Options were appended, or the database is from before
+                # annotation_codes, so its values were saved with this codebook
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    record_codes(conn, table)
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+            return report
+    finally:
+        conn.close()
+        os.close(fd)
@@ -0,0 +1,180 @@
+# Lightweight timing and counters for the app's hot paths. Stages are timed
+# with `timed(...)` blocks or the `traced(...)` decorator, and cached loaders
+# are wrapped with `cached(...)` to count cache hits and misses. Nothing is
+# recorded until `enable()` is called (or ANNOTATION_APP_PERF=1 is set), and
+# while disabled each hook costs one global flag check.
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# Most recent events kept for the JSON lines export
+MAX_EVENTS = 10_000
+
+ENABLED = os.environ.get("ANNOTATION_APP_PERF", "") not in ("", "0")
+
+_lock = threading.Lock()
+_stats = {}  # stage -> StageStats
+_events = deque(maxlen=MAX_EVENTS)
+
+class _NullTimer:
+    # Stands in for a timer while disabled; assignments to it are dropped
+    rows = None
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_null = nullcontext(_NullTimer())
+
+
+class StageStats:
+    __slots__ = ("calls", "total_ms", "max_ms", "last_ms", "rows", "hits", "misses")
+
+    def __init__(self):
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        self.rows = None
+        self.hits = 0
+        self.misses = 0
+
+
+def enable(on=True):
+    global ENABLED
+    ENABLED = on
+
+
+def record(stage, ms, rows=None, hit=None):
+    with _lock:
+        stats = _stats.get(stage)
+        if stats is None:
+            stats = _stats[stage] = StageStats()
+        stats.calls += 1
+        stats.total_ms += ms
+        stats.last_ms = ms
+        stats.max_ms = max(stats.max_ms, ms)
+        if rows is not None:
+            stats.rows = rows
+        if hit is True:
+            stats.hits += 1
+        elif hit is False:
+            stats.misses += 1
+        _events.append({"ts": time.time(), "stage": stage, "ms": round(ms, 3), "rows": rows, "hit": hit})
+
+
+class _Timer:
+    __slots__ = ("stage", "rows", "start")
+
+    def __init__(self, stage, rows):
+        self.stage = stage
+        self.rows = rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, (time.perf_counter() - self.start) * 1000, self.rows)
+        return False
+
+
+def timed(stage, rows=None):
+    # `with timed("stage"):` -- set `.rows` on the returned timer to record
+    # a row count worked out inside the block
+    if not ENABLED:
+        return _null
+    return _Timer(stage, rows)
+
+
+def traced(stage=None):
+    # Decorator timing every call of a function
+    def decorate(fn):
+        name = stage or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorate
+
+
+def row_count(result):
+    # Height of a returned frame (or of the first item of a returned tuple)
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    return getattr(result, "height", None)
+
+
+def cached(cache_decorator, stage=None):
+    # Applies a cache decorator (e.g. st.cache_data(...)) and counts hits and
+    # misses: a call is a miss when the function body actually runs
+    def decorate(fn):
+        name = stage or fn.__name__
+        local = threading.local()
+
+        @functools.wraps(fn)
+        def body(*args, **kwargs):
+            local.missed = True
+            return fn(*args, **kwargs)
+
+        cached_fn = cache_decorator(body)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED:
+                return cached_fn(*args, **kwargs)
+            # Cached loaders can call each other, so save the outer flag
+            outer, local.missed = getattr(local, "missed", False), False
+            start = time.perf_counter()
+            try:
+                result = cached_fn(*args, **kwargs)
+            finally:
+                missed, local.missed = local.missed, outer
+            record(name, (time.perf_counter() - start) * 1000, row_count(result), hit=not missed)
+            return result
+
+        # Keep the cache's own methods (e.g. .clear()) reachable
+        wrapper.clear = cached_fn.clear
+        return wrapper
+    return decorate
+
+
+def snapshot():
+    # One dict per stage, in first-seen order
+    with _lock:
+        rows = []
+        for stage, stats in _stats.items():
+            lookups = stats.hits + stats.misses
+            rows.append({
+                "stage": stage,
+                "calls": stats.calls,
+                "mean_ms": round(stats.total_ms / stats.calls, 2),
+                "last_ms": round(stats.last_ms, 2),
+                "max_ms": round(stats.max_ms, 2),
+                "rows": stats.rows,
+                "hit_rate": round(stats.hits / lookups, 3) if lookups else None,
+                "misses": stats.misses if lookups else None,
+            })
+        return rows
+
+
+def to_jsonl():
+    with _lock:
+        return "".join(json.dumps(event) + "\n" for event in _events)
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _events.clear()
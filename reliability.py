@@ -0,0 +1,202 @@
+# Inter-coder reliability for double-coded experiments: for every choice,
+# checkall (multi) and numeric code, observed agreement, Cohen's kappa and
+# Krippendorff's alpha (nominal for choice and checkall codes, interval for
+# numeric ones). A checkall code is scored as one yes/no judgment per answer,
+# pooled over its answers. Alpha takes any number of coders per experiment;
+# kappa is over the experiments where exactly two coders answered the code,
+# the coder whose ID sorts first being "coder A".
+#
+# All codes are scored at once, in NumPy: answers become one long array with
+# category ids unique across codes, so every code's category counts and
+# coincidences are one np.bincount over categories, and every code's kappa
+# contingency table is a block on the diagonal of one categories x categories
+# matrix. Per-code totals are then bincounts over each category's code.
+import numpy as np
+import polars as pl
+
+from aggregate import summary_columns
+
+EXPERIMENT_KEY = ["article_index", "experiment_number"]
+
+RESULT_SCHEMA = {
+    "code": pl.String,
+    "section": pl.String,
+    "level": pl.String,
+    "experiments": pl.Int64,
+    "agreement": pl.Float64,
+    "kappa": pl.Float64,
+    "alpha": pl.Float64,
+}
+
+
+def double_coded(df):
+    # Rows of experiments with at least two coders, with integer unit and
+    # coder ids
+    units = df.group_by(EXPERIMENT_KEY).agg(pl.len().alias("coders")).filter(pl.col("coders") >= 2)
+    return (
+        df.join(units.select(EXPERIMENT_KEY), on=EXPERIMENT_KEY, how="semi")
+        .with_columns(
+            pl.struct(EXPERIMENT_KEY).rank("dense").cast(pl.Int64).alias("unit"),
+            pl.col("coder").rank("dense").cast(pl.Int64).alias("coder_id"),
+        )
+    )
+
+
+def run_lengths(key):
+    # For each element, how many elements have the same key
+    _, inverse, counts = np.unique(key, return_inverse=True, return_counts=True)
+    return counts[inverse]
+
+
+def categorical_answers(units, table=None):
+    # Code names, each category's code, and arrays (group, coder, code,
+    # category) with one element per answer to a choice code and per
+    # (answer, option) of a multi code. A group is one judgment: a unit and
+    # code, plus the option for multi codes.
+    choice, multi, _ = summary_columns(table)
+    columns = choice + multi
+    unit = units["unit"].to_numpy()
+    coder_id = units["coder_id"].to_numpy()
+    max_items = max([len(c.type.values) for c in multi], default=1)
+    category_codes, items = [], []
+    group, coder, code, category = [], [], [], []
+    for number, column in enumerate(columns):
+        offset = len(category_codes)
+        answered = units[column.name].is_not_null().to_numpy()
+        values = units[column.name].fill_null(0).to_numpy()[answered]
+        if column in multi:
+            category_codes += [number] * 2  # not ticked, ticked
+            judgments = [(item, (values >> item) & 1) for item in range(len(column.type.values))]
+        else:
+            category_codes += [number] * len(column.type.values)
+            judgments = [(0, values)]
+        items.append(len(judgments))
+        for item, values in judgments:
+            group.append((unit[answered] * max_items + item) * len(columns) + number)
+            coder.append(coder_id[answered])
+            code.append(np.full(len(values), number))
+            category.append(values + offset)
+
+    arrays = [np.concatenate(a) if a else np.zeros(0, dtype=np.int64) for a in (group, coder, code, category)]
+    return [c.name for c in columns], np.array(category_codes, dtype=np.int64), np.array(items), *arrays
+
+
+def nominal_scores(category_codes, items, group, coder, code, category):
+    # (experiments, agreement, kappa, alpha) arrays, one value per code
+    num_codes = len(items)
+    num_categories = len(category_codes)
+    m = run_lengths(group)
+    pairable = m >= 2
+    group, coder, code, category, m = group[pairable], coder[pairable], code[pairable], category[pairable], m[pairable]
+
+    # Krippendorff: a value agrees with the (same - 1) other values of its
+    # category in its group, each pair weighted 1 / (m - 1), so the
+    # coincidence matrix's diagonal is all that's needed besides n_c
+    same = run_lengths(group * num_categories + category)
+    n_c = np.bincount(category, minlength=num_categories).astype(float)
+    matching = np.bincount(category, weights=(same - 1) / (m - 1), minlength=num_categories)
+    n = np.bincount(category_codes, weights=n_c, minlength=num_codes)
+    agreeing = np.bincount(category_codes, weights=matching, minlength=num_codes)
+    expected = n ** 2 - np.bincount(category_codes, weights=n_c ** 2, minlength=num_codes)
+
+    # Cohen: groups of exactly two answers, sorted by coder, pair up
+    # consecutively
+    two = m == 2
+    order = np.lexsort((coder[two], group[two]))
+    first, second = category[two][order][0::2], category[two][order][1::2]
+    contingency = np.bincount(first * num_categories + second, minlength=num_categories ** 2)
+    contingency = contingency.reshape(num_categories, num_categories)
+    pairs = np.bincount(category_codes, weights=contingency.sum(axis=1), minlength=num_codes)
+    observed = np.bincount(category_codes, weights=np.diag(contingency), minlength=num_codes)
+    chance = np.bincount(
+        category_codes, weights=contingency.sum(axis=1) * contingency.sum(axis=0), minlength=num_codes
+    )
+    with np.errstate(divide="ignore", invalid="ignore"):
+        agreement = agreeing / n
+        alpha = 1 - (n - 1) * (n - agreeing) / expected
+        observed, chance = observed / pairs, chance / pairs ** 2
+        kappa = (observed - chance) / (1 - chance)
+
+    # Each group holds m answers; a multi code has one group per option
+    experiments = np.bincount(code, weights=1 / m, minlength=num_codes) / items
+    return experiments, agreement, kappa, alpha
+
+
+def interval_scores(units, table=None):
+    # (names, experiments, agreement, alpha) for the numeric codes. Agreement
+    # is the share of pairs giving exactly the same number.
+    _, _, numeric = summary_columns(table)
+    unit = units["unit"].to_numpy()
+    group, code, value = [], [], []
+    for number, column in enumerate(numeric):
+        answered = units[column.name].is_not_null().to_numpy()
+        group.append(unit[answered] * len(numeric) + number)
+        code.append(np.full(answered.sum(), number))
+        value.append(units[column.name].to_numpy()[answered])
+    num_codes = len(numeric)
+    group, code, value = [np.concatenate(a) if a else np.zeros(0) for a in (group, code, value)]
+
+    m = run_lengths(group)
+    pairable = m >= 2
+    group, code, value, m = group[pairable], code[pairable], value[pairable], m[pairable]
+    distinct, value_id = np.unique(value, return_inverse=True)
+    same = run_lengths(group * len(distinct) + value_id)
+
+    # Over all ordered pairs of n values, sum((a - b)^2) = 2n*S2 - 2*S1^2:
+    # within each group for the observed disagreement (weighted 1 / (m - 1))
+    # and within each code for the expected one
+    groups, inverse = np.unique(group, return_inverse=True)
+    group_m = np.bincount(inverse)
+    within = (
+        2 * group_m * np.bincount(inverse, weights=value ** 2) - 2 * np.bincount(inverse, weights=value) ** 2
+    ) / (group_m - 1)
+    observed = np.bincount(groups % num_codes, weights=within, minlength=num_codes)
+    n = np.bincount(code, minlength=num_codes).astype(float)
+    total = np.bincount(code, weights=value, minlength=num_codes)
+    squares = np.bincount(code, weights=value ** 2, minlength=num_codes)
+    agreeing = np.bincount(code, weights=(same - 1) / (m - 1), minlength=num_codes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        alpha = 1 - (n - 1) * observed / (2 * n * squares - 2 * total ** 2)
+        agreement = agreeing / n
+    experiments = np.bincount(code, weights=1 / m, minlength=num_codes)
+    return [c.name for c in numeric], experiments, agreement, alpha
+
+
+def reliability(df, schema, table=None):
+    # One row per code: code, section, level, experiments (double-coded
+    # experiments where at least two coders answered it), agreement, kappa
+    # and alpha. Scores are null where undefined, e.g. no double-coded
+    # answers or every answer the same.
+    units = double_coded(df)
+    names, category_codes, items, *answers = categorical_answers(units, table)
+    experiments, agreement, kappa, alpha = nominal_scores(category_codes, items, *answers)
+    nominal = pl.DataFrame({
+        "code": names,
+        "level": "nominal",
+        "experiments": experiments.round(),
+        "agreement": agreement,
+        "kappa": kappa,
+        "alpha": alpha,
+    })
+    names, experiments, agreement, alpha = interval_scores(units, table)
+    interval = pl.DataFrame({
+        "code": names,
+        "level": "interval",
+        "experiments": experiments.round(),
+        "agreement": agreement,
+        "kappa": np.full(len(names), np.nan),
+        "alpha": alpha,
+    })
+
+    # Codebook order, with each code's section
+    order = pl.DataFrame(
+        {"code": list(schema.fields), "section": [spec.section for spec in schema], "number": range(len(schema))},
+        schema_overrides={"number": pl.Int64},
+    )
+    return (
+        pl.concat([nominal, interval], how="vertical_relaxed")
+        .join(order, on="code", how="left")
+        .sort("number", nulls_last=True, maintain_order=True)
+        .with_columns(pl.col("agreement", "kappa", "alpha").fill_nan(None))
+        .select([pl.col(name).cast(dtype) for name, dtype in RESULT_SCHEMA.items()])
+    )
@@ -0,0 +1,154 @@
+import bisect
+import re
+
+import numpy as np
+import polars as pl
+from rapidfuzz import fuzz, process
+
+from loaders import journal_ranges
+
+# Words are runs of letters/digits in the (lowercased) search_text;
+# underscores split words too, so article_index parts are searchable
+TOKEN_PATTERN = r"[^\W_]+"
+
+# Minimum rapidfuzz ratio for a vocabulary word to count as a fuzzy match
+FUZZY_CUTOFF = 75
+
+# Fuzzy mode matches nearly every article for a short query; the dashboard
+# shows only this many of the best matches
+SEARCH_LIMIT = 500
+
+# Part of the shared cache key for indexes; bump it whenever the index's
+# arrays or tokenization change
+INDEX_VERSION = 1
+
+
+def tokenize(text):
+    return re.findall(TOKEN_PATTERN, text.lower())
+
+
+def search_text_expr():
+    # The lowercased text an article is searched by: title, authors and
+    # article_index
+    return (
+        pl.col("title").cast(pl.Utf8).fill_null("") + " " +
+        pl.col("author").cast(pl.Utf8).fill_null("") + " " +
+        pl.col("article_index").fill_null("")
+    ).str.to_lowercase().alias("search_text")
+
+
+# === Token index over the article catalog ===
+# An inverted index from each word of an article's search text to the
+# catalog rows that contain it. The vocabulary is kept sorted and its postings stored in one
+# flat array, so all words sharing a prefix are a single contiguous slice:
+# a query word is matched by prefix with two bisects and no per-row scan.
+class SearchIndex:
+    def __init__(self, catalog):
+        self.num_rows = catalog.height
+        self.journal_ranges = {}
+        self.vocab = []
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.postings = np.zeros(0, dtype=np.int64)
+        if catalog.is_empty():
+            return
+
+        # Catalog rows are grouped by journal, in workbook order
+        self.journal_ranges = journal_ranges(catalog)
+
+        tokens = (
+            catalog.select(
+                pl.col("catalog_row"),
+                search_text_expr().str.extract_all(TOKEN_PATTERN).alias("token"),
+            )
+            .explode("token")
+            .drop_nulls("token")
+            .unique()
+            .group_by("token")
+            .agg(pl.col("catalog_row").sort())
+            .sort("token")
+        )
+        self.vocab = tokens["token"].to_list()
+        lengths = tokens["catalog_row"].list.len().to_numpy()
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64)
+        self.postings = tokens["catalog_row"].explode().to_numpy().astype(np.int64)
+
+    # For shared_cache.ArrowStore: the arrays go into Arrow files and are
+    # memory-mapped back, so replicas share one copy
+    def to_frames(self):
+        frames = {
+            "vocab": pl.DataFrame({"token": self.vocab}, schema={"token": pl.String}),
+            "offsets": pl.DataFrame({"offset": self.offsets}),
+            "postings": pl.DataFrame({"row": self.postings}),
+        }
+        return frames, {"num_rows": self.num_rows, "journal_ranges": self.journal_ranges}
+
+    @classmethod
+    def from_frames(cls, frames, meta):
+        index = cls.__new__(cls)
+        index.num_rows = meta["num_rows"]
+        index.journal_ranges = {journal: tuple(bounds) for journal, bounds in meta["journal_ranges"].items()}
+        index.vocab = frames["vocab"]["token"].to_list()
+        index.offsets = frames["offsets"]["offset"].to_numpy()
+        index.postings = frames["postings"]["row"].to_numpy()
+        return index
+
+    def _prefix_rows(self, prefix):
+        lo = bisect.bisect_left(self.vocab, prefix)
+        hi = bisect.bisect_left(self.vocab, prefix + "\U0010ffff")
+        return self.postings[self.offsets[lo]:self.offsets[hi]]
+
+    def _word_rows(self, index):
+        return self.postings[self.offsets[index]:self.offsets[index + 1]]
+
+    def _journal_range(self, journal):
+        if journal is None:
+            return 0, self.num_rows
+        return self.journal_ranges.get(journal, (0, 0))
+
+    def search(self, query, journal=None, limit=None):
+        # Every query word must prefix-match a word of the article (so "agr"
+        # finds "agreement", but "greement" doesn't). Returns all matching
+        # catalog rows, or the first `limit`, in catalog order.
+        start, end = self._journal_range(journal)
+        words = tokenize(query)
+        if not words or start == end:
+            return []
+
+        matched = np.ones(end - start, dtype=bool)
+        for word in words:
+            hit = np.zeros(self.num_rows, dtype=bool)
+            hit[self._prefix_rows(word)] = True
+            matched &= hit[start:end]
+        rows = np.flatnonzero(matched) + start
+        return (rows if limit is None else rows[:limit]).tolist()
+
+    def fuzzy_search(self, query, journal=None, limit=SEARCH_LIMIT, score_cutoff=FUZZY_CUTOFF):
+        # Typo-tolerant search: each query word is matched against the
+        # vocabulary with rapidfuzz, and articles are ranked by the summed
+        # score of their best match per query word. Returns catalog rows,
+        # best first; all of them with limit=None.
+        start, end = self._journal_range(journal)
+        words = tokenize(query)
+        if not words or start == end:
+            return []
+
+        total = np.zeros(self.num_rows, dtype=np.float32)
+        for word in words:
+            matches = process.extract(
+                word, self.vocab, scorer=fuzz.ratio, score_cutoff=score_cutoff, limit=None
+            )
+            word_score = np.zeros(self.num_rows, dtype=np.float32)
+            # Prefix matches count as exact, so partially typed words still rank
+            word_score[self._prefix_rows(word)] = 100
+            for _, score, index in matches:
+                rows = self._word_rows(index)
+                word_score[rows] = np.maximum(word_score[rows], score)
+            total += word_score
+
+        scores = total[start:end]
+        candidates = np.flatnonzero(scores)
+        if limit is not None and len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        # Highest score first; ties keep catalog order
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return (candidates + start).tolist()
@@ -0,0 +1,136 @@
+# Shared on-disk cache for the app's derived frames (the article catalog and
+# the search index), so several app processes -- e.g. replicas behind a load
+# balancer -- build each one once and memory-map the same files rather than
+# each holding its own parsed copy.
+#
+# Entries are directories of uncompressed Arrow IPC files plus a manifest,
+# laid out like the workbook sidecar (see loaders.py). They are keyed on the
+# content hash of their inputs, so an entry never changes once written and a
+# new workbook simply gets a new entry. Reads are lock-free; builds hold a
+# file lock so only one process builds a missing entry while the others wait
+# for it. Least recently used entries are evicted when the store outgrows its
+# size limit.
+#
+# The store is off unless ANNOTATION_APP_SHARED_CACHE names a directory that
+# every replica can reach; ANNOTATION_APP_SHARED_CACHE_MB sets its size limit.
+import json
+import os
+import shutil
+import uuid
+
+import polars as pl
+
+from file_lock import locked
+
+CACHE_DIR_ENV = "ANNOTATION_APP_SHARED_CACHE"
+CACHE_MB_ENV = "ANNOTATION_APP_SHARED_CACHE_MB"
+DEFAULT_MAX_MB = 2048
+
+MANIFEST = "manifest.json"
+LOCK_FILE = ".lock"
+
+
+class ArrowStore:
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def entry_dir(self, name, key):
+        return os.path.join(self.directory, f"{name}-{key}")
+
+    def get(self, name, key):
+        # Returns ({frame name: frame}, meta), or None on a miss
+        directory = self.entry_dir(name, key)
+        manifest_path = os.path.join(directory, MANIFEST)
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+            frames = {
+                frame_name: pl.read_ipc(os.path.join(directory, file_name))
+                for frame_name, file_name in manifest["frames"].items()
+            }
+            # The manifest's mtime is the entry's last use, for LRU eviction
+            os.utime(manifest_path)
+        except (OSError, ValueError, KeyError):
+            # Missing, half-evicted or unreadable: treat as a miss
+            return None
+        return frames, manifest["meta"]
+
+    def put(self, name, key, frames, meta):
+        # Written into a scratch directory and renamed into place, so readers
+        # only ever see complete entries
+        directory = self.entry_dir(name, key)
+        scratch = os.path.join(self.directory, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(scratch)
+        try:
+            manifest = {"frames": {}, "meta": meta}
+            for i, (frame_name, df) in enumerate(frames.items()):
+                file_name = f"frame_{i:03d}.arrow"
+                # Uncompressed so readers can memory-map it
+                df.write_ipc(os.path.join(scratch, file_name), compression="uncompressed")
+                manifest["frames"][frame_name] = file_name
+            with open(os.path.join(scratch, MANIFEST), "w") as f:
+                json.dump(manifest, f)
+            os.replace(scratch, directory)
+        except OSError:
+            # Most likely another process got there first
+            shutil.rmtree(scratch, ignore_errors=True)
+            if not os.path.exists(os.path.join(directory, MANIFEST)):
+                raise
+
+    def get_or_build(self, name, key, build):
+        # Returns (frames, meta, hit). On a miss, build() must return
+        # (frames, meta); only one process runs it for a given entry.
+        cached = self.get(name, key)
+        if cached is not None:
+            return cached + (True,)
+        fd = os.open(os.path.join(self.directory, LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            with locked(fd):
+                # Another process may have built it while we waited
+                cached = self.get(name, key)
+                if cached is not None:
+                    return cached + (True,)
+                frames, meta = build()
+                self.put(name, key, frames, meta)
+                self.evict(keep=self.entry_dir(name, key))
+        finally:
+            os.close(fd)
+        return frames, meta, False
+
+    def entries(self):
+        # [(last used, size in bytes, path)] for every complete entry
+        found = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or entry.name.startswith("."):
+                continue
+            try:
+                used = os.stat(os.path.join(entry.path, MANIFEST)).st_mtime
+                size = sum(f.stat().st_size for f in os.scandir(entry.path))
+            except OSError:
+                continue
+            found.append((used, size, entry.path))
+        return found
+
+    def evict(self, keep=None):
+        # Drops least recently used entries until the store fits its limit.
+        # Processes that still have a dropped file mapped keep their mapping.
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            total -= size
+
+
+def open_store():
+    # The configured shared store, or None to keep caches per process
+    directory = os.environ.get(CACHE_DIR_ENV)
+    if not directory:
+        return None
+    max_mb = int(os.environ.get(CACHE_MB_ENV) or DEFAULT_MAX_MB)
+    return ArrowStore(directory, max_mb * 1024 * 1024)
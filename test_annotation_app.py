@@ -1,6 +1,7 @@
 import streamlit as st
-import pandas as pd
 import datetime
+import os
+from csv_append import append_row, compact_to_parquet
 
 st.set_page_config(page_title="Acceptability Judgment Coding Form", layout="centered")
 st.title("Acceptability Judgment Experiment Coding Form")
@@ -43,7 +44,7 @@ coding_confidence = st.selectbox("Confidence in Coding", ["High", "Medium", "Low
 
 # --- Submission and saving ---
 if st.button("Submit Entry"):
-    new_entry = pd.DataFrame.from_records([{
+    new_entry = {
         "StudyID": study_id,
         "Year": year,
         "Journal": journal,
@@ -67,14 +68,16 @@ if st.button("Submit Entry"):
         "Results": results_summary,
         "Notes": theoretical_notes,
         "Confidence": coding_confidence
-    }])
+    }
 
-    # Append to CSV
-    try:
-        existing = pd.read_csv("coded_studies.csv")
-        df = pd.concat([existing, new_entry], ignore_index=True)
-    except FileNotFoundError:
-        df = new_entry
-
-    df.to_csv("coded_studies.csv", index=False)
+    # Append to CSV: one locked, fsync'd line per entry, rather than
+    # rewriting the whole file on every submit
+    append_row("coded_studies.csv", new_entry)
     st.success("Entry saved to coded_studies.csv!")
+
+# --- Optional conversion of the collected entries to Parquet ---
+if os.path.exists("coded_studies.csv") and st.button("Convert coded_studies.csv to Parquet"):
+    try:
+        st.success(f"Saved {compact_to_parquet('coded_studies.csv')}")
+    except ImportError:
+        st.error("Converting to Parquet needs pyarrow installed.")